@@ -0,0 +1,155 @@
+"""
+Local, vectorized portfolio analytics.
+
+Exposures are computed from holdings by sector/country weight matrices, so the
+LLM gets exact pre-computed figures instead of doing the arithmetic itself.
+"""
+
+from collections.abc import Callable, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from .compaction import group_small, weights_table
+from .models import (
+    GhostfolioWeights,
+    PerformanceDispersion,
+    PortfolioAnalytics,
+    PrivateGhostfolioHolding,
+)
+
+_UNKNOWN = "Unknown"
+
+
+def _weights_matrix(
+    holdings: Sequence[PrivateGhostfolioHolding],
+    weights: Callable[[PrivateGhostfolioHolding], list[GhostfolioWeights]],
+) -> tuple[list[str], npt.NDArray[np.float64]]:
+    """
+    Build a holdings by categories matrix of weights. Any weight missing to reach
+    100% for a holding (e.g. no sector data) is assigned to `Unknown`.
+    """
+    categories = sorted({w["name"] for h in holdings for w in weights(h)})
+    categories.append(_UNKNOWN)
+    index = {name: i for i, name in enumerate(categories)}
+
+    matrix = np.zeros((len(holdings), len(categories)))
+    for row, holding in enumerate(holdings):
+        for weight in weights(holding):
+            matrix[row, index[weight["name"]]] += weight["weight"]
+
+    matrix[:, -1] = np.clip(1 - matrix[:, :-1].sum(axis=1), 0, None)
+    return categories, matrix
+
+
+def _one_hot(values: Sequence[str]) -> tuple[list[str], npt.NDArray[np.float64]]:
+    categories = sorted(set(values))
+    codes = np.searchsorted(categories, values)
+    return categories, np.eye(len(categories))[codes]
+
+
+def _nonzero(
+    categories: list[str], exposure: npt.NDArray[np.float64]
+) -> dict[str, float]:
+    order = np.argsort(exposure)[::-1]
+    return {categories[i]: float(exposure[i]) for i in order if exposure[i] > 0}
+
+
+def _hhi(exposure: npt.NDArray[np.float64]) -> float:
+    """Herfindahl-Hirschman index of the normalized exposure (1 = fully concentrated)."""
+    total = exposure.sum()
+    return float(np.square(exposure / total).sum()) if total else 0.0
+
+
+def compute_analytics(
+    holdings: Sequence[PrivateGhostfolioHolding],
+    target_allocation: dict[str, float] | None = None,
+) -> PortfolioAnalytics:
+    allocations = np.array([h["allocationInPercentage"] for h in holdings], dtype=float)
+    performance = np.array(
+        [h["grossPerformancePercent"] for h in holdings], dtype=float
+    )
+
+    sectors, sector_matrix = _weights_matrix(holdings, lambda h: h["sectors"])
+    countries, country_matrix = _weights_matrix(holdings, lambda h: h["countries"])
+    currencies, currency_matrix = _one_hot([h["currency"] for h in holdings])
+    asset_classes, asset_class_matrix = _one_hot([h["assetClass"] for h in holdings])
+
+    # Look-through exposures: allocation-weighted sums of each holding's weights
+    sector_exposure = allocations @ sector_matrix
+    country_exposure = allocations @ country_matrix
+    currency_exposure = allocations @ currency_matrix
+    asset_class_exposure = allocations @ asset_class_matrix
+
+    asset_class_drift = None
+    if target_allocation is not None:
+        drift_classes = sorted(set(asset_classes) | set(target_allocation))
+        current = dict(zip(asset_classes, asset_class_exposure, strict=True))
+        asset_class_drift = {
+            name: float(current.get(name, 0) - target_allocation.get(name, 0))
+            for name in drift_classes
+        }
+
+    weights = allocations / allocations.sum() if allocations.sum() else allocations
+    mean = float(weights @ performance) if len(holdings) else 0.0
+    dispersion: PerformanceDispersion = {
+        "weightedMean": mean,
+        "weightedStd": float(np.sqrt(weights @ np.square(performance - mean)))
+        if len(holdings)
+        else 0.0,
+        "min": float(performance.min()) if len(holdings) else 0.0,
+        "max": float(performance.max()) if len(holdings) else 0.0,
+    }
+
+    return {
+        "sectorExposure": _nonzero(sectors, sector_exposure),
+        "countryExposure": _nonzero(countries, country_exposure),
+        "currencyExposure": _nonzero(currencies, currency_exposure),
+        "assetClassAllocation": _nonzero(asset_classes, asset_class_exposure),
+        "assetClassDrift": asset_class_drift,
+        "concentration": {
+            "holdings": _hhi(allocations),
+            "sectors": _hhi(sector_exposure[:-1]),
+            "countries": _hhi(country_exposure[:-1]),
+        },
+        "performanceDispersion": dispersion,
+    }
+
+
+def to_markdown(analytics: PortfolioAnalytics, min_weight: float = 0.0) -> str:
+    """Render `analytics` as tables, grouping weights below `min_weight`."""
+    sections = [
+        weights_table("Asset Class", analytics["assetClassAllocation"]),
+        weights_table(
+            "Currency", group_small(analytics["currencyExposure"], min_weight)
+        ),
+        weights_table(
+            "Sector (look-through)",
+            group_small(analytics["sectorExposure"], min_weight),
+        ),
+        weights_table(
+            "Country (look-through)",
+            group_small(analytics["countryExposure"], min_weight),
+        ),
+    ]
+
+    if analytics["assetClassDrift"] is not None:
+        rows = "\n".join(
+            f"| {name} | {drift:+.1%} |"
+            for name, drift in analytics["assetClassDrift"].items()
+        )
+        sections.append(f"| Asset Class | Drift vs Target |\n| --- | --- |\n{rows}")
+
+    concentration = analytics["concentration"]
+    dispersion = analytics["performanceDispersion"]
+    sections.append(
+        "| Metric | Value |\n| --- | --- |\n"
+        f"| HHI holdings | {concentration['holdings']:.3f} |\n"
+        f"| HHI sectors | {concentration['sectors']:.3f} |\n"
+        f"| HHI countries | {concentration['countries']:.3f} |\n"
+        f"| Performance weighted mean | {dispersion['weightedMean']:.1%} |\n"
+        f"| Performance weighted std | {dispersion['weightedStd']:.1%} |\n"
+        f"| Performance min / max | {dispersion['min']:.1%} / {dispersion['max']:.1%} |"
+    )
+
+    return "\n\n".join(sections)
@@ -1,17 +1,42 @@
 import json
 import logging
+import re
+import time
 import tomllib
-from datetime import date
+from collections import defaultdict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime
 from functools import cached_property
 from pathlib import Path
 from string import Template
-from typing import TypeVar, final
+from typing import Any, TypeVar, final
 
 import httpx
-import litellm
 from ghostfolio import Ghostfolio
 
-from .models import PrivateGhostfolioAccount, PrivateGhostfolioHolding
+from . import llm
+from .analytics import compute_analytics, to_markdown
+from .cache import AnalysisCache
+from .compaction import (
+    accounts_table,
+    estimate_tokens,
+    exposure_changes_table,
+    holding_changes_table,
+    holdings_table,
+    weights_table,
+)
+from .models import (
+    PortfolioAnalytics,
+    PrivateGhostfolioAccount,
+    PrivateGhostfolioHolding,
+    PrivateGhostfolioPerformance,
+    ProviderStats,
+)
+from .profiling import RUN_THREAD_PREFIX, profile
+from .snapshots import SnapshotStore
+from .transport import HttpTransport
 
 logger = logging.getLogger(__name__)
 
@@ -21,27 +46,90 @@ T = TypeVar("T")
 @final
 class GhostfolioAnalyzer:
     _TEMPlATES_DIR = Path(__file__).parent / "prompt-templates"
+    _PERFORMANCE_RANGES = ("ytd", "1y", "5y", "max")
+    # Weights below these thresholds are grouped into "Other", in order, until
+    # the prompt fits the token budget
+    _COMPACTION_LEVELS = (0.0, 0.01, 0.02, 0.05, 0.1)
+    # Sections of `output.md` are separated by horizontal rules
+    _SECTION_BREAK = re.compile(r"^---\s*$", re.MULTILINE)
+    # Holdings below this weight are grouped in the baseline of delta prompts
+    _BASELINE_MIN_WEIGHT = 0.05
+    # Exposures below this weight are grouped in map-reduce slice prompts
+    _SLICE_MIN_WEIGHT = 0.02
 
     def __init__(
         self,
         ghostfolio_client: Ghostfolio,
-        model: str,
+        models: list[str],
         user_profile: Path,
         ntfy_topic: str,
+        *,
+        cache_dir: Path = Path(".cache"),
+        reports_dir: Path = Path("reports"),
+        precision: float = 0.005,
+        change_threshold: float = 0.02,
+        token_budget: int = 4000,
+        deadline: float = 600.0,
+        hedge_delay: float = 20.0,
+        concurrency: int = 4,
+        profile: bool = False,
+        transport: HttpTransport | None = None,
     ):
         self._ghostfolio = ghostfolio_client
-        self._model = model
+        # Tried in order, hedging slow or failing models with the next one
+        self._models = models
         self._user_profile = user_profile
         self._ntfy_topic = ntfy_topic
+        self._cache = AnalysisCache(cache_dir / "analyses")
+        self._snapshots = SnapshotStore(cache_dir / "snapshots.sqlite")
+        self._reports_dir = reports_dir
+        # Relative values are rounded to this step in cache keys, so noise doesn't
+        # bust the cache
+        self._precision = precision
+        # Max allocation change (fraction of the portfolio) to reuse an analysis
+        self._change_threshold = change_threshold
+        self._token_budget = token_budget
+        # Overall seconds allowed for the LLM completion
+        self._deadline = deadline
+        self._hedge_delay = hedge_delay
+        self._stats_path = cache_dir / "llm-stats.json"
+        # Max concurrent LLM requests in map-reduce mode
+        self._concurrency = concurrency
+        self._profile = profile
+        # Names the profiles of every stage of this run
+        self._started = datetime.now()
+        # Shared by the LLM requests and ntfy notifications
+        self._transport = transport or HttpTransport({})
+
+    @staticmethod
+    def _project(element: dict[str, Any], private_fields: type[T]) -> T:
+        return {k: element[k] for k in private_fields.__required_keys__}  # ty:ignore[unresolved-attribute, invalid-return-type]
 
     def _get_private_info(self, info: str, private_fields: type[T]) -> list[T]:
         logger.info("Retrieving ghostfolio info '%s'", info)
+        start = time.perf_counter()
 
         data = getattr(self._ghostfolio, info)()[info]
-        return [
-            {k: element[k] for k in private_fields.__required_keys__}  # ty:ignore[unresolved-attribute]
-            for element in data
-        ]  # ty:ignore[invalid-return-type]
+        private_data = [self._project(element, private_fields) for element in data]
+
+        logger.info(
+            "Retrieved ghostfolio info '%s' in %.2fs", info, time.perf_counter() - start
+        )
+        return private_data
+
+    def _get_private_performance(self, date_range: str) -> PrivateGhostfolioPerformance:
+        logger.info("Retrieving ghostfolio performance for range '%s'", date_range)
+        start = time.perf_counter()
+
+        data = self._ghostfolio.performance(date_range=date_range)["performance"]
+        private_data = self._project(data, PrivateGhostfolioPerformance)
+
+        logger.info(
+            "Retrieved ghostfolio performance for range '%s' in %.2fs",
+            date_range,
+            time.perf_counter() - start,
+        )
+        return private_data
 
     @cached_property
     def holdings(self) -> list[PrivateGhostfolioHolding]:
@@ -54,37 +142,446 @@ class GhostfolioAnalyzer:
             PrivateGhostfolioAccount,
         )
 
-    def analyze_portfolio(self) -> None:
-        logger.info("Starting portfolio analysis")
+    @cached_property
+    def performance(self) -> dict[str, PrivateGhostfolioPerformance]:
+        with ThreadPoolExecutor(
+            thread_name_prefix=f"{RUN_THREAD_PREFIX}performance"
+        ) as pool:
+            return dict(
+                zip(
+                    self._PERFORMANCE_RANGES,
+                    pool.map(self._get_private_performance, self._PERFORMANCE_RANGES),
+                    strict=True,
+                )
+            )
+
+    @cached_property
+    def profile(self) -> dict[str, Any]:
+        return tomllib.loads(self._user_profile.read_text())
+
+    @cached_property
+    def analytics(self) -> PortfolioAnalytics:
+        return compute_analytics(self.holdings, self.profile.get("target-allocation"))
+
+    def _write_analytics_report(self) -> None:
+        self._reports_dir.mkdir(parents=True, exist_ok=True)
+        path = self._reports_dir / f"analytics-{date.today()}.json"
+        logger.info("Writing portfolio analytics report to '%s'", path)
+        _ = path.write_text(json.dumps(self.analytics, indent=2))
+
+    def fetch_data(self) -> None:
+        """Fetch every Ghostfolio dataset concurrently."""
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(thread_name_prefix=f"{RUN_THREAD_PREFIX}fetch") as pool:
+            futures = [
+                pool.submit(getattr, self, dataset)
+                for dataset in ("holdings", "accounts", "performance")
+            ]
+            for future in futures:
+                _ = future.result()
+
+        logger.info("Retrieved ghostfolio data in %.2fs", time.perf_counter() - start)
+
+    def _quantize(self, data: Any) -> Any:
+        if isinstance(data, float):
+            return round(round(data / self._precision) * self._precision, 6)
+        if isinstance(data, dict):
+            return {k: self._quantize(v) for k, v in data.items()}
+        if isinstance(data, list):
+            return [self._quantize(v) for v in data]
+
+        return data
+
+    @property
+    def _allocations(self) -> dict[str, float]:
+        return {
+            holding["symbol"]: self._quantize(holding["allocationInPercentage"])
+            for holding in self.holdings
+        }
+
+    def _max_allocation_change(self, previous: dict[str, float]) -> float:
+        current = self._allocations
+        return max(
+            (
+                abs(current.get(symbol, 0) - previous.get(symbol, 0))
+                for symbol in current.keys() | previous.keys()
+            ),
+            default=0,
+        )
+
+    def _inputs_key(self, mode: str) -> str:
+        """Key of the prompt inputs besides the portfolio, for `mode`."""
+        templates = sorted(self._TEMPlATES_DIR.glob("*.md"))
+        return self._cache.key(
+            "\0".join(
+                [mode, self._user_profile.read_text(), *map(Path.read_text, templates)]
+            )
+        )
 
+    def _prompt_key(self, inputs: str, *data: Any) -> str:
+        """
+        Cache key of a prompt rendered from `inputs` (see `_inputs_key`) and
+        `data`. Only the key is computed from quantized values, the prompt keeps
+        the exact ones.
+        """
+        return self._cache.key(
+            json.dumps([inputs, *self._quantize(list(data))], default=str)
+        )
+
+    def _render_prompt(self, accounts: str, holdings: str, min_weight: float) -> str:
         prompt_template = Template(
             (self._TEMPlATES_DIR / "instructions.md").read_text()
         )
+        return prompt_template.substitute(
+            user_profile=json.dumps(self.profile, indent=2),
+            accounts=accounts,
+            holdings=holdings,
+            analytics=to_markdown(self.analytics, min_weight),
+            performance=json.dumps(self.performance, indent=2),
+            output_template=(self._TEMPlATES_DIR / "output.md").read_text(),
+        )
+
+    def _render_uncompacted_prompt(self) -> str:
+        """The prompt with accounts and holdings as indented JSON, ungrouped."""
+        # Sector and country weights are summarized by the analytics tables
+        holdings = [
+            {k: v for k, v in holding.items() if k not in ("sectors", "countries")}
+            for holding in self.holdings
+        ]
+        return self._render_prompt(
+            json.dumps(self.accounts, indent=2),
+            json.dumps(holdings, indent=2),
+            0.0,
+        )
+
+    def _compact_prompt(self, inputs: str) -> tuple[str, str]:
+        """The prompt compacted into the token budget, and its cache key."""
+        uncompacted_tokens = estimate_tokens(self._render_uncompacted_prompt())
+
+        for min_weight in self._COMPACTION_LEVELS:
+            prompt = self._render_prompt(
+                accounts_table(self.accounts),
+                holdings_table(self.holdings, min_weight),
+                min_weight,
+            )
+            tokens = estimate_tokens(prompt)
+            if tokens <= self._token_budget:
+                break
+        else:
+            logger.warning(
+                "Prompt exceeds the token budget (~%s > %s) at maximum compaction",
+                tokens,
+                self._token_budget,
+            )
+
+        logger.info(
+            "Prompt compaction: ~%s tokens uncompacted, ~%s tokens compacted "
+            "(budget %s, grouping weights below %.0f%%)",
+            uncompacted_tokens,
+            tokens,
+            self._token_budget,
+            min_weight * 100,
+        )
+        key = self._prompt_key(
+            inputs,
+            self.holdings,
+            self.accounts,
+            self.analytics,
+            self.performance,
+            self._token_budget,
+        )
+        return prompt, key
+
+    def _render_delta_prompt(self, inputs: str) -> tuple[str, str] | None:
+        """
+        Render a prompt with only the changes since the previous snapshot and a
+        compact baseline, and its cache key, or `None` if there is no previous
+        snapshot.
+        """
+        today = date.today()
+        if (previous := self._snapshots.previous(today)) is None:
+            logger.info("No previous snapshot, falling back to the full prompt")
+            return None
+
+        logger.info("Rendering delta prompt against the snapshot of %s", previous)
+        holding_changes = self._snapshots.holding_changes(
+            previous, today, self._precision
+        )
+        exposure_changes = self._snapshots.exposure_changes(
+            previous, today, self._precision
+        )
+        prompt_template = Template((self._TEMPlATES_DIR / "delta.md").read_text())
         prompt = prompt_template.substitute(
-            user_profile=json.dumps(
-                tomllib.loads(self._user_profile.read_text()), indent=2
+            previous_date=previous.isoformat(),
+            user_profile=json.dumps(self.profile, indent=2),
+            asset_classes=weights_table(
+                "Asset Class", self.analytics["assetClassAllocation"]
             ),
-            accounts=json.dumps(self.accounts, indent=2),
-            holdings=json.dumps(self.holdings, indent=2),
+            holdings=holdings_table(self.holdings, self._BASELINE_MIN_WEIGHT),
+            holding_changes=holding_changes_table(holding_changes),
+            exposure_changes=exposure_changes_table(exposure_changes),
+            performance=json.dumps(self.performance, indent=2),
             output_template=(self._TEMPlATES_DIR / "output.md").read_text(),
         )
-        print(prompt)
 
-        logger.info("Requesting analysis from LLM (%s)...", self._model)
-        response = litellm.completion(
-            self._model, messages=[{"role": "user", "content": prompt}]
-        )
-        analysis: str = response.choices[0].message.content
-
-        logger.info("Sending analysis to ntfy topic '%s'", self._ntfy_topic)
-        with httpx.Client() as http:
-            r = http.put(
-                self._ntfy_topic,
-                headers={
-                    "Title": "Ghostfolio Portfolio Analysis",
-                    "Tags": "chart_with_upwards_trend",
-                    "File": f"analysis-{date.today()}.md",
-                },
-                content=analysis.encode(),
+        logger.info("Delta prompt: ~%s tokens", estimate_tokens(prompt))
+        key = self._prompt_key(
+            inputs,
+            previous,
+            self.analytics["assetClassAllocation"],
+            self.holdings,
+            holding_changes,
+            exposure_changes,
+            self.performance,
+        )
+        return prompt, key
+
+    def _analyze_slice(
+        self, asset_class: str, prompt: str, key: str, *, deadline: float, force: bool
+    ) -> str:
+        if not force and (analysis := self._cache.get(key)) is not None:
+            return analysis
+
+        logger.info("Requesting analysis of the %s slice from LLM", asset_class)
+        analysis = "".join(
+            llm.stream(
+                self._models,
+                prompt,
+                timeout=deadline - time.monotonic(),
+                hedge_delay=self._hedge_delay,
+                transport=self._transport,
             )
+        )
+        self._cache.put(key, analysis)
+        return analysis
+
+    def _render_map_reduce_prompt(
+        self, inputs: str, *, deadline: float, force: bool
+    ) -> tuple[str, str]:
+        """
+        Analyze each asset class slice concurrently (map) and render a final
+        prompt combining their notes with the portfolio-wide figures (reduce),
+        and its cache key. Slice analyses are cached by prompt key, so only
+        changed slices hit the LLM, unless `force`. Slices still running at the
+        `deadline` (a `time.monotonic()` value) fail.
+        """
+        slices: defaultdict[str, list[PrivateGhostfolioHolding]] = defaultdict(list)
+        for holding in self.holdings:
+            slices[holding["assetClass"]].append(holding)
+
+        map_template = Template((self._TEMPlATES_DIR / "map.md").read_text())
+        prompts = {
+            asset_class: map_template.substitute(
+                asset_class=asset_class,
+                weight=f"{sum(h['allocationInPercentage'] for h in holdings):.1%}",
+                user_profile=json.dumps(self.profile, indent=2),
+                holdings=holdings_table(holdings),
+                analytics=to_markdown(
+                    compute_analytics(holdings), self._SLICE_MIN_WEIGHT
+                ),
+            )
+            for asset_class, holdings in sorted(slices.items())
+        }
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(
+            max_workers=self._concurrency, thread_name_prefix=f"{RUN_THREAD_PREFIX}map"
+        ) as pool:
+            futures = {
+                asset_class: pool.submit(
+                    self._analyze_slice,
+                    asset_class,
+                    prompt,
+                    self._prompt_key(inputs, asset_class, slices[asset_class]),
+                    deadline=deadline,
+                    force=force,
+                )
+                for asset_class, prompt in prompts.items()
+            }
+
+        notes: list[str] = []
+        for asset_class, future in futures.items():
+            try:
+                notes.append(f"### {asset_class}\n\n{future.result().strip()}")
+            except Exception:
+                logger.exception("Analysis of the %s slice failed", asset_class)
+                notes.append(f"### {asset_class}\n\nAnalysis unavailable.")
+
+        if futures and all(
+            future.exception() is not None for future in futures.values()
+        ):
+            raise RuntimeError("Analysis of every portfolio slice failed")
+
+        logger.info(
+            "Analyzed %s slices in %.2fs", len(futures), time.perf_counter() - start
+        )
+
+        reduce_template = Template((self._TEMPlATES_DIR / "reduce.md").read_text())
+        slice_notes = "\n\n".join(notes) or "No holdings."
+        prompt = reduce_template.substitute(
+            user_profile=json.dumps(self.profile, indent=2),
+            accounts=accounts_table(self.accounts),
+            analytics=to_markdown(self.analytics, self._BASELINE_MIN_WEIGHT),
+            performance=json.dumps(self.performance, indent=2),
+            slices=slice_notes,
+            output_template=(self._TEMPlATES_DIR / "output.md").read_text(),
+        )
+        key = self._prompt_key(
+            inputs, self.accounts, self.analytics, self.performance, slice_notes
+        )
+        return prompt, key
+
+    def _send(self, content: str, *, title: str, filename: str | None = None) -> None:
+        logger.info("Sending '%s' to ntfy topic '%s'", title, self._ntfy_topic)
+        headers = {"Title": title, "Tags": "chart_with_upwards_trend"}
+        if filename is not None:
+            headers["File"] = filename
+
+        with self._transport.client() as http:
+            r = http.put(self._ntfy_topic, headers=headers, content=content.encode())
             _ = r.raise_for_status()
+
+    def _stream_analysis(self, prompt: str, deadline: float) -> tuple[str, bool]:
+        """
+        Stream the analysis of `prompt`, sending the first section as a summary as
+        soon as it is complete. Returns the analysis and whether it is complete,
+        or the partial analysis if the `deadline` (a `time.monotonic()` value) is
+        exceeded.
+        """
+        stats: dict[str, ProviderStats] = (
+            json.loads(self._stats_path.read_text())
+            if self._stats_path.exists()
+            else {}
+        )
+        start = time.perf_counter()
+        first_token: float | None = None
+        chunks: list[str] = []
+        summary_sent = False
+
+        try:
+            for chunk in llm.stream(
+                self._models,
+                prompt,
+                timeout=deadline - time.monotonic(),
+                hedge_delay=self._hedge_delay,
+                stats=stats,
+                transport=self._transport,
+            ):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                    logger.info("LLM time to first token: %.2fs", first_token)
+                chunks.append(chunk)
+
+                if not summary_sent and (
+                    section_break := self._SECTION_BREAK.search(text := "".join(chunks))
+                ):
+                    self._send(
+                        text[: section_break.start()].strip(),
+                        title="Ghostfolio Portfolio Analysis Summary",
+                    )
+                    summary_sent = True
+        except (TimeoutError, httpx.TimeoutException) as e:
+            logger.warning("LLM deadline exceeded, keeping partial analysis: %s", e)
+            return "".join(chunks), False
+        finally:
+            self._stats_path.parent.mkdir(parents=True, exist_ok=True)
+            _ = self._stats_path.write_text(json.dumps(stats, indent=2))
+
+        logger.info(
+            "LLM completion in %.2fs (time to first token %.2fs, %s chunks)",
+            time.perf_counter() - start,
+            first_token or 0,
+            len(chunks),
+        )
+        return "".join(chunks), True
+
+    @contextmanager
+    def _stage(self, name: str) -> Iterator[None]:
+        """Profile stage `name` into the reports dir, when profiling."""
+        if not self._profile:
+            yield
+            return
+
+        path = (
+            self._reports_dir / f"profile-{name}-{self._started:%Y%m%dT%H%M%S}.folded"
+        )
+        with profile(path):
+            yield
+
+    def analyze_portfolio(
+        self, *, force: bool = False, delta: bool = False, map_reduce: bool = False
+    ) -> None:
+        logger.info("Starting portfolio analysis")
+        # Overlap the LLM client import with the Ghostfolio fetches below
+        for model in self._models:
+            llm.warm_up(model)
+        with self._stage("fetch"):
+            self.fetch_data()
+        with self._stage("analytics"):
+            self._write_analytics_report()
+            self._snapshots.save(
+                date.today(), self.holdings, self.accounts, self.analytics
+            )
+
+        # Decided before rendering, the map phase of map-reduce calls the LLM.
+        # A new profile, template or mode always reaches the LLM.
+        inputs = self._inputs_key(
+            "map-reduce" if map_reduce else "delta" if delta else "full"
+        )
+        latest = self._cache.latest()
+        if (
+            not force
+            and latest is not None
+            and latest.get("inputs") == inputs
+            and (change := self._max_allocation_change(latest["allocations"]))
+            < self._change_threshold
+        ):
+            logger.info(
+                "Max allocation change %.1f%% below threshold, skipping LLM",
+                change * 100,
+            )
+            self._send(
+                f"No material change since the analysis of {latest['date']} "
+                f"(max allocation change {change:.1%}).",
+                title="Ghostfolio Portfolio Analysis",
+            )
+            return
+
+        # Shared by the map and reduce phases of map-reduce
+        deadline = time.monotonic() + self._deadline
+        with self._stage("prompt"):
+            if map_reduce:
+                prompt, key = self._render_map_reduce_prompt(
+                    inputs, deadline=deadline, force=force
+                )
+            else:
+                prompt, key = (
+                    delta and self._render_delta_prompt(inputs)
+                ) or self._compact_prompt(inputs)
+        print(prompt)
+
+        if not force and (analysis := self._cache.get(key)) is not None:
+            self._send(
+                analysis,
+                title="Ghostfolio Portfolio Analysis",
+                filename=f"analysis-{date.today()}.md",
+            )
+            return
+
+        logger.info("Requesting analysis from LLM (%s)...", ", ".join(self._models))
+        with self._stage("llm"):
+            analysis, complete = self._stream_analysis(prompt, deadline)
+        if complete:
+            self._cache.put(key, analysis, self._allocations, inputs)
+        else:
+            analysis += (
+                f"\n\n> ⚠️ Partial analysis, the LLM exceeded the "
+                f"{self._deadline:.0f}s deadline."
+            )
+
+        self._send(
+            analysis,
+            title="Ghostfolio Portfolio Analysis",
+            filename=f"analysis-{date.today()}.md",
+        )
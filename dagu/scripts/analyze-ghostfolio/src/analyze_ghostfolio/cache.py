@@ -0,0 +1,71 @@
+import hashlib
+import json
+import logging
+from datetime import date
+from pathlib import Path
+from typing import NotRequired, TypedDict
+
+logger = logging.getLogger(__name__)
+
+
+class LatestAnalysis(TypedDict):
+    key: str
+    date: str
+    allocations: dict[str, float]
+    # Key of the inputs besides the portfolio (user profile, templates, mode)
+    inputs: NotRequired[str]
+
+
+class AnalysisCache:
+    """
+    Content-addressed store of LLM analyses, keyed by the SHA-256 of the rendered
+    prompt. Also remembers the allocations and the other inputs of the latest
+    analysis, so callers can skip the LLM when only the portfolio barely changed.
+    """
+
+    def __init__(self, cache_dir: Path) -> None:
+        self._dir = cache_dir
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        path = self._dir / f"{key}.md"
+        if not path.exists():
+            return None
+
+        logger.info("Analysis cache hit for prompt '%s'", key[:12])
+        return path.read_text()
+
+    def put(
+        self,
+        key: str,
+        analysis: str,
+        allocations: dict[str, float] | None = None,
+        inputs: str | None = None,
+    ) -> None:
+        """
+        Store `analysis` under `key`. Only analyses of the whole portfolio pass
+        `allocations` and the key of their other `inputs`, which become the
+        latest analysis.
+        """
+        self._dir.mkdir(parents=True, exist_ok=True)
+        _ = (self._dir / f"{key}.md").write_text(analysis)
+        if allocations is None or inputs is None:
+            return
+
+        latest: LatestAnalysis = {
+            "key": key,
+            "date": date.today().isoformat(),
+            "allocations": allocations,
+            "inputs": inputs,
+        }
+        _ = (self._dir / "latest.json").write_text(json.dumps(latest, indent=2))
+
+    def latest(self) -> LatestAnalysis | None:
+        path = self._dir / "latest.json"
+        if not path.exists():
+            return None
+
+        return json.loads(path.read_text())
@@ -0,0 +1,120 @@
+"""
+Prompt compaction helpers.
+
+Accounts and holdings are rendered as compact markdown tables instead of
+indented JSON, and small weights are grouped into "Other", so the prompt fits a
+token budget.
+"""
+
+import math
+import re
+from collections.abc import Sequence
+
+from .models import (
+    ExposureChange,
+    HoldingChange,
+    PrivateGhostfolioAccount,
+    PrivateGhostfolioHolding,
+)
+
+OTHER = "Other"
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of `text` without a provider tokenizer: punctuation
+    counts as one token and words as one token per 4 characters, which is close
+    to BPE tokenizers for English text, JSON and markdown.
+    """
+    return sum(math.ceil(len(token) / 4) for token in _TOKEN_PATTERN.findall(text))
+
+
+def group_small(weights: dict[str, float], min_weight: float) -> dict[str, float]:
+    grouped = {name: w for name, w in weights.items() if w >= min_weight}
+    if other := sum(w for w in weights.values() if w < min_weight):
+        grouped[OTHER] = grouped.get(OTHER, 0) + other
+
+    return grouped
+
+
+def weights_table(title: str, values: dict[str, float]) -> str:
+    rows = "\n".join(f"| {name} | {value:.1%} |" for name, value in values.items())
+    return f"| {title} | Weight |\n| --- | --- |\n{rows}"
+
+
+def accounts_table(accounts: Sequence[PrivateGhostfolioAccount]) -> str:
+    rows = "\n".join(
+        f"| {a['name']} | {a['platform']['name'] if a['platform'] else '-'} "
+        f"| {a['currency']} | {a['allocationInPercentage']:.1%} "
+        f"| {'yes' if a['isExcluded'] else 'no'} | {a['updatedAt'][:10]} |"
+        for a in sorted(accounts, key=lambda a: -a["allocationInPercentage"])
+    )
+    return (
+        "| Account | Platform | Currency | Allocation | Excluded | Updated |\n"
+        "| --- | --- | --- | --- | --- | --- |\n"
+        f"{rows}"
+    )
+
+
+def holdings_table(
+    holdings: Sequence[PrivateGhostfolioHolding], min_weight: float = 0.0
+) -> str:
+    ordered = sorted(holdings, key=lambda h: -h["allocationInPercentage"])
+    shown = [h for h in ordered if h["allocationInPercentage"] >= min_weight]
+    hidden = [h for h in ordered if h["allocationInPercentage"] < min_weight]
+
+    rows = [
+        f"| {h['symbol']} | {h['name']} | {h['assetClass']} | {h['assetSubClass']} "
+        f"| {h['currency']} | {h['allocationInPercentage']:.1%} "
+        f"| {h['grossPerformancePercent']:+.1%} | {h['dateOfFirstActivity'][:10]} "
+        f"| {', '.join(h['tags']) or '-'} |"
+        for h in shown
+    ]
+    if hidden:
+        rows.append(
+            f"| {OTHER} | {len(hidden)} holdings below {min_weight:.0%} | - | - | - "
+            f"| {sum(h['allocationInPercentage'] for h in hidden):.1%} | - | - | - |"
+        )
+
+    return (
+        "| Symbol | Name | Class | Subclass | Currency | Allocation "
+        "| Gross Perf. | Since | Tags |\n"
+        "| --- | --- | --- | --- | --- | --- | --- | --- | --- |\n" + "\n".join(rows)
+    )
+
+
+def _percent(value: float | None, signed: bool = False) -> str:
+    if value is None:
+        return "-"
+    return f"{value:+.1%}" if signed else f"{value:.1%}"
+
+
+def holding_changes_table(changes: Sequence[HoldingChange]) -> str:
+    rows = "\n".join(
+        f"| {c['symbol']} | {c['name']} "
+        f"| {_percent(c['previousAllocation'])} | {_percent(c['allocation'])} "
+        f"| {_percent(c['previousPerformance'], True)} "
+        f"| {_percent(c['performance'], True)} |"
+        for c in changes
+    )
+    return (
+        "| Symbol | Name | Prev. Allocation | Allocation | Prev. Gross Perf. "
+        "| Gross Perf. |\n"
+        "| --- | --- | --- | --- | --- | --- |\n"
+        f"{rows}"
+    )
+
+
+def exposure_changes_table(changes: Sequence[ExposureChange]) -> str:
+    rows = "\n".join(
+        f"| {c['kind']} | {c['name']} | {c['previous']:.1%} | {c['current']:.1%} "
+        f"| {c['current'] - c['previous']:+.1%} |"
+        for c in changes
+    )
+    return (
+        "| Exposure | Name | Previous | Current | Change |\n"
+        "| --- | --- | --- | --- | --- |\n"
+        f"{rows}"
+    )
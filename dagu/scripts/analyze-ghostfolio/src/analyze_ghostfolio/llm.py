@@ -0,0 +1,225 @@
+"""
+Thin LLM client layer.
+
+Gemini models are called directly over HTTP, which avoids importing `litellm`
+(several seconds of start-up) altogether. Any other model goes through
+`litellm`, which is imported lazily and can be warmed up in the background.
+Completions are streamed, so callers can act on partial output and stop at a
+deadline.
+"""
+
+import importlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Iterator, Sequence
+
+import httpx
+
+from .models import ProviderStats
+from .profiling import RUN_THREAD_PREFIX
+from .transport import HttpTransport
+
+logger = logging.getLogger(__name__)
+
+# Overridable to point at a local stand-in endpoint
+GEMINI_API_URL = os.environ.get(
+    "GEMINI_API_URL", "https://generativelanguage.googleapis.com/v1beta"
+)
+_GEMINI_PREFIX = "gemini/"
+_TIMEOUT = httpx.Timeout(30.0, read=300.0)
+# Time to first token samples kept per model
+_LATENCY_SAMPLES = 100
+
+_litellm_warmup: threading.Thread | None = None
+
+
+def _is_direct(model: str) -> bool:
+    return model.startswith(_GEMINI_PREFIX) and "GEMINI_API_KEY" in os.environ
+
+
+def warm_up(model: str) -> None:
+    """Import `litellm` in the background if `model` needs it."""
+    global _litellm_warmup
+
+    if _is_direct(model) or _litellm_warmup is not None:
+        return
+
+    logger.info("Warming up litellm in the background")
+    _litellm_warmup = threading.Thread(
+        target=importlib.import_module, args=("litellm",), daemon=True
+    )
+    _litellm_warmup.start()
+
+
+def _stream_gemini(model: str, prompt: str, transport: HttpTransport) -> Iterator[str]:
+    with (
+        transport.client(base_url=GEMINI_API_URL, timeout=_TIMEOUT) as http,
+        http.stream(
+            "POST",
+            f"/models/{model.removeprefix(_GEMINI_PREFIX)}:streamGenerateContent",
+            params={"alt": "sse"},
+            headers={"x-goog-api-key": os.environ["GEMINI_API_KEY"]},
+            json={"contents": [{"role": "user", "parts": [{"text": prompt}]}]},
+        ) as r,
+    ):
+        _ = r.raise_for_status()
+        for line in r.iter_lines():
+            if not line.startswith("data:"):
+                continue
+
+            candidate = json.loads(line.removeprefix("data:"))["candidates"][0]
+            for part in candidate.get("content", {}).get("parts", []):
+                yield part.get("text", "")
+
+
+def _stream_litellm(model: str, prompt: str) -> Iterator[str]:
+    if _litellm_warmup is not None:
+        _litellm_warmup.join()
+
+    litellm = importlib.import_module("litellm")
+    response = litellm.completion(
+        model, messages=[{"role": "user", "content": prompt}], stream=True
+    )
+    for chunk in response:
+        yield chunk.choices[0].delta.content or ""
+
+
+def _open(model: str, prompt: str, transport: HttpTransport) -> Iterator[str]:
+    if _is_direct(model):
+        logger.info("Using direct Gemini API for model '%s'", model)
+        return _stream_gemini(model, prompt, transport)
+
+    return _stream_litellm(model, prompt)
+
+
+def _stats_entry(stats: dict[str, ProviderStats], model: str) -> ProviderStats:
+    return stats.setdefault(
+        model, {"requests": 0, "wins": 0, "errors": 0, "firstTokenSeconds": []}
+    )
+
+
+def stream(
+    models: Sequence[str],
+    prompt: str,
+    *,
+    timeout: float,
+    hedge_delay: float = float("inf"),
+    stats: dict[str, ProviderStats] | None = None,
+    transport: HttpTransport | None = None,
+) -> Iterator[str]:
+    """
+    Yield the completion of `prompt` in chunks from the first model. If no text
+    arrives within `hedge_delay` seconds (or it fails), the next model is started
+    as well, and the first one to send text wins while the others are cancelled.
+    A completion without any text counts as a failure.
+
+    Raises `TimeoutError` once `timeout` seconds have elapsed, even while waiting
+    for a chunk. Requests, wins, errors and time to first token are recorded per
+    model in `stats`. Direct Gemini requests are sent through `transport`.
+    """
+    stats = stats if stats is not None else {}
+    transport = transport or HttpTransport({})
+    # Providers are read in daemon threads, so a stalled connection can't block
+    # past the deadline. Cancelled providers stop at their next chunk.
+    items: queue.Queue[tuple[int, str | Exception | None]] = queue.Queue()
+    cancelled = [threading.Event() for _ in models]
+    start = time.monotonic()
+    deadline = start + timeout
+
+    def produce(i: int) -> None:
+        try:
+            chunks = _open(models[i], prompt, transport)
+            empty = True
+            for chunk in chunks:
+                if cancelled[i].is_set():
+                    chunks.close()
+                    return
+                # Role-only deltas and empty parts carry no text, so they can't win
+                if chunk:
+                    empty = False
+                    items.put((i, chunk))
+            if empty:
+                raise RuntimeError(f"LLM model '{models[i]}' returned no text")
+        except Exception as e:
+            if not cancelled[i].is_set():
+                logger.warning("LLM model '%s' failed", models[i], exc_info=True)
+            items.put((i, e))
+        else:
+            items.put((i, None))
+
+    def hedge() -> None:
+        i = len(started)
+        if i > 0:
+            logger.info("Hedging LLM request with model '%s'", models[i])
+        _stats_entry(stats, models[i])["requests"] += 1
+        started.append(time.monotonic())
+        threading.Thread(
+            target=produce,
+            args=(i,),
+            name=f"{RUN_THREAD_PREFIX}llm-{i}",
+            daemon=True,
+        ).start()
+
+    started: list[float] = []
+    failed: set[int] = set()
+    winner: int | None = None
+    hedge()
+
+    while True:
+        now = time.monotonic()
+        wait = deadline - now
+        can_hedge = winner is None and len(started) < len(models)
+        if can_hedge:
+            wait = min(wait, started[-1] + hedge_delay - now)
+
+        try:
+            i, item = items.get(timeout=max(wait, 0))
+        except queue.Empty:
+            if not can_hedge or time.monotonic() >= deadline:
+                for event in cancelled:
+                    event.set()
+                raise TimeoutError(f"LLM completion exceeded {timeout:.0f}s") from None
+            hedge()
+            continue
+
+        if winner is not None and i != winner:
+            continue
+
+        if isinstance(item, Exception):
+            _stats_entry(stats, models[i])["errors"] += 1
+            if winner is not None:
+                raise item
+
+            failed.add(i)
+            if len(started) < len(models):
+                hedge()
+            elif len(failed) == len(started):
+                raise item
+            continue
+
+        if winner is None:
+            winner = i
+            first_token = time.monotonic() - started[i]
+            entry = _stats_entry(stats, models[i])
+            entry["wins"] += 1
+            entry["firstTokenSeconds"] = [
+                *entry["firstTokenSeconds"][-(_LATENCY_SAMPLES - 1) :],
+                round(first_token, 3),
+            ]
+            logger.info(
+                "LLM model '%s' won in %.2fs (%s started)",
+                models[i],
+                first_token,
+                len(started),
+            )
+            for j, event in enumerate(cancelled):
+                if j != i:
+                    event.set()
+
+        if item is None:
+            return
+        yield item
@@ -1,28 +1,131 @@
+import argparse
 import logging
 import os
+import tomllib
 from pathlib import Path
+from typing import cast
 
 from dotenv import load_dotenv
-from ghostfolio import Ghostfolio  # pyright: ignore[reportMissingTypeStubs]
 
-from analyze_ghostfolio.analyzer import GhostfolioAnalyzer
+from analyze_ghostfolio.models import Config
+from analyze_ghostfolio.trigger import ChangeTrigger
 
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 _ = load_dotenv()
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Analyzes Ghostfolio portfolio with AI"
+    )
+    _ = parser.add_argument(
+        "--if-changed",
+        action="store_true",
+        help="only analyze when the syncs since the latest analysis changed enough",
+    )
+    _ = parser.add_argument(
+        "--force",
+        action="store_true",
+        help="request a fresh analysis even if the portfolio did not change",
+    )
+    _ = parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="only send the changes since the previous snapshot to the LLM",
+    )
+    _ = parser.add_argument(
+        "--map-reduce",
+        action="store_true",
+        help="analyze each asset class concurrently and combine the results",
+    )
+    _ = parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="max concurrent LLM requests in map-reduce mode",
+    )
+    _ = parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=bool(os.environ.get("GHOSTFOLIO_PROFILE")),
+        help="write folded-stack profiles of every stage to the reports dir",
+    )
+    _ = parser.add_argument(
+        "--precision",
+        type=float,
+        default=0.005,
+        help="step relative values are rounded to in analysis cache keys",
+    )
+    _ = parser.add_argument(
+        "--change-threshold",
+        type=float,
+        default=0.02,
+        help="max allocation change (fraction) below which the LLM is skipped",
+    )
+    _ = parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=4000,
+        help="estimated prompt tokens to compact the portfolio data into",
+    )
+    _ = parser.add_argument(
+        "--deadline",
+        type=float,
+        default=600.0,
+        help="seconds allowed for the LLM analysis before sending the partial result",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
-    ghostfolio = Ghostfolio(
+    args = parse_args()
+    config = cast(Config, tomllib.loads(Path("config.toml").read_text()))
+
+    trigger: ChangeTrigger | None = None
+    if args.if_changed:
+        trigger_config = config.get("trigger", {})
+        trigger = ChangeTrigger(
+            Path(trigger_config.get("summaries", ChangeTrigger.DEFAULT_SUMMARIES)),
+            Path(trigger_config.get("state", ChangeTrigger.DEFAULT_STATE)),
+            min_change=trigger_config.get("min_change", 500.0),
+        )
+        if not trigger.should_analyze():
+            logger.info("Skipping the analysis, the portfolio barely changed")
+            return
+
+    # Imported only once an analysis is going to run, so skipping stays fast
+    from analyze_ghostfolio.analyzer import GhostfolioAnalyzer
+    from analyze_ghostfolio.transport import HttpTransport, PooledGhostfolio
+
+    transport = HttpTransport(config.get("http", {}))
+    ghostfolio = PooledGhostfolio(
         os.environ["GHOSTFOLIO_TOKEN"],
         host="http://ghostfolio:3333",
+        transport=transport,
     )
 
     analyzer = GhostfolioAnalyzer(
         ghostfolio,
-        "gemini/gemini-flash-latest",
+        config["llm"]["models"],
         Path("profile.toml"),
         "http://ntfy/dagu",
+        precision=args.precision,
+        change_threshold=args.change_threshold,
+        token_budget=args.token_budget,
+        deadline=args.deadline,
+        hedge_delay=config["llm"].get("hedge_delay", 20.0),
+        concurrency=args.concurrency,
+        profile=args.profile,
+        transport=transport,
     )
 
-    analyzer.analyze_portfolio()
+    try:
+        analyzer.analyze_portfolio(
+            force=args.force, delta=args.delta, map_reduce=args.map_reduce
+        )
+        if trigger is not None:
+            trigger.mark_analyzed()
+    finally:
+        transport.close()
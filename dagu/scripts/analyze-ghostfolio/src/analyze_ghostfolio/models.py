@@ -1,4 +1,4 @@
-from typing import Any, Literal, TypedDict
+from typing import Any, Literal, NotRequired, TypedDict
 
 
 class GhostfolioWeights(TypedDict):
@@ -109,3 +109,91 @@ class PrivateGhostfolioAccount(TypedDict):
     allocationInPercentage: float
     updatedAt: str
     platform: GhostfolioPlatform
+
+
+class PrivateGhostfolioPerformance(TypedDict):
+    """
+    Relative portfolio performance over a date range, without absolute values.
+    """
+
+    netPerformancePercentage: float
+    netPerformancePercentageWithCurrencyEffect: float
+
+
+class Concentration(TypedDict):
+    """Herfindahl-Hirschman indexes, from 1/N (evenly spread) to 1 (concentrated)."""
+
+    holdings: float
+    sectors: float
+    countries: float
+
+
+class PerformanceDispersion(TypedDict):
+    weightedMean: float
+    weightedStd: float
+    min: float
+    max: float
+
+
+class PortfolioAnalytics(TypedDict):
+    """
+    Exposures computed locally from the private holdings (fractions of the
+    portfolio), so the LLM doesn't have to do the arithmetic.
+    """
+
+    sectorExposure: dict[str, float]
+    countryExposure: dict[str, float]
+    currencyExposure: dict[str, float]
+    assetClassAllocation: dict[str, float]
+    assetClassDrift: dict[str, float] | None
+    concentration: Concentration
+    performanceDispersion: PerformanceDispersion
+
+
+class HoldingChange(TypedDict):
+    """Change of a holding between two snapshots, `None` if absent from one."""
+
+    symbol: str
+    name: str
+    previousAllocation: float | None
+    allocation: float | None
+    previousPerformance: float | None
+    performance: float | None
+
+
+class ExposureChange(TypedDict):
+    kind: str
+    name: str
+    previous: float
+    current: float
+
+
+class ProviderStats(TypedDict):
+    requests: int
+    wins: int
+    errors: int
+    firstTokenSeconds: list[float]
+
+
+class LLMConfig(TypedDict):
+    models: list[str]
+    hedge_delay: NotRequired[float]
+
+
+class HttpConfig(TypedDict):
+    max_connections: NotRequired[int]
+    max_keepalive_connections: NotRequired[int]
+    keepalive_expiry: NotRequired[float]  # Seconds an idle connection is kept
+    http2: NotRequired[bool]  # Needs the `h2` package
+
+
+class TriggerConfig(TypedDict):
+    summaries: NotRequired[str]  # Run summaries written by sync-ghostfolio
+    state: NotRequired[str]  # Latest analyzed summary
+    min_change: NotRequired[float]
+
+
+class Config(TypedDict):
+    llm: LLMConfig
+    http: NotRequired[HttpConfig]
+    trigger: NotRequired[TriggerConfig]
@@ -0,0 +1,73 @@
+"""
+Wall-clock sampling profiler writing folded stacks, the input format of
+`flamegraph.pl`, speedscope and inferno. Wall-clock samples include the time
+spent waiting on the network, unlike CPU profilers.
+
+A copy of `sync_ghostfolio.profiling`. The projects are built into separate
+venvs and share no package, so keep the two identical below this docstring.
+"""
+
+import logging
+import sys
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+
+logger = logging.getLogger(__name__)
+
+_INTERVAL = 0.005
+# Prefix of the worker threads a profiled run starts, which are sampled with it
+RUN_THREAD_PREFIX = "run-"
+
+
+def _folded(frame: FrameType | None, thread_name: str) -> str:
+    stack: list[str] = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_qualname} ({Path(code.co_filename).name})")
+        frame = frame.f_back
+
+    stack.append(thread_name)
+    return ";".join(reversed(stack))
+
+
+@contextmanager
+def profile(path: Path) -> Iterator[None]:
+    """
+    Sample the current thread, and the worker threads named with
+    `RUN_THREAD_PREFIX` it starts, every 5ms while the block runs and write the
+    folded stacks to `path`. Other threads, like HTTP handlers, are ignored.
+    """
+    profiled = threading.get_ident()
+    existing = {t.ident for t in threading.enumerate()} - {profiled}
+    stacks: Counter[str] = Counter()
+    stop = threading.Event()
+
+    def sample() -> None:
+        while not stop.wait(_INTERVAL):
+            names = {
+                t.ident: t.name
+                for t in threading.enumerate()
+                if t.ident == profiled
+                or (t.name.startswith(RUN_THREAD_PREFIX) and t.ident not in existing)
+            }
+            for ident, frame in sys._current_frames().items():
+                if ident in names:
+                    stacks[_folded(frame, names[ident])] += 1
+
+    sampler = threading.Thread(target=sample, name="profiler", daemon=True)
+    sampler.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        sampler.join()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        logger.info("Writing profile (%s samples) to '%s'", stacks.total(), path)
+        _ = path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        )
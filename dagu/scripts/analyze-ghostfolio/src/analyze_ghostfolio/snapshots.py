@@ -0,0 +1,208 @@
+"""
+Local SQLite store of the private portfolio data of each run, one snapshot per
+day, so changes between runs and trends over many weeks are local queries.
+"""
+
+import logging
+import sqlite3
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from contextlib import closing, contextmanager
+from datetime import date
+from pathlib import Path
+
+from .models import (
+    ExposureChange,
+    HoldingChange,
+    PortfolioAnalytics,
+    PrivateGhostfolioAccount,
+    PrivateGhostfolioHolding,
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS holdings (
+    date TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    name TEXT NOT NULL,
+    asset_class TEXT,
+    allocation REAL NOT NULL,
+    gross_performance REAL NOT NULL,
+    PRIMARY KEY (date, symbol)
+);
+CREATE TABLE IF NOT EXISTS accounts (
+    date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    allocation REAL NOT NULL,
+    PRIMARY KEY (date, name)
+);
+CREATE TABLE IF NOT EXISTS exposures (
+    date TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    weight REAL NOT NULL,
+    PRIMARY KEY (date, kind, name)
+);
+"""
+
+# Analytics exposures stored per snapshot, keyed by their `kind` column
+_EXPOSURES = {
+    "asset_class": "assetClassAllocation",
+    "currency": "currencyExposure",
+    "sector": "sectorExposure",
+    "country": "countryExposure",
+}
+
+
+def _holding_rows(
+    holdings: Sequence[PrivateGhostfolioHolding],
+) -> list[tuple[str, str, str, float, float]]:
+    """
+    One row per symbol, since a symbol can be held under several data sources:
+    their allocations are added up and their performances weighted by them.
+    """
+    rows: dict[str, tuple[str, str, str, float, float]] = {}
+    for h in holdings:
+        allocation = h["allocationInPercentage"]
+        performance = h["grossPerformancePercent"]
+        if (known := rows.get(h["symbol"])) is not None:
+            *_, known_allocation, known_performance = known
+            if total := known_allocation + allocation:
+                performance = (
+                    known_performance * known_allocation + performance * allocation
+                ) / total
+            allocation = total
+
+        rows[h["symbol"]] = (
+            h["symbol"],
+            h["name"],
+            h["assetClass"],
+            allocation,
+            performance,
+        )
+
+    return list(rows.values())
+
+
+class SnapshotStore:
+    def __init__(self, path: Path) -> None:
+        self._path = path
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self._path)) as db, db:
+            _ = db.executescript(_SCHEMA)
+            yield db
+
+    def save(
+        self,
+        day: date,
+        holdings: Sequence[PrivateGhostfolioHolding],
+        accounts: Sequence[PrivateGhostfolioAccount],
+        analytics: PortfolioAnalytics,
+    ) -> None:
+        """Store the snapshot of `day`, replacing any earlier one of the same day."""
+        logger.info("Saving portfolio snapshot of %s to '%s'", day, self._path)
+        key = day.isoformat()
+
+        with self._connect() as db:
+            for table in ("holdings", "accounts", "exposures"):
+                _ = db.execute(f"DELETE FROM {table} WHERE date = ?", (key,))
+
+            _ = db.executemany(
+                "INSERT INTO holdings VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, *row) for row in _holding_rows(holdings)],
+            )
+            accounts_allocation: defaultdict[str, float] = defaultdict(float)
+            for a in accounts:
+                # Accounts are only named in snapshots, and names may repeat
+                accounts_allocation[a["name"]] += a["allocationInPercentage"]
+            _ = db.executemany(
+                "INSERT INTO accounts VALUES (?, ?, ?)",
+                [(key, *row) for row in accounts_allocation.items()],
+            )
+            _ = db.executemany(
+                "INSERT INTO exposures VALUES (?, ?, ?, ?)",
+                [
+                    (key, kind, name, weight)
+                    for kind, field in _EXPOSURES.items()
+                    for name, weight in analytics[field].items()  # ty:ignore[invalid-key]
+                ],
+            )
+
+    def previous(self, day: date) -> date | None:
+        """Date of the latest snapshot before `day`."""
+        with self._connect() as db:
+            (previous,) = db.execute(
+                "SELECT MAX(date) FROM holdings WHERE date < ?", (day.isoformat(),)
+            ).fetchone()
+
+        return date.fromisoformat(previous) if previous else None
+
+    def holding_changes(
+        self, previous: date, current: date, min_change: float
+    ) -> list[HoldingChange]:
+        """
+        Holdings whose allocation or performance moved at least `min_change`
+        between both snapshots, including holdings that were added or removed.
+        """
+        with self._connect() as db:
+            rows = {
+                (d, symbol): (name, allocation, performance)
+                for d, symbol, name, allocation, performance in db.execute(
+                    "SELECT date, symbol, name, allocation, gross_performance "
+                    "FROM holdings WHERE date IN (?, ?)",
+                    (previous.isoformat(), current.isoformat()),
+                )
+            }
+
+        changes: list[HoldingChange] = []
+        for symbol in sorted({symbol for _, symbol in rows}):
+            before = rows.get((previous.isoformat(), symbol))
+            after = rows.get((current.isoformat(), symbol))
+            change: HoldingChange = {
+                "symbol": symbol,
+                "name": (after or before)[0],  # ty:ignore[not-subscriptable]
+                "previousAllocation": before[1] if before else None,
+                "allocation": after[1] if after else None,
+                "previousPerformance": before[2] if before else None,
+                "performance": after[2] if after else None,
+            }
+            if (
+                before is None
+                or after is None
+                or abs(after[1] - before[1]) >= min_change
+                or abs(after[2] - before[2]) >= min_change
+            ):
+                changes.append(change)
+
+        return sorted(
+            changes,
+            key=lambda c: -abs((c["allocation"] or 0) - (c["previousAllocation"] or 0)),
+        )
+
+    def exposure_changes(
+        self, previous: date, current: date, min_change: float
+    ) -> list[ExposureChange]:
+        with self._connect() as db:
+            rows = db.execute(
+                """
+                SELECT kind, name,
+                    SUM(CASE WHEN date = :previous THEN weight ELSE 0 END),
+                    SUM(CASE WHEN date = :current THEN weight ELSE 0 END)
+                FROM exposures
+                WHERE date IN (:previous, :current)
+                GROUP BY kind, name
+                """,
+                {"previous": previous.isoformat(), "current": current.isoformat()},
+            ).fetchall()
+
+        return [
+            {"kind": kind, "name": name, "previous": before, "current": after}
+            for kind, name, before, after in sorted(
+                rows, key=lambda r: (r[0], -abs(r[3] - r[2]))
+            )
+            if abs(after - before) >= min_change
+        ]
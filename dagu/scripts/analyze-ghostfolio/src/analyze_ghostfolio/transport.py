@@ -0,0 +1,220 @@
+"""
+Shared HTTP transport of the Ghostfolio client, the LLM calls and notifications.
+
+Clients created by `HttpTransport.client` send through one keep-alive connection
+pool per proxy, so repeated requests to a host reuse their TCP (and TLS)
+connection instead of paying a handshake per client or per call. Closing such a
+client leaves the pool open. New connections are counted per host, so reuse
+shows up in the log when the transport is closed.
+
+A subset of `sync_ghostfolio.transport`, which also records run metrics and
+guards upstream APIs with a circuit breaker. The projects are built into
+separate venvs and share no package, so fixes to the pooling go in both.
+"""
+
+import importlib.util
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, final, override
+
+import httpx
+from ghostfolio import Ghostfolio  # pyright: ignore[reportMissingTypeStubs]
+
+from .models import HttpConfig
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    connections: int = 0
+
+    @property
+    def reused(self) -> int:
+        return self.requests - self.connections
+
+
+class _SharedPool(httpx.BaseTransport):
+    def __init__(self, pool: httpx.HTTPTransport, transport: "HttpTransport") -> None:
+        self._pool = pool
+        self._transport = transport
+
+    @override
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+
+        def trace(event: str, info: dict[str, Any]) -> None:
+            if event.endswith("connect_tcp.complete"):
+                self._transport._count(host, connection=True)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        self._transport._count(host)
+        return self._pool.handle_request(request)
+
+    @override
+    def close(self) -> None:
+        # Owned by the `HttpTransport`, which outlives the clients using it
+        pass
+
+
+@final
+class HttpTransport:
+    """
+    Keep-alive connection pools shared by every client, one per proxy. Pool
+    limits and HTTP/2 come from the `[http]` config section.
+    """
+
+    _DEFAULT_MAX_CONNECTIONS = 100
+    _DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+    _DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+    def __init__(self, config: HttpConfig) -> None:
+        self._limits = httpx.Limits(
+            max_connections=config.get(
+                "max_connections", self._DEFAULT_MAX_CONNECTIONS
+            ),
+            max_keepalive_connections=config.get(
+                "max_keepalive_connections", self._DEFAULT_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            keepalive_expiry=config.get(
+                "keepalive_expiry", self._DEFAULT_KEEPALIVE_EXPIRY
+            ),
+        )
+        self._http2 = config.get("http2", False)
+        if self._http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 needs the 'h2' package, falling back to HTTP/1.1")
+            self._http2 = False
+
+        self._pools: dict[str | None, httpx.HTTPTransport] = {}
+        self._stats: dict[str, PoolStats] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, host: str, *, connection: bool = False) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(host, PoolStats())
+            if connection:
+                stats.connections += 1
+            else:
+                stats.requests += 1
+
+    def _pool(self, proxy: str | None) -> httpx.HTTPTransport:
+        with self._lock:
+            if proxy not in self._pools:
+                self._pools[proxy] = httpx.HTTPTransport(
+                    proxy=proxy, limits=self._limits, http2=self._http2
+                )
+            return self._pools[proxy]
+
+    def client(self, *, proxy: str | None = None, **kwargs: Any) -> httpx.Client:
+        """An `httpx.Client` sending through the pool of `proxy`."""
+        return httpx.Client(transport=_SharedPool(self._pool(proxy), self), **kwargs)
+
+    @property
+    def stats(self) -> dict[str, PoolStats]:
+        with self._lock:
+            return {
+                host: PoolStats(stats.requests, stats.connections)
+                for host, stats in self._stats.items()
+            }
+
+    def close(self) -> None:
+        for host, stats in sorted(self.stats.items()):
+            logger.info(
+                "Sent %s requests to '%s' over %s connections (%s reused)",
+                stats.requests,
+                host,
+                stats.connections,
+                stats.reused,
+            )
+
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.close()
+
+
+class PooledGhostfolio(Ghostfolio):
+    """
+    Ghostfolio client sending through a shared `HttpTransport`. The SDK opens a
+    new connection for every request.
+    """
+
+    def __init__(self, token: str, host: str, transport: HttpTransport) -> None:
+        super().__init__(token, host=host)
+        self._http = transport.client(timeout=httpx.Timeout(60.0))
+        # Concurrent first requests would authenticate once each
+        self._auth_lock = threading.Lock()
+
+    def _send(self, method: str, url: str, **kwargs: Any) -> dict[str, Any]:
+        r = self._http.request(method, url, **kwargs)
+        if r.is_error:
+            logger.error(r.text)
+        _ = r.raise_for_status()
+        return r.json()
+
+    @property
+    def _auth(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self._jwt_token}"}
+
+    @override
+    def _refresh_jwt_token(self) -> None:
+        with self._auth_lock:
+            if self._jwt_token is not None and self._jwt_token_expiry > datetime.now():  # ty:ignore[unsupported-operator]
+                return
+
+            self._jwt_token = self._send(
+                "POST",
+                f"{self.host}/api/v1/auth/anonymous/",
+                data={"accessToken": self._token},
+            )["authToken"]
+            self._jwt_token_expiry = datetime.now() + timedelta(days=30)
+
+    @override
+    def get(
+        self,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        api_version: str = "v1",
+    ) -> dict[str, Any]:
+        self._refresh_jwt_token()
+        return self._send(
+            "GET",
+            self._url(endpoint, api_version=api_version),
+            headers=self._auth,
+            params=params,
+        )
+
+    @override
+    def post(
+        self,
+        endpoint: str,
+        data: dict[str, Any] | None = None,
+        api_version: str = "v1",
+        object_id: str | None = None,
+    ) -> dict[str, Any]:
+        self._refresh_jwt_token()
+        return self._send(
+            "POST",
+            self._url(endpoint, object_id, api_version),
+            headers=self._auth,
+            json=data,
+        )
+
+    @override
+    def put(
+        self,
+        endpoint: str,
+        data: dict[str, Any] | None = None,
+        api_version: str = "v1",
+        object_id: str | None = None,
+    ) -> dict[str, Any]:
+        self._refresh_jwt_token()
+        return self._send(
+            "PUT",
+            self._url(endpoint, object_id, api_version),
+            headers=self._auth,
+            json=data,
+        )
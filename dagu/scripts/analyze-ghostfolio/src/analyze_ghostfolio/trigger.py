@@ -0,0 +1,95 @@
+"""
+Change trigger of `--if-changed` runs.
+
+`sync-ghostfolio` writes a summary of the changes of every run to its Ghostfolio
+accounts. The trigger adds up the summaries written since the latest analysis
+per currency, so the analysis only runs after syncs that moved enough money in
+any of them. Amounts are not converted, which would need exchange rates. It
+only reads small JSON files and imports nothing heavy, so skipping takes
+milliseconds.
+"""
+
+import json
+import logging
+from collections import defaultdict
+from pathlib import Path
+from typing import TypedDict, final
+
+logger = logging.getLogger(__name__)
+
+
+class AccountChanges(TypedDict):
+    activities: int
+    amounts: dict[str, float]  # Quantity times unit price plus fees, per currency
+    balance_change: float
+    currency: str | None  # Of the account and its balance change
+
+
+class RunSummary(TypedDict):
+    started: str
+    success: bool
+    accounts: dict[str, AccountChanges]
+
+
+@final
+class ChangeTrigger:
+    """
+    Sums the activity amounts and absolute cash balance changes per currency of
+    the run summaries in `summaries` newer than the one recorded in `state`,
+    which `mark_analyzed` moves forward once an analysis succeeded.
+    """
+
+    DEFAULT_SUMMARIES = Path("../sync-ghostfolio/reports/summaries")
+    DEFAULT_STATE = Path(".cache/last-sync-summary")
+
+    def __init__(self, summaries: Path, state: Path, *, min_change: float) -> None:
+        self._summaries = summaries
+        self._state = state
+        self._min_change = min_change
+        self._pending: list[Path] | None = None
+
+    def _pending_summaries(self) -> list[Path]:
+        if self._pending is None:
+            # Named `summary-<time>.json`, so names sort by time
+            last = self._state.read_text().strip() if self._state.exists() else ""
+            self._pending = sorted(
+                path
+                for path in self._summaries.glob("summary-*.json")
+                if path.name > last
+            )
+        return self._pending
+
+    def change(self) -> dict[str, float]:
+        """Total change per currency of the syncs since the latest analysis."""
+        totals: defaultdict[str, float] = defaultdict(float)
+        for path in self._pending_summaries():
+            summary: RunSummary = json.loads(path.read_text())
+            for changes in summary["accounts"].values():
+                for currency, amount in changes["amounts"].items():
+                    totals[currency] += abs(amount)
+                if changes["currency"] is not None:
+                    totals[changes["currency"]] += abs(changes["balance_change"])
+
+        return dict(totals)
+
+    def should_analyze(self) -> bool:
+        change = self.change()
+        logger.info(
+            "%s sync runs since the latest analysis changed %s (threshold %.2f)",
+            len(self._pending_summaries()),
+            ", ".join(
+                f"{amount:.2f} {currency}"
+                for currency, amount in sorted(change.items())
+            )
+            or "nothing",
+            self._min_change,
+        )
+        return any(amount >= self._min_change for amount in change.values())
+
+    def mark_analyzed(self) -> None:
+        """Count the pending summaries as analyzed."""
+        if not (pending := self._pending_summaries()):
+            return
+
+        self._state.parent.mkdir(parents=True, exist_ok=True)
+        _ = self._state.write_text(pending[-1].name)
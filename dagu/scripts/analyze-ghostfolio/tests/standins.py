@@ -0,0 +1,99 @@
+"""
+Local stand-in for the Gemini `streamGenerateContent` endpoint, streaming
+scripted completions as server-sent events. Point `llm.GEMINI_API_URL` at
+`GeminiStandIn.url` to use it.
+"""
+
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, override
+
+_STREAM_PATH = re.compile(r"^/models/(?P<model>[\w.-]+):streamGenerateContent")
+
+
+@dataclass
+class ScriptedModel:
+    """Completion of a stand-in model."""
+
+    chunks: list[str] = field(default_factory=list)
+    # Seconds before every chunk
+    delay: float = 0.0
+    # Seconds before the first chunk, after an empty part sent right away
+    first_delay: float = 0.0
+    status: HTTPStatus = HTTPStatus.OK
+
+
+class GeminiStandIn:
+    """Threaded HTTP server streaming the completion scripted for each model."""
+
+    def __init__(self, models: dict[str, ScriptedModel]) -> None:
+        self.models = models
+        # Models requested and their prompts, in order
+        self.requests: list[str] = []
+        self.prompts: list[str] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        standin = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            # The event stream ends when the connection is closed
+            protocol_version = "HTTP/1.0"
+
+            def _event(self, text: str) -> None:
+                candidate = {"content": {"role": "model", "parts": [{"text": text}]}}
+                event = json.dumps({"candidates": [candidate]})
+                _ = self.wfile.write(f"data: {event}\r\n\r\n".encode())
+                self.wfile.flush()
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if (m := _STREAM_PATH.match(self.path)) is None or (
+                    model := standin.models.get(m["model"])
+                ) is None:
+                    self.send_error(HTTPStatus.NOT_FOUND)
+                    return
+
+                standin.requests.append(m["model"])
+                standin.prompts.append(body["contents"][0]["parts"][0]["text"])
+                if model.status != HTTPStatus.OK:
+                    self.send_error(model.status)
+                    return
+
+                self.send_response(HTTPStatus.OK)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                try:
+                    if model.first_delay:
+                        self._event("")
+                        time.sleep(model.first_delay)
+                    for chunk in model.chunks:
+                        time.sleep(model.delay)
+                        self._event(chunk)
+                except ConnectionError:
+                    # Cancelled by the client
+                    pass
+
+            @override
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return RequestHandler
@@ -0,0 +1,180 @@
+"""
+Analyses against a local Gemini stand-in:
+
+    PYTHONPATH=src uv run python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Any, override
+from unittest import mock
+
+from analyze_ghostfolio import llm
+from analyze_ghostfolio.analyzer import GhostfolioAnalyzer
+from analyze_ghostfolio.transport import HttpTransport
+from standins import GeminiStandIn, ScriptedModel
+
+
+class _Ghostfolio:
+    """Ghostfolio client returning fixed holdings."""
+
+    def __init__(self, allocations: dict[str, tuple[str, float]]) -> None:
+        self.allocations = allocations
+
+    def holdings(self) -> dict[str, Any]:
+        return {
+            "holdings": [
+                {
+                    "symbol": symbol,
+                    "name": symbol,
+                    "assetClass": asset_class,
+                    "assetSubClass": "ETF",
+                    "currency": "EUR",
+                    "allocationInPercentage": allocation,
+                    "grossPerformancePercent": 0.1,
+                    "sectors": [{"name": "Technology", "weight": 1.0}],
+                    "countries": [{"name": "United States", "weight": 1.0}],
+                    "tags": [],
+                    "dateOfFirstActivity": "2020-01-01",
+                }
+                for symbol, (asset_class, allocation) in self.allocations.items()
+            ]
+        }
+
+    def accounts(self) -> dict[str, Any]:
+        return {
+            "accounts": [
+                {
+                    "name": "Broker",
+                    "currency": "EUR",
+                    "isExcluded": False,
+                    "allocationInPercentage": 1.0,
+                    "updatedAt": "2026-01-01T00:00:00",
+                    "platform": None,
+                }
+            ]
+        }
+
+    def performance(self, date_range: str) -> dict[str, Any]:
+        return {
+            "performance": {
+                "netPerformancePercentage": 0.1,
+                "netPerformancePercentageWithCurrencyEffect": 0.1,
+            }
+        }
+
+
+class _AnalyzerTestCase(unittest.TestCase):
+    @override
+    def setUp(self) -> None:
+        self.standin = GeminiStandIn({"model": ScriptedModel(["Analysis"])})
+        self.standin.start()
+        self.addCleanup(self.standin.stop)
+        self.sent: list[str] = []
+        for patch in (
+            mock.patch.object(llm, "GEMINI_API_URL", self.standin.url),
+            mock.patch.dict(os.environ, {"GEMINI_API_KEY": "test"}),
+            mock.patch.object(
+                GhostfolioAnalyzer,
+                "_send",
+                lambda _, content, **kwargs: self.sent.append(content),
+            ),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.profile = self.dir / "profile.toml"
+        _ = self.profile.write_text('objective = "growth"\n')
+        self.ghostfolio = _Ghostfolio(
+            {"VWCE": ("EQUITY", 0.7), "EIMI": ("EQUITY", 0.2), "BTC": ("CRYPTO", 0.1)}
+        )
+        self.transport = HttpTransport({})
+        self.addCleanup(self.transport.close)
+
+    def _analyze(
+        self, *, force: bool = False, map_reduce: bool = True, deadline: float = 600.0
+    ) -> None:
+        GhostfolioAnalyzer(
+            self.ghostfolio,  # ty:ignore[invalid-argument-type]
+            ["gemini/model"],
+            self.profile,
+            "ntfy",
+            cache_dir=self.dir / "cache",
+            reports_dir=self.dir / "reports",
+            hedge_delay=5.0,
+            deadline=deadline,
+            transport=self.transport,
+        ).analyze_portfolio(force=force, map_reduce=map_reduce)
+
+
+class MapReduceTest(_AnalyzerTestCase):
+    def test_slices_and_reduce_are_requested(self) -> None:
+        self._analyze()
+
+        # One request per asset class, then the reduce prompt
+        self.assertEqual(len(self.standin.requests), 3)
+        self.assertEqual(self.sent, ["Analysis"])
+
+    def test_unchanged_portfolio_skips_the_map_phase(self) -> None:
+        self._analyze()
+        self.standin.requests.clear()
+        self.ghostfolio.allocations["VWCE"] = ("EQUITY", 0.705)
+
+        self._analyze()
+        self.assertEqual(self.standin.requests, [])
+        self.assertIn("No material change", self.sent[-1])
+
+    def test_changed_profile_is_analyzed_again(self) -> None:
+        self._analyze()
+        self.standin.requests.clear()
+        _ = self.profile.write_text('objective = "income"\n')
+
+        self._analyze()
+        self.assertEqual(len(self.standin.requests), 3)
+
+    def test_force_bypasses_the_slice_cache(self) -> None:
+        self._analyze()
+        self.standin.requests.clear()
+
+        self._analyze(force=True)
+        self.assertEqual(len(self.standin.requests), 3)
+
+    def test_empty_portfolio_is_analyzed(self) -> None:
+        self.ghostfolio.allocations.clear()
+
+        self._analyze()
+        self.assertEqual(len(self.standin.requests), 1)
+
+    def test_reduce_only_gets_the_time_left_by_the_slices(self) -> None:
+        self.standin.models["model"] = ScriptedModel(["Analysis"], delay=0.5)
+
+        # Each phase fits the deadline on its own, but not both together
+        self._analyze(deadline=0.8)
+        self.assertEqual(len(self.standin.requests), 3)
+        self.assertIn("Partial analysis", self.sent[-1])
+
+
+class PromptTest(_AnalyzerTestCase):
+    def test_prompt_keeps_exact_values(self) -> None:
+        self.ghostfolio.allocations["DUST"] = ("EQUITY", 0.002)
+
+        self._analyze(map_reduce=False)
+        self.assertIn(
+            "| DUST | DUST | EQUITY | ETF | EUR | 0.2% |", self.standin.prompts[0]
+        )
+
+    def test_noise_below_the_precision_reuses_the_cached_analysis(self) -> None:
+        self._analyze(map_reduce=False)
+        self.ghostfolio.allocations["VWCE"] = ("EQUITY", 0.7001)
+
+        self._analyze(map_reduce=False, force=False)
+        self.assertEqual(len(self.standin.requests), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Hedged LLM streaming against a local Gemini stand-in:
+
+    PYTHONPATH=src uv run python -m unittest discover tests
+"""
+
+import os
+import unittest
+from http import HTTPStatus
+from typing import override
+from unittest import mock
+
+import httpx
+from analyze_ghostfolio import llm
+from analyze_ghostfolio.models import ProviderStats
+from analyze_ghostfolio.transport import HttpTransport
+from standins import GeminiStandIn, ScriptedModel
+
+_FIRST = "gemini/first"
+_SECOND = "gemini/second"
+
+
+class StreamTest(unittest.TestCase):
+    @override
+    def setUp(self) -> None:
+        self.standin = GeminiStandIn({})
+        self.standin.start()
+        self.addCleanup(self.standin.stop)
+        for patch in (
+            mock.patch.object(llm, "GEMINI_API_URL", self.standin.url),
+            mock.patch.dict(os.environ, {"GEMINI_API_KEY": "test"}),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.transport = HttpTransport({})
+        self.addCleanup(self.transport.close)
+        self.stats: dict[str, ProviderStats] = {}
+
+    def _stream(self, *, hedge_delay: float = 0.2, timeout: float = 5.0) -> str:
+        return "".join(
+            llm.stream(
+                [_FIRST, _SECOND],
+                "prompt",
+                timeout=timeout,
+                hedge_delay=hedge_delay,
+                stats=self.stats,
+                transport=self.transport,
+            )
+        )
+
+    def test_first_model_answers_without_hedging(self) -> None:
+        self.standin.models = {
+            "first": ScriptedModel(["Hello ", "world"]),
+            "second": ScriptedModel(["Other"]),
+        }
+
+        self.assertEqual(self._stream(), "Hello world")
+        self.assertEqual(self.standin.requests, ["first"])
+        self.assertEqual(self.stats[_FIRST]["wins"], 1)
+
+    def test_slow_model_is_hedged(self) -> None:
+        self.standin.models = {
+            "first": ScriptedModel(["Slow"], delay=2.0),
+            "second": ScriptedModel(["Fast"]),
+        }
+
+        self.assertEqual(self._stream(), "Fast")
+        self.assertEqual(self.standin.requests, ["first", "second"])
+        self.assertEqual(self.stats[_SECOND]["wins"], 1)
+        self.assertEqual(self.stats[_FIRST]["wins"], 0)
+
+    def test_empty_parts_do_not_win(self) -> None:
+        self.standin.models = {
+            # Sends an empty part right away, its text only after a while
+            "first": ScriptedModel(["Slow"], first_delay=2.0),
+            "second": ScriptedModel(["Fast"]),
+        }
+
+        self.assertEqual(self._stream(), "Fast")
+        self.assertEqual(self.stats[_SECOND]["wins"], 1)
+
+    def test_completion_without_text_fails_over(self) -> None:
+        self.standin.models = {
+            "first": ScriptedModel([""]),
+            "second": ScriptedModel(["Answer"]),
+        }
+
+        self.assertEqual(self._stream(hedge_delay=5.0), "Answer")
+        self.assertEqual(self.stats[_FIRST]["errors"], 1)
+        self.assertEqual(self.stats[_SECOND]["wins"], 1)
+
+    def test_failing_model_fails_over(self) -> None:
+        self.standin.models = {
+            "first": ScriptedModel(status=HTTPStatus.SERVICE_UNAVAILABLE),
+            "second": ScriptedModel(["Answer"]),
+        }
+
+        self.assertEqual(self._stream(hedge_delay=5.0), "Answer")
+        self.assertEqual(self.stats[_FIRST]["errors"], 1)
+
+    def test_every_model_failing_raises(self) -> None:
+        self.standin.models = {
+            "first": ScriptedModel([""]),
+            "second": ScriptedModel(status=HTTPStatus.SERVICE_UNAVAILABLE),
+        }
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            _ = self._stream()
+
+    def test_deadline_raises_timeout(self) -> None:
+        self.standin.models = {
+            "first": ScriptedModel(["Slow"], delay=2.0),
+            "second": ScriptedModel(["Slow"], delay=2.0),
+        }
+
+        with self.assertRaises(TimeoutError):
+            _ = self._stream(timeout=0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
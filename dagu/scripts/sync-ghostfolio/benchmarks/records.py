@@ -0,0 +1,80 @@
+"""
+Memory retained by activity and transaction records, against the equivalent
+dicts (the Ghostfolio import JSON of activities), isolated from the HTTP
+responses that dominate the scenario peaks:
+
+    uv run python -m benchmarks.records --count 100000
+"""
+
+import argparse
+import json
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+
+from sync_ghostfolio.synchronizers._models import (
+    Activity,
+    ActivityType,
+    DataSource,
+    EthTx,
+)
+
+
+def _activity(i: int) -> Activity:
+    return Activity(
+        account_id="00000000-0000-0000-0000-000000000000",
+        comment=f"ID: {i:012d}",
+        currency="EUR",
+        data_source=DataSource.YAHOO,
+        date=f"2024-01-{i % 28 + 1:02d}",
+        fee=0.0,
+        quantity=float(i % 100 + 1),
+        symbol="0P0000YXKS.F",
+        type=ActivityType.BUY,
+        unit_price=100.0 + i % 7,
+    )
+
+
+def _eth_tx(i: int) -> EthTx:
+    return EthTx(
+        id=f"0x{i:064x}",
+        value=Decimal(i) / 1000,
+        fee=Decimal(21) / 1_000_000,
+        executed_at=datetime(2024, 1, 1, tzinfo=UTC) + timedelta(minutes=i),
+        block=18_000_000 + i,
+    )
+
+
+def _retained_mb(build: Callable[[], list[object]]) -> float:
+    tracemalloc.start()
+    records = build()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return round(retained / 2**20, 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks record memory")
+    _ = parser.add_argument("--count", type=int, default=100_000)
+    count = parser.parse_args().count
+
+    results = {
+        "activity_records_mb": _retained_mb(
+            lambda: [_activity(i) for i in range(count)]
+        ),
+        "activity_dicts_mb": _retained_mb(
+            lambda: [_activity(i).to_import() for i in range(count)]
+        ),
+        "eth_tx_records_mb": _retained_mb(lambda: [_eth_tx(i) for i in range(count)]),
+        "eth_tx_dicts_mb": _retained_mb(
+            lambda: [asdict(_eth_tx(i)) for i in range(count)]
+        ),
+    }
+    print(json.dumps({"count": count, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
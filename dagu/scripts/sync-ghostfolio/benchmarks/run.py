@@ -0,0 +1,498 @@
+"""
+Scale benchmarks of the synchronizers against local stand-in servers.
+
+Every scenario runs in its own process, so peak RSS is not shared between
+scenarios, and reports wall time, HTTP requests, new HTTP connections, peak RSS
+and (in a second, traced process) peak traced allocations. Compare against a
+saved baseline to catch regressions:
+
+    uv run python -m benchmarks.run --save baseline.json
+    uv run python -m benchmarks.run --baseline baseline.json
+"""
+
+import argparse
+import json
+import logging
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+from sync_ghostfolio.metrics import MetricsRecorder
+from sync_ghostfolio.models import Synchronizer
+from sync_ghostfolio.synchronizers._symbols import SymbolResolver
+from sync_ghostfolio.transport import HttpTransport, PooledGhostfolio
+
+from . import standins
+from .standins import StandIn
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    description: str
+    # Fills the stand-in server with the synthetic data of the scenario
+    populate: Callable[[StandIn, float], None]
+    # Builds the synchronizer against the stand-in server URL and a cache dir
+    build: Callable[[str, Path], Synchronizer]
+    # Run once before measuring, e.g. to fill the transaction cache
+    warm: bool = False
+
+
+def _clients(
+    url: str, latency_cache: Path | None = None
+) -> tuple[PooledGhostfolio, HttpTransport]:
+    transport = HttpTransport({}, latency_cache=latency_cache)
+    ghostfolio = PooledGhostfolio("bench", url + standins.GHOSTFOLIO_PREFIX, transport)
+    return ghostfolio, transport
+
+
+def _symbols(cache_dir: Path) -> SymbolResolver:
+    # Yahoo Finance has no stand-in, resolve synthetic ISINs locally
+    return SymbolResolver(
+        cache_dir / "isin-symbols.json",
+        lookup=standins.yahoo_symbol,
+    )
+
+
+def _populate_btc(standin: StandIn, scale: float) -> None:
+    standin.btc_wallet = standins.btc_wallet(max(int(500 * scale), 1), 3)
+
+
+def _build_btc(url: str, cache_dir: Path) -> Synchronizer:
+    from sync_ghostfolio.synchronizers.crypto import BtcSynchronizer
+
+    BtcSynchronizer.COINGECKO_URL = url + standins.COINGECKO_PREFIX
+    ghostfolio, transport = _clients(url)
+    return BtcSynchronizer(
+        ghostfolio,
+        standins.ACCOUNT_ID,
+        "bench",
+        [standins.zpub()],
+        provider_url=url + standins.MEMPOOL_PREFIX,
+        cache_dir=cache_dir,
+        transport=transport,
+    )
+
+
+def _populate_btc_wallets(standin: StandIn, scale: float) -> None:
+    for account in range(4):
+        standin.btc_wallet |= standins.btc_wallet(max(int(125 * scale), 1), 3, account)
+
+
+def _build_btc_wallets(url: str, cache_dir: Path) -> Synchronizer:
+    from sync_ghostfolio.synchronizers.crypto import BtcSynchronizer
+
+    BtcSynchronizer.COINGECKO_URL = url + standins.COINGECKO_PREFIX
+    ghostfolio, transport = _clients(url)
+    return BtcSynchronizer(
+        ghostfolio,
+        standins.ACCOUNT_ID,
+        "bench",
+        [standins.zpub(account) for account in range(4)],
+        provider_url=url + standins.MEMPOOL_PREFIX,
+        cache_dir=cache_dir,
+        transport=transport,
+    )
+
+
+# Accepts connections (through the listen backlog) and never answers, like a
+# hung onion service
+_hung_server: socket.socket | None = None
+
+
+def _build_btc_hung_provider(url: str, cache_dir: Path) -> Synchronizer:
+    from sync_ghostfolio.synchronizers.crypto import BtcSynchronizer
+
+    global _hung_server
+    _hung_server = socket.create_server(("127.0.0.1", 0))
+    hung_host = f"127.0.0.1:{_hung_server.getsockname()[1]}"
+    # Latencies of previous runs, which bring the read timeout down to seconds
+    latency_cache = cache_dir / "http-latency.json"
+    _ = latency_cache.write_text(json.dumps({hung_host: [0.05] * 20}))
+
+    BtcSynchronizer.COINGECKO_URL = url + standins.COINGECKO_PREFIX
+    BtcSynchronizer._DEFAULT_PROVIDER_URL = url + standins.MEMPOOL_PREFIX
+    ghostfolio, transport = _clients(url, latency_cache)
+    return BtcSynchronizer(
+        ghostfolio,
+        standins.ACCOUNT_ID,
+        "bench",
+        [standins.zpub()],
+        provider_url=f"http://{hung_host}",
+        clearnet_fallback=True,
+        cache_dir=cache_dir,
+        transport=transport,
+    )
+
+
+def _populate_eth(standin: StandIn, scale: float) -> None:
+    standin.eth_transactions = {
+        standins.ETH_ADDRESS: standins.eth_transactions(max(int(20_000 * scale), 1))
+    }
+
+
+def _build_eth(url: str, cache_dir: Path) -> Synchronizer:
+    from sync_ghostfolio.synchronizers.crypto import EthSynchronizer
+
+    EthSynchronizer.COINGECKO_URL = url + standins.COINGECKO_PREFIX
+    ghostfolio, transport = _clients(url)
+    return EthSynchronizer(
+        ghostfolio,
+        standins.ACCOUNT_ID,
+        "bench",
+        [standins.ETH_ADDRESS],
+        provider_url=url + standins.BLOCKSCOUT_PREFIX,
+        cache_dir=cache_dir,
+        transport=transport,
+    )
+
+
+def _populate_eth_wallets(standin: StandIn, scale: float) -> None:
+    standin.eth_transactions = standins.eth_wallets(max(int(5_000 * scale), 1))
+
+
+def _build_eth_wallets(url: str, cache_dir: Path) -> Synchronizer:
+    from sync_ghostfolio.synchronizers.crypto import EthSynchronizer
+
+    EthSynchronizer.COINGECKO_URL = url + standins.COINGECKO_PREFIX
+    ghostfolio, transport = _clients(url)
+    return EthSynchronizer(
+        ghostfolio,
+        standins.ACCOUNT_ID,
+        "bench",
+        standins.ETH_ADDRESSES,
+        provider_url=url + standins.BLOCKSCOUT_PREFIX,
+        cache_dir=cache_dir,
+        transport=transport,
+    )
+
+
+def _populate_eth_tokens(standin: StandIn, scale: float) -> None:
+    count = max(int(5_000 * scale), 1)
+    standin.eth_transactions = {standins.ETH_ADDRESS: standins.eth_transactions(count)}
+    standin.eth_token_transfers = {
+        standins.ETH_ADDRESS: {
+            contract: standins.token_transfers(count, contract)
+            for contract in standins.TOKEN_CONTRACTS
+        }
+    }
+    standin.eth_latest_block = 15_000_000 + count + 100
+
+
+def _build_eth_tokens(url: str, cache_dir: Path) -> Synchronizer:
+    from sync_ghostfolio.synchronizers.crypto import EthSynchronizer
+
+    EthSynchronizer.COINGECKO_URL = url + standins.COINGECKO_PREFIX
+    ghostfolio, transport = _clients(url)
+    return EthSynchronizer(
+        ghostfolio,
+        standins.ACCOUNT_ID,
+        "bench",
+        [standins.ETH_ADDRESS],
+        provider_url=url + standins.BLOCKSCOUT_PREFIX,
+        tokens={
+            contract: f"bench-token-{i}"
+            for i, contract in enumerate(standins.TOKEN_CONTRACTS)
+        },
+        cache_dir=cache_dir,
+        transport=transport,
+    )
+
+
+def _populate_indexa(standin: StandIn, scale: float) -> None:
+    existing = max(int(10_000 * scale), 1)
+    standin.indexa_transactions = standins.indexa_transactions(existing + 50)
+    standin.ghostfolio_activities = standins.ghostfolio_activities(
+        [
+            (
+                tx["reference"],
+                standins.yahoo_symbol(tx["instrument"]["isin_code"]),
+                tx["titles"],
+            )
+            for tx in standin.indexa_transactions[:existing]
+        ]
+    )
+
+
+def _build_indexa(url: str, cache_dir: Path) -> Synchronizer:
+    from sync_ghostfolio.synchronizers import indexa
+
+    indexa.IndexaCapitalSynchronizer.BASE_URL = url + standins.INDEXA_PREFIX
+    ghostfolio, transport = _clients(url)
+    return indexa.IndexaCapitalSynchronizer(
+        ghostfolio,
+        standins.ACCOUNT_ID,
+        "bench",
+        standins.INDEXA_ACCOUNT,
+        transport=transport,
+        symbols=_symbols(cache_dir),
+    )
+
+
+def _populate_myinvestor(standin: StandIn, scale: float) -> None:
+    existing = max(int(10_000 * scale), 1)
+    standin.myinvestor_orders = standins.myinvestor_orders(existing + 50)
+    standin.ghostfolio_activities = standins.ghostfolio_activities(
+        [
+            (
+                order["reference"],
+                standins.yahoo_symbol(order["isin"]),
+                float(order["shares"]),
+            )
+            for order in standin.myinvestor_orders[:existing]
+        ]
+    )
+
+
+def _build_myinvestor(url: str, cache_dir: Path) -> Synchronizer:
+    from sync_ghostfolio.synchronizers import myinvestor
+
+    myinvestor.MyInvestorSynchronizer.BASE_URL = url + standins.MYINVESTOR_PREFIX
+    ghostfolio, transport = _clients(url)
+    return myinvestor.MyInvestorSynchronizer(
+        ghostfolio,
+        standins.ACCOUNT_ID,
+        "bench",
+        transport=transport,
+        symbols=_symbols(cache_dir),
+    )
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario(
+            "btc-500-addresses",
+            "zpub wallet with 500 used addresses, cold transaction cache",
+            _populate_btc,
+            _build_btc,
+        ),
+        Scenario(
+            "btc-500-addresses-cached",
+            "zpub wallet with 500 used addresses, warm transaction cache",
+            _populate_btc,
+            _build_btc,
+            warm=True,
+        ),
+        Scenario(
+            "btc-4-wallets",
+            "4 zpub wallets with 125 used addresses each, cold transaction cache",
+            _populate_btc_wallets,
+            _build_btc_wallets,
+        ),
+        Scenario(
+            "btc-hung-provider",
+            "zpub wallet with 500 used addresses, hung provider, clearnet fallback",
+            _populate_btc,
+            _build_btc_hung_provider,
+        ),
+        Scenario(
+            "eth-20k-transactions",
+            "ETH address with 20k transactions, cold transaction cache",
+            _populate_eth,
+            _build_eth,
+        ),
+        Scenario(
+            "eth-20k-transactions-cached",
+            "ETH address with 20k transactions, warm transaction cache",
+            _populate_eth,
+            _build_eth,
+            warm=True,
+        ),
+        Scenario(
+            "eth-4-wallets",
+            "4 ETH addresses with 5k transactions each, 10% between them",
+            _populate_eth_wallets,
+            _build_eth_wallets,
+        ),
+        Scenario(
+            "eth-4-tokens",
+            "ETH address with 5k transactions and 5k transfers of 4 tokens each",
+            _populate_eth_tokens,
+            _build_eth_tokens,
+        ),
+        Scenario(
+            "eth-4-tokens-cached",
+            "ETH address with 5k transactions and 4 tokens, warm transaction cache",
+            _populate_eth_tokens,
+            _build_eth_tokens,
+            warm=True,
+        ),
+        Scenario(
+            "indexa-10k-activities",
+            "Indexa account with 10k existing Ghostfolio activities, 50 new",
+            _populate_indexa,
+            _build_indexa,
+        ),
+        Scenario(
+            "myinvestor-10k-activities",
+            "MyInvestor account with 10k existing Ghostfolio activities, 50 new",
+            _populate_myinvestor,
+            _build_myinvestor,
+        ),
+    )
+}
+
+# Results that are compared against the baseline
+_COMPARED = (
+    "wall_seconds",
+    "requests",
+    "connections",
+    "peak_rss_mb",
+    "peak_traced_mb",
+)
+
+
+def _peak_rss_mb() -> float:
+    # `ru_maxrss` keeps the parent's peak across fork + exec, VmHWM doesn't
+    status = Path("/proc/self/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _measure(scenario: Scenario, url: str, allocations: bool) -> dict[str, float]:
+    """Run `scenario` in this process. Called in a child process per scenario."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = Path(tmp)
+        recorder = MetricsRecorder(
+            {
+                "report_dir": tmp,
+                "summary_dir": tmp,
+                "textfile": str(cache_dir / "bench.prom"),
+            }
+        )
+
+        if scenario.warm:
+            scenario.build(url, cache_dir).sync()
+
+        synchronizer = scenario.build(url, cache_dir)
+        if allocations:
+            tracemalloc.start()
+
+        start = time.perf_counter()
+        with recorder.run("bench", scenario.name) as run:
+            synchronizer.sync()
+        wall = time.perf_counter() - start
+
+        if allocations:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return {"peak_traced_mb": round(peak / 2**20, 1)}
+
+    traffic = [host for stage in run.stages.values() for host in stage.hosts.values()]
+    return {
+        "wall_seconds": round(wall, 3),
+        "requests": sum(host.requests for host in traffic),
+        "connections": sum(host.connections for host in traffic),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_child(scenario: str, url: str, allocations: bool) -> dict[str, float]:
+    command = [sys.executable, "-m", "benchmarks.run", "--child", scenario, url]
+    if allocations:
+        command.append("--allocations")
+
+    result = subprocess.run(command, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout)
+
+
+def _compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float,
+) -> list[str]:
+    regressions: list[str] = []
+    for name, result in results.items():
+        for metric in _COMPARED:
+            before = baseline.get(name, {}).get(metric)
+            after = result.get(metric)
+            if before and after is not None and after > before * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before} -> {after}")
+
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks sync-ghostfolio")
+    _ = parser.add_argument(
+        "scenarios",
+        nargs="*",
+        metavar="scenario",
+        help=f"one of {', '.join(SCENARIOS)} (default: all)",
+    )
+    _ = parser.add_argument(
+        "--scale", type=float, default=1.0, help="multiplier of the data sizes"
+    )
+    _ = parser.add_argument(
+        "--no-allocations", action="store_true", help="skip the traced run"
+    )
+    _ = parser.add_argument("--save", type=Path, help="write the results as JSON")
+    _ = parser.add_argument(
+        "--baseline", type=Path, help="fail on regressions against these results"
+    )
+    _ = parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed relative increase over the baseline",
+    )
+    args = parser.parse_args()
+    if unknown := set(args.scenarios) - SCENARIOS.keys():
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    return args
+
+
+def main() -> None:
+    if sys.argv[1:2] == ["--child"]:
+        scenario, url, *flags = sys.argv[2:]
+        logging.disable(logging.INFO)
+        print(json.dumps(_measure(SCENARIOS[scenario], url, "--allocations" in flags)))
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    args = parse_args()
+
+    results: dict[str, dict[str, float]] = {}
+    for name in args.scenarios or SCENARIOS:
+        scenario = SCENARIOS[name]
+        logger.info("Running '%s': %s", name, scenario.description)
+
+        standin = StandIn()
+        scenario.populate(standin, args.scale)
+        standin.start()
+        try:
+            results[name] = _run_child(name, standin.url, allocations=False)
+            if not args.no_allocations:
+                results[name] |= _run_child(name, standin.url, allocations=True)
+        finally:
+            standin.stop()
+
+        logger.info("  %s", results[name])
+
+    print(json.dumps(results, indent=2))
+    if args.save:
+        _ = args.save.write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if regressions := _compare(results, baseline, args.tolerance):
+            sys.exit("Regressions:\n" + "\n".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,602 @@
+"""
+Local stand-in servers for every upstream API, serving synthetic data.
+
+One `StandIn` server answers for all upstreams (mempool, Blockscout, CoinGecko,
+Indexa, MyInvestor and Ghostfolio), each under its own path prefix, so
+synchronizers are pointed at it through their base URLs. `MempoolWebsocket`
+stands in for the mempool `track-addresses` websocket feed.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, override
+from urllib.parse import parse_qs, urlsplit
+
+from bip_utils import Bip44Changes, Bip84, Bip84Coins
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.server import ServerConnection, serve
+
+Handler = Callable[[re.Match[str], dict[str, str], Any], Any]
+
+MEMPOOL_PREFIX = "/mempool"
+BLOCKSCOUT_PREFIX = "/blockscout"
+COINGECKO_PREFIX = "/coingecko/api/v3"
+INDEXA_PREFIX = "/indexa"
+MYINVESTOR_PREFIX = "/myinvestor"
+GHOSTFOLIO_PREFIX = "/ghostfolio"
+
+ACCOUNT_ID = "00000000-0000-0000-0000-000000000000"
+ETH_ADDRESS = "0x" + "ab" * 20
+# Own wallets of the multi-wallet scenarios
+ETH_ADDRESSES = [ETH_ADDRESS, "0x" + "a1" * 20, "0x" + "a2" * 20, "0x" + "a3" * 20]
+# ERC-20 contracts of the token scenarios
+TOKEN_CONTRACTS = ["0x" + f"e{i}" * 20 for i in range(4)]
+INDEXA_ACCOUNT = "BENCH001"
+MYINVESTOR_ACCOUNT = "MI-0001"
+MYINVESTOR_CASH_ACCOUNT = "MI-CASH-0001"
+
+_BTC_PAGE_SIZE = 25
+# Far above the synthetic transactions, which are all deeply confirmed
+_BTC_TIP_HEIGHT = 1_000_000
+_ETH_PAGE_SIZE = 50
+_EPOCH = datetime(2020, 1, 1, tzinfo=UTC)
+
+
+def _id(*parts: object) -> str:
+    return hashlib.sha256(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def zpub(account: int = 0) -> str:
+    """Account-level zpub of a fixed test seed."""
+    return (
+        Bip84.FromSeed(bytes(range(64)), Bip84Coins.BITCOIN)
+        .Purpose()
+        .Coin()
+        .Account(account)
+        .PublicKey()
+        .ToExtended()
+    )
+
+
+def btc_address(index: int, account: int = 0) -> str:
+    """Receive address at `index` of the test wallet of `account`."""
+    return (
+        Bip84.FromExtendedKey(zpub(account), Bip84Coins.BITCOIN)
+        .Change(Bip44Changes.CHAIN_EXT)
+        .AddressIndex(index)
+        .PublicKey()
+        .ToAddress()
+    )
+
+
+def btc_wallet(
+    used_addresses: int, txs_per_address: int, account: int = 0
+) -> dict[str, list[dict]]:
+    """Confirmed transactions, newest first, of the first receive addresses."""
+    ctx = Bip84.FromExtendedKey(zpub(account), Bip84Coins.BITCOIN).Change(
+        Bip44Changes.CHAIN_EXT
+    )
+    wallet: dict[str, list[dict]] = {}
+    for index in range(used_addresses):
+        addr = ctx.AddressIndex(index).PublicKey().ToAddress()
+        wallet[addr] = [
+            {
+                "txid": _id("btc", addr, n),
+                "vin": [
+                    {
+                        "prevout": {
+                            "scriptpubkey_address": "bc1qsender",
+                            "value": 60_000,
+                        }
+                    }
+                ],
+                "vout": [{"scriptpubkey_address": addr, "value": 50_000 + n}],
+                "fee": 10_000 - n,
+                "status": {
+                    "confirmed": True,
+                    "block_height": index + n,
+                    "block_time": int((_EPOCH + timedelta(days=index + n)).timestamp()),
+                },
+            }
+            for n in reversed(range(txs_per_address))
+        ]
+
+    return wallet
+
+
+def _eth_tx(n: int, count: int, sender: str, salt: object = "") -> dict:
+    return {
+        "hash": "0x" + _id("eth", salt, n),
+        "value": str(10**16 + n),
+        "from": {"hash": sender},
+        "fee": {"value": str(21_000 * 10**9)},
+        "timestamp": (_EPOCH + timedelta(hours=n)).isoformat(),
+        "block_number": 15_000_000 + n,
+        "status": "ok",
+        "confirmations": 100 + count - n,
+    }
+
+
+def eth_transactions(count: int) -> list[dict]:
+    """Transactions of `ETH_ADDRESS`, newest first."""
+    return [
+        _eth_tx(n, count, ETH_ADDRESS if n % 3 == 0 else "0x" + "cd" * 20)
+        for n in reversed(range(count))
+    ]
+
+
+def eth_wallets(count: int) -> dict[str, list[dict]]:
+    """
+    Transactions of each of `ETH_ADDRESSES`, newest first. Every tenth one is a
+    transfer to the next own wallet, so it is listed by both wallets.
+    """
+    wallets: dict[str, list[dict]] = {address: [] for address in ETH_ADDRESSES}
+    for i, address in enumerate(ETH_ADDRESSES):
+        for n in reversed(range(count)):
+            if n % 10 == 0:
+                tx = _eth_tx(n, count, address, salt=i)
+                wallets[address].append(tx)
+                wallets[ETH_ADDRESSES[(i + 1) % len(ETH_ADDRESSES)]].append(tx)
+            else:
+                wallets[address].append(
+                    _eth_tx(n, count, address if n % 3 == 0 else "0x" + "cd" * 20, i)
+                )
+
+    for txs in wallets.values():
+        txs.sort(key=lambda tx: tx["timestamp"], reverse=True)
+    return wallets
+
+
+def token_transfers(count: int, contract: str) -> list[dict]:
+    """ERC-20 transfers of `contract` to and from `ETH_ADDRESS`, newest first."""
+    return [
+        {
+            "transaction_hash": "0x" + _id("erc20", contract, n),
+            "block_number": 15_000_000 + n,
+            "timestamp": (_EPOCH + timedelta(hours=n)).isoformat(),
+            "from": {"hash": ETH_ADDRESS if n % 4 == 0 else "0x" + "cd" * 20},
+            "to": {"hash": "0x" + "cd" * 20 if n % 4 == 0 else ETH_ADDRESS},
+            "total": {"value": str(10**6 * (n + 1)), "decimals": "6"},
+            "token": {"address_hash": contract},
+        }
+        for n in reversed(range(count))
+    ]
+
+
+def indexa_transactions(count: int) -> list[dict]:
+    return [
+        {
+            "reference": f"IDX{n:08d}",
+            "currency": "EUR",
+            "executed_at": f"{(_EPOCH + timedelta(days=n % 2000)).date()} 10:00:00",
+            "titles": 1.5,
+            "instrument": {
+                "isin_code": f"IE00BENCH{n % 10:03d}",
+                "name": "Bench Fund",
+            },
+            "operation_type": "SUSCRIPCIÓN FONDOS INVERSIÓN",
+            "price": 100.0 + n % 7,
+        }
+        for n in range(count)
+    ]
+
+
+def myinvestor_orders(count: int) -> list[dict]:
+    return [
+        {
+            "reference": f"MI{n:08d}",
+            "operationType": "INVESTMENT_FUNDS_SUBSCRIPTION",
+            "currency": "EUR",
+            "orderDate": f"{(_EPOCH + timedelta(days=n % 180)).date()}T10:00:00",
+            "shares": "2.5",
+            "cash": "250.0",
+            "isin": f"IE00BENCH{n % 10:03d}",
+        }
+        for n in range(count)
+    ]
+
+
+def yahoo_symbol(isin: str) -> str:
+    """Yahoo Finance symbol of a synthetic ISIN, which has no stand-in."""
+    return isin.removeprefix("IE00") + ".F"
+
+
+def ghostfolio_activities(booked: list[tuple[str, str, float]]) -> list[dict]:
+    """Existing Ghostfolio BUY activities of (reference, symbol, quantity)."""
+    return [
+        {
+            "id": _id("gf", reference),
+            "accountId": ACCOUNT_ID,
+            "comment": f"ID: {reference}",
+            "date": _EPOCH.isoformat(),
+            "type": "BUY",
+            "quantity": quantity,
+            "SymbolProfile": {"dataSource": "YAHOO", "symbol": symbol},
+        }
+        for reference, symbol, quantity in booked
+    ]
+
+
+class StandIn:
+    """
+    Threaded HTTP server answering every upstream API from in-memory data. All
+    collections are empty until set by a scenario.
+    """
+
+    def __init__(self) -> None:
+        self.btc_wallet: dict[str, list[dict]] = {}
+        self.btc_tip_height = _BTC_TIP_HEIGHT
+        self.eth_transactions: dict[str, list[dict]] = {}
+        # Per address and token contract
+        self.eth_token_transfers: dict[str, dict[str, list[dict]]] = {}
+        self.eth_latest_block = 0
+        self.indexa_transactions: list[dict] = []
+        self.myinvestor_orders: list[dict] = []
+        self.ghostfolio_activities: list[dict] = []
+        self.ghostfolio_balance = 0.0
+        self._routes: list[tuple[str, re.Pattern[str], Handler]] = []
+        self._register_routes()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _route(self, method: str, pattern: str) -> Callable[[Handler], Handler]:
+        def decorator(handler: Handler) -> Handler:
+            self._routes.append((method, re.compile(pattern + "/?$"), handler))
+            return handler
+
+        return decorator
+
+    def _register_routes(self) -> None:
+        route = self._route
+
+        @route("GET", MEMPOOL_PREFIX + r"/api/address/(?P<addr>\w+)")
+        def btc_address(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            txs = self.btc_wallet.get(m["addr"], [])
+            return {
+                "chain_stats": {
+                    "tx_count": len(txs),
+                    "funded_txo_sum": sum(
+                        vout["value"]
+                        for tx in txs
+                        for vout in tx["vout"]
+                        if vout["scriptpubkey_address"] == m["addr"]
+                    ),
+                    "spent_txo_sum": sum(
+                        vin["prevout"]["value"]
+                        for tx in txs
+                        for vin in tx["vin"]
+                        if vin["prevout"]["scriptpubkey_address"] == m["addr"]
+                    ),
+                }
+            }
+
+        @route("GET", MEMPOOL_PREFIX + r"/api/blocks/tip/height")
+        def btc_tip_height(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            return self.btc_tip_height
+
+        @route(
+            "GET",
+            MEMPOOL_PREFIX
+            + r"/api/address/(?P<addr>\w+)/txs/chain(?:/(?P<after>\w+))?",
+        )
+        def btc_chain(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            txs = self.btc_wallet.get(m["addr"], [])
+            start = 0
+            if m["after"]:
+                ids = [tx["txid"] for tx in txs]
+                start = ids.index(m["after"]) + 1
+            return txs[start : start + _BTC_PAGE_SIZE]
+
+        @route(
+            "GET", BLOCKSCOUT_PREFIX + r"/api/v2/addresses/(?P<addr>\w+)/transactions"
+        )
+        def eth_page(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            txs = self.eth_transactions.get(m["addr"], [])
+            page = int(query.get("page", 0))
+            items = txs[page * _ETH_PAGE_SIZE : (page + 1) * _ETH_PAGE_SIZE]
+            more = (page + 1) * _ETH_PAGE_SIZE < len(txs)
+            return {
+                "items": items,
+                "next_page_params": {"page": page + 1} if more else None,
+            }
+
+        @route(
+            "GET",
+            BLOCKSCOUT_PREFIX + r"/api/v2/addresses/(?P<addr>\w+)/token-transfers",
+        )
+        def token_page(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            transfers = self.eth_token_transfers.get(m["addr"], {})
+            txs = transfers.get(query["token"], [])
+            page = int(query.get("page", 0))
+            items = txs[page * _ETH_PAGE_SIZE : (page + 1) * _ETH_PAGE_SIZE]
+            more = (page + 1) * _ETH_PAGE_SIZE < len(txs)
+            return {
+                "items": items,
+                "next_page_params": {"page": page + 1} if more else None,
+            }
+
+        @route("GET", BLOCKSCOUT_PREFIX + r"/api/v2/blocks")
+        def eth_blocks(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            return {"items": [{"height": self.eth_latest_block}]}
+
+        @route(
+            "GET",
+            COINGECKO_PREFIX
+            + r"/coins/ethereum/contract/(?P<contract>\w+)/market_chart/range",
+        )
+        def token_prices(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            days = range(int(query["from"]), int(query["to"]) + 1, 86_400)
+            return {"prices": [[day * 1000, 1.0] for day in days]}
+
+        @route("GET", COINGECKO_PREFIX + r"/coins/(?P<coin>[\w-]+)/history")
+        def coin_price(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            return {"market_data": {"current_price": {"usd": 50_000.0}}}
+
+        @route("GET", INDEXA_PREFIX + r"/accounts/\w+/instrument-transactions")
+        def indexa_instruments(
+            m: re.Match[str], query: dict[str, str], body: Any
+        ) -> Any:
+            return self.indexa_transactions
+
+        @route("GET", INDEXA_PREFIX + r"/accounts/\w+/cash-transactions")
+        def indexa_cash(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            return []
+
+        @route("GET", INDEXA_PREFIX + r"/accounts/\w+/portfolio")
+        def indexa_portfolio(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            titles: dict[str, float] = {}
+            for tx in self.indexa_transactions:
+                isin = tx["instrument"]["isin_code"]
+                titles[isin] = titles.get(isin, 0.0) + tx["titles"]
+
+            return {
+                "portfolio": {"cash_amount": 1_000.0},
+                "instrument_accounts": [
+                    {
+                        "positions": [
+                            {
+                                "instrument": {"isin_code": isin, "name": "Bench Fund"},
+                                "titles": amount,
+                            }
+                            for isin, amount in titles.items()
+                        ]
+                    }
+                ],
+            }
+
+        @route(
+            "GET",
+            MYINVESTOR_PREFIX + r"/cperf-server/api/v2/securities-accounts/self-basic",
+        )
+        def myinvestor_accounts(
+            m: re.Match[str], query: dict[str, str], body: Any
+        ) -> Any:
+            return {
+                "payload": {
+                    "data": [
+                        {
+                            "accountId": MYINVESTOR_ACCOUNT,
+                            "cashAccountId": MYINVESTOR_CASH_ACCOUNT,
+                        }
+                    ]
+                }
+            }
+
+        @route(
+            "GET",
+            MYINVESTOR_PREFIX
+            + r"/cperf-server/api/v3/securities-accounts/[\w-]+/orders",
+        )
+        def myinvestor_order_list(
+            m: re.Match[str], query: dict[str, str], body: Any
+        ) -> Any:
+            return {"payload": {"data": self.myinvestor_orders}}
+
+        @route("GET", MYINVESTOR_PREFIX + r"/cperf-server/api/v2/cash-accounts/self")
+        def myinvestor_cash(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            return {
+                "payload": {
+                    "data": [
+                        {
+                            "accountId": MYINVESTOR_CASH_ACCOUNT,
+                            "enabledBalance": "500.0",
+                        }
+                    ]
+                }
+            }
+
+        @route("POST", GHOSTFOLIO_PREFIX + r"/api/v1/auth/anonymous")
+        def ghostfolio_auth(m: re.Match[str], query: dict[str, str], body: Any) -> Any:
+            return {"authToken": "bench"}
+
+        @route("GET", GHOSTFOLIO_PREFIX + r"/api/v1/activities")
+        def ghostfolio_activity_list(
+            m: re.Match[str], query: dict[str, str], body: Any
+        ) -> Any:
+            return {
+                "activities": self.ghostfolio_activities,
+                "count": len(self.ghostfolio_activities),
+            }
+
+        @route("GET", GHOSTFOLIO_PREFIX + r"/api/v1/account")
+        def ghostfolio_accounts(
+            m: re.Match[str], query: dict[str, str], body: Any
+        ) -> Any:
+            return {
+                "accounts": [
+                    {
+                        "id": ACCOUNT_ID,
+                        "name": "Bench",
+                        "currency": "EUR",
+                        "platformId": None,
+                        "balance": self.ghostfolio_balance,
+                    }
+                ]
+            }
+
+        @route("POST", GHOSTFOLIO_PREFIX + r"/api/v1/import")
+        def ghostfolio_import(
+            m: re.Match[str], query: dict[str, str], body: Any
+        ) -> Any:
+            # Imported activities exist on the next run, like in Ghostfolio
+            self.ghostfolio_activities.extend(
+                {
+                    **activity,
+                    "SymbolProfile": {
+                        "dataSource": activity["dataSource"],
+                        "symbol": activity["symbol"],
+                    },
+                }
+                for activity in body["activities"]
+            )
+            return {"activities": body["activities"]}
+
+        @route("PUT", GHOSTFOLIO_PREFIX + r"/api/v1/account/[\w-]+")
+        def ghostfolio_account(
+            m: re.Match[str], query: dict[str, str], body: Any
+        ) -> Any:
+            self.ghostfolio_balance = body["balance"]
+            return body
+
+        @route("POST", GHOSTFOLIO_PREFIX + r"/api/v1/market-data/.+")
+        def ghostfolio_market_data(
+            m: re.Match[str], query: dict[str, str], body: Any
+        ) -> Any:
+            return {}
+
+    def _dispatch(self, method: str, path: str, body: Any) -> tuple[int, Any]:
+        parts = urlsplit(path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        for route_method, pattern, handler in self._routes:
+            if route_method == method and (m := pattern.match(parts.path)):
+                return 200, handler(m, query, body)
+
+        return 404, {"error": f"No stand-in for {method} {parts.path}"}
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        standin = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, avoid delayed ACK stalls
+            disable_nagle_algorithm = True
+
+            def _handle(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b""
+                if not raw:
+                    body = None
+                elif self.headers.get("Content-Type", "").startswith(
+                    "application/json"
+                ):
+                    body = json.loads(raw)
+                else:
+                    body = {k: v[-1] for k, v in parse_qs(raw.decode()).items()}
+
+                status, payload = standin._dispatch(self.command, self.path, body)
+                content = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                _ = self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = _handle
+
+            @override
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return RequestHandler
+
+
+class MempoolWebsocket:
+    """
+    Websocket server answering `track-addresses` subscriptions like mempool.
+    Confirmed transactions are only pushed when a test calls `push`.
+    """
+
+    def __init__(self) -> None:
+        # Address sets of every subscription received, in order
+        self.subscriptions: list[set[str]] = []
+        self._connections: set[ServerConnection] = set()
+        self._changed = threading.Condition()
+        self._server = serve(self._handle, "127.0.0.1", 0)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.socket.getsockname()[:2]
+        return f"ws://{host}:{port}{MEMPOOL_PREFIX}/api/v1/ws"
+
+    def start(self) -> None:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+
+    def _handle(self, ws: ServerConnection) -> None:
+        with self._changed:
+            self._connections.add(ws)
+        try:
+            for message in ws:
+                if (addresses := json.loads(message).get("track-addresses")) is None:
+                    continue
+                with self._changed:
+                    self.subscriptions.append(set(addresses))
+                    self._changed.notify_all()
+        except ConnectionClosed:
+            pass
+        finally:
+            with self._changed:
+                self._connections.discard(ws)
+                self._changed.notify_all()
+
+    @property
+    def tracked(self) -> set[str]:
+        """Addresses of the latest subscription."""
+        return self.subscriptions[-1] if self.subscriptions else set()
+
+    def wait_for(self, predicate: Callable[[], bool], timeout: float = 5.0) -> None:
+        """Wait until `predicate` holds, checked on every subscription change."""
+        with self._changed:
+            if not self._changed.wait_for(predicate, timeout):
+                raise TimeoutError("Mempool websocket stand-in condition not met")
+
+    def push(self, addresses: set[str]) -> None:
+        """Push a confirmed transaction of each of `addresses`."""
+        message = json.dumps(
+            {
+                "multi-address-transactions": {
+                    addr: {"mempool": [], "confirmed": [{"txid": _id("push", addr)}]}
+                    for addr in addresses
+                }
+            }
+        )
+        with self._changed:
+            connections = list(self._connections)
+        for ws in connections:
+            ws.send(message)
+
+    def disconnect(self) -> None:
+        with self._changed:
+            connections = list(self._connections)
+        for ws in connections:
+            ws.close()
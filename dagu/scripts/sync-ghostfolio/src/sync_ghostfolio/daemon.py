@@ -0,0 +1,184 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, ClassVar, final, override
+
+from .metrics import MetricsRecorder
+from .models import DaemonConfig, Synchronizer, Watchable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Job:
+    platform: str
+    interval: timedelta
+    synchronizers: list[Synchronizer]
+    next_run: datetime = field(default_factory=lambda: datetime.now(UTC))
+    last_run: datetime | None = None
+    last_duration: float | None = None
+    last_error: str | None = None
+    running: bool = False
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "platform": self.platform,
+            "interval_minutes": self.interval.total_seconds() / 60,
+            "next_run": self.next_run.isoformat(),
+            "last_run": self.last_run and self.last_run.isoformat(),
+            "last_duration_seconds": self.last_duration,
+            "last_error": self.last_error,
+            "running": self.running,
+        }
+
+
+@final
+class SyncDaemon:
+    """
+    Keeps synchronizers alive between runs, so HTTP connection pools, derivation
+    contexts and price lookups stay warm. Each platform runs on its own interval
+    and can be triggered or inspected through a small local HTTP API:
+
+    - `GET /status`: state of every platform job.
+    - `POST /sync` or `POST /sync/<platform>`: run all or one platform now.
+
+    Synchronizers that support push change detection (`Watchable`) trigger their
+    platform as soon as a change is pushed, on top of the interval.
+    """
+
+    _DEFAULT_HOST = "127.0.0.1"
+    _DEFAULT_PORT = 8090
+    _DEFAULT_INTERVALS: ClassVar[dict[str, int]] = {"crypto": 60}
+    _DEFAULT_INTERVAL = 24 * 60
+
+    def __init__(
+        self,
+        synchronizers: dict[str, list[Synchronizer]],
+        config: DaemonConfig,
+        metrics: MetricsRecorder,
+    ) -> None:
+        intervals = self._DEFAULT_INTERVALS | config.get("intervals", {})
+        self._jobs = {
+            platform: _Job(
+                platform,
+                timedelta(minutes=intervals.get(platform, self._DEFAULT_INTERVAL)),
+                platform_synchronizers,
+            )
+            for platform, platform_synchronizers in synchronizers.items()
+        }
+        self._host = config.get("host", self._DEFAULT_HOST)
+        self._port = config.get("port", self._DEFAULT_PORT)
+        self._wakeup = threading.Condition()
+        self._metrics = metrics
+
+    def status(self) -> list[dict[str, Any]]:
+        with self._wakeup:
+            return [job.status() for job in self._jobs.values()]
+
+    def trigger(self, platform: str | None = None) -> bool:
+        if platform is not None and platform not in self._jobs:
+            return False
+
+        with self._wakeup:
+            for job in self._jobs.values():
+                if platform is None or job.platform == platform:
+                    job.next_run = datetime.now(UTC)
+            self._wakeup.notify()
+
+        return True
+
+    def _run_job(self, job: _Job) -> None:
+        logger.info("Running scheduled sync for platform '%s'", job.platform)
+        with self._wakeup:
+            job.running = True
+            scheduled = job.next_run
+        start = time.perf_counter()
+        error: str | None = None
+        try:
+            for synchronizer in job.synchronizers:
+                with self._metrics.run(job.platform, type(synchronizer).__name__):
+                    synchronizer.reset()
+                    synchronizer.sync()
+        except Exception as e:
+            logger.exception("Sync for platform '%s' failed", job.platform)
+            error = repr(e)
+        finally:
+            with self._wakeup:
+                job.running = False
+                job.last_error = error
+                job.last_run = datetime.now(UTC)
+                job.last_duration = time.perf_counter() - start
+                # Keep triggers received while running, otherwise wait a full interval
+                if job.next_run == scheduled:
+                    job.next_run = job.last_run + job.interval
+            self._metrics.write()
+
+    def _schedule(self) -> None:
+        while True:
+            with self._wakeup:
+                now = datetime.now(UTC)
+                due = [job for job in self._jobs.values() if job.next_run <= now]
+                if not due:
+                    next_run = min(job.next_run for job in self._jobs.values())
+                    _ = self._wakeup.wait((next_run - now).total_seconds())
+                    continue
+
+            # Jobs run one after another so Ghostfolio never sees concurrent imports
+            for job in due:
+                self._run_job(job)
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status: HTTPStatus, body: Any) -> None:
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                _ = self.wfile.write(content)
+
+            def do_GET(self) -> None:
+                if self.path == "/status":
+                    self._reply(HTTPStatus.OK, daemon.status())
+                else:
+                    self._reply(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+
+            def do_POST(self) -> None:
+                prefix, _, suffix = self.path.partition("/sync")
+                platform = suffix.removeprefix("/") or None
+                if prefix or (suffix and not suffix.startswith("/")):
+                    self._reply(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+                elif daemon.trigger(platform):
+                    self._reply(HTTPStatus.ACCEPTED, daemon.status())
+                else:
+                    self._reply(
+                        HTTPStatus.NOT_FOUND, {"error": f"Unknown platform {platform}"}
+                    )
+
+            @override
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(format, *args)
+
+        return Handler
+
+    def serve_forever(self) -> None:
+        if not self._jobs:
+            raise ValueError("No platforms configured to synchronize")
+
+        for job in self._jobs.values():
+            for synchronizer in job.synchronizers:
+                if isinstance(synchronizer, Watchable):
+                    synchronizer.watch(lambda p=job.platform: self.trigger(p))
+
+        threading.Thread(target=self._schedule, name="scheduler", daemon=True).start()
+
+        with ThreadingHTTPServer((self._host, self._port), self._handler()) as server:
+            logger.info("Serving sync daemon on http://%s:%s", self._host, self._port)
+            server.serve_forever()
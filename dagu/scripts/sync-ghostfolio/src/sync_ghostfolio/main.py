@@ -1,4 +1,5 @@
 import logging
+import os
 import sys
 import tomllib
 from pathlib import Path
@@ -7,124 +8,70 @@ from typing import cast
 from dotenv import dotenv_values
 from ghostfolio import Ghostfolio
 
-from sync_ghostfolio.synchronizers.crypto import (
-    BtcSynchronizer,
-    EthSynchronizer,
-)
-
+from .daemon import SyncDaemon
+from .metrics import MetricsRecorder
 from .models import Config, Synchronizer
-from .synchronizers.freedom24 import Freedom24Synchronizer
-from .synchronizers.indexa import IndexaCapitalSynchronizer
-from .synchronizers.myinvestor import MyInvestorSynchronizer
+from .registry import build_synchronizers
+from .transport import HttpTransport, PooledGhostfolio
 
 logging.basicConfig(level=logging.INFO)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
 env = {k: v for k, v in dotenv_values().items() if v is not None}
 
+USAGE = "Usage: sync-ghostfolio [serve] [--profile] <user>"
 
-def gather_synchronizers(
-    user: str, config: Config, ghostfolio: Ghostfolio
-) -> list[Synchronizer]:
-    synchronizers: list[Synchronizer] = []
-    platforms = config["users"][user]
-
-    for platform in platforms:
-        match platform:
-            case "indexa_capital":
-                platform_cfg = platforms["indexa_capital"]
-                synchronizers.append(
-                    IndexaCapitalSynchronizer(
-                        ghostfolio,
-                        platform_cfg["ghostfolio_account_id"],
-                        env[f"{user.upper()}_INDEXA_CAPITAL_API_KEY"],
-                        platform_cfg["account_number"],
-                        ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
-                    )
-                )
-
-            case "indexa_capital_pension":
-                platform_cfg = platforms["indexa_capital_pension"]
-                synchronizers.append(
-                    IndexaCapitalSynchronizer(
-                        ghostfolio,
-                        platform_cfg["ghostfolio_account_id"],
-                        env[f"{user.upper()}_INDEXA_CAPITAL_API_KEY"],
-                        platform_cfg["account_number"],
-                        account_type="pension",
-                        ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
-                    )
-                )
-
-            case "freedom24":
-                platform_cfg = platforms["freedom24"]
-                synchronizers.append(
-                    Freedom24Synchronizer(
-                        ghostfolio,
-                        platform_cfg["ghostfolio_account_id"],
-                        env[f"{user.upper()}_FREEDOM24_PUBLIC_KEY"],
-                        env[f"{user.upper()}_FREEDOM24_PRIVATE_KEY"],
-                        ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
-                    )
-                )
-
-            case "myinvestor":
-                platform_cfg = platforms["myinvestor"]
-                synchronizers.append(
-                    MyInvestorSynchronizer(
-                        ghostfolio,
-                        platform_cfg["ghostfolio_account_id"],
-                        env[f"{user.upper()}_MYINVESTOR_ACCESS_TOKEN"],
-                        ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
-                    )
-                )
 
-            case "crypto":
-                crypto_config = platforms["crypto"]
-                for coin in crypto_config["coins"]:
-                    match coin:
-                        case "BTC":
-                            synchronizers.append(
-                                BtcSynchronizer(
-                                    ghostfolio,
-                                    crypto_config["ghostfolio_account_id"],
-                                    env["COINGECKO_DEMO_API_KEY"],
-                                    env[f"{user.upper()}_BTC_ZPUB"],
-                                    provider_url=config["crypto"].get("mempool_url"),
-                                    proxy_url=config["crypto"].get("proxy_url"),
-                                    ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
-                                )
-                            )
-
-                        case "ETH":
-                            synchronizers.append(
-                                EthSynchronizer(
-                                    ghostfolio,
-                                    crypto_config["ghostfolio_account_id"],
-                                    env["COINGECKO_DEMO_API_KEY"],
-                                    env[f"{user.upper()}_ETH_ADDRESS"],
-                                    proxy_url=config["crypto"].get("proxy_url"),
-                                    ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
-                                )
-                            )
-
-                        case _:
-                            raise ValueError(f"Unsupported coin {coin}")
+def gather_synchronizers(
+    user: str, config: Config, ghostfolio: Ghostfolio, transport: HttpTransport
+) -> dict[str, list[Synchronizer]]:
+    return {
+        platform: build_synchronizers(
+            platform, user, config, ghostfolio, transport, env
+        )
+        for platform in config["users"][user]
+    }
 
-            case _:
-                raise ValueError(f"Unsupported platform {platform}")
 
-    return synchronizers
+def main() -> None:
+    args = sys.argv[1:]
+    profiling = "--profile" in args or bool(os.environ.get("GHOSTFOLIO_PROFILE"))
 
+    match [arg for arg in args if arg != "--profile"]:
+        case ["serve", user]:
+            serve = True
+        case [user]:
+            serve = False
+        case _:
+            sys.exit(USAGE)
 
-def main() -> None:
-    user = sys.argv[1]
     config = cast(Config, tomllib.loads(Path("config.toml").read_text()))
 
-    ghostfolio = Ghostfolio(
+    http_config = config.get("http", {})
+    transport = HttpTransport(
+        http_config,
+        latency_cache=Path(
+            http_config.get("latency_cache", HttpTransport.DEFAULT_LATENCY_CACHE)
+        ),
+    )
+    ghostfolio = PooledGhostfolio(
         token=env[f"{user.upper()}_GHOSTFOLIO_TOKEN"],
         host=config["ghostfolio"]["host"],
+        transport=transport,
     )
 
-    for synchronizer in gather_synchronizers(user, config, ghostfolio):
-        synchronizer.sync()
+    synchronizers = gather_synchronizers(user, config, ghostfolio, transport)
+    metrics = MetricsRecorder(config.get("metrics", {}), profile=profiling)
+
+    if serve:
+        SyncDaemon(synchronizers, config.get("daemon", {}), metrics).serve_forever()
+        return
+
+    try:
+        for platform, platform_synchronizers in synchronizers.items():
+            for synchronizer in platform_synchronizers:
+                with metrics.run(platform, type(synchronizer).__name__):
+                    synchronizer.sync()
+    finally:
+        metrics.write()
+        transport.close()
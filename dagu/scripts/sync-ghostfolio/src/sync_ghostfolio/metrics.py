@@ -0,0 +1,329 @@
+"""
+Per-stage timing and HTTP traffic of synchronizer runs.
+
+Stages are timed with `span`. Every HTTP request sent through the shared
+transport (its `httpx` clients and its `requests` sessions, used by the
+Tradernet SDK) while a stage is open is counted against the innermost stage, per
+upstream host, along with the connections it opened. Positions still drifting from Ghostfolio after reconciliation
+are recorded too. Runs are written to a
+JSON report and a Prometheus textfile, e.g. for the node exporter textfile
+collector.
+
+The changes each run made to the Ghostfolio accounts (imported activities and
+cash balance updates) are also written as a small run summary, which
+`analyze-ghostfolio --if-changed` reads to decide whether a new analysis is
+worth it. Reports and summaries are dropped once older than the retention
+period.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, date, datetime
+from pathlib import Path
+from typing import TypedDict, final
+
+from .models import MetricsConfig
+from .profiling import profile
+
+logger = logging.getLogger(__name__)
+
+# Requests sent outside of any `span` are counted against this stage
+_UNSTAGED = "other"
+
+
+@dataclass
+class HostTraffic:
+    requests: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    # New connections opened through the shared transport
+    connections: int = 0
+
+
+@dataclass
+class AccountChanges:
+    activities: int = 0
+    # Quantity times unit price plus fees of the activities, per currency
+    amounts: defaultdict[str, float] = field(default_factory=lambda: defaultdict(float))
+    # In the currency of the account, unset if its balance wasn't synced
+    balance_change: float = 0.0
+    currency: str | None = None
+
+
+class RunSummary(TypedDict):
+    started: str
+    success: bool
+    accounts: dict[str, AccountChanges]
+
+
+@dataclass
+class StageMetrics:
+    calls: int = 0
+    seconds: float = 0.0
+    hosts: defaultdict[str, HostTraffic] = field(
+        default_factory=lambda: defaultdict(HostTraffic)
+    )
+
+
+@dataclass
+class RunMetrics:
+    platform: str
+    synchronizer: str
+    started: datetime = field(default_factory=lambda: datetime.now(UTC))
+    seconds: float = 0.0
+    success: bool = True
+    # Folded stacks of the run, when profiling
+    profile: str | None = None
+    stages: defaultdict[str, StageMetrics] = field(
+        default_factory=lambda: defaultdict(StageMetrics)
+    )
+    # Platform minus Ghostfolio quantity of positions left unreconciled
+    drift: dict[str, float] = field(default_factory=dict)
+    changes: defaultdict[str, AccountChanges] = field(
+        default_factory=lambda: defaultdict(AccountChanges)
+    )
+
+
+_run: ContextVar[RunMetrics | None] = ContextVar("_run", default=None)
+_stage: ContextVar[StageMetrics | None] = ContextVar("_stage", default=None)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time `stage` of the current run. A no-op outside of a recorded run."""
+    if (run := _run.get()) is None:
+        yield
+        return
+
+    metrics = run.stages[stage]
+    token = _stage.set(metrics)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.calls += 1
+        metrics.seconds += time.perf_counter() - start
+        _stage.reset(token)
+
+
+def _current_stage() -> StageMetrics | None:
+    if (stage := _stage.get()) is None and (run := _run.get()) is not None:
+        return run.stages[_UNSTAGED]
+
+    return stage
+
+
+def record_connection(host: str) -> None:
+    if (stage := _current_stage()) is not None:
+        stage.hosts[host].connections += 1
+
+
+def record_drift(position: str, difference: float) -> None:
+    if (run := _run.get()) is not None:
+        run.drift[position] = difference
+
+
+def record_activities(account_id: str, count: int, amounts: dict[str, float]) -> None:
+    if (run := _run.get()) is not None:
+        changes = run.changes[account_id]
+        changes.activities += count
+        for currency, amount in amounts.items():
+            changes.amounts[currency] += amount
+
+
+def record_balance_change(account_id: str, change: float, currency: str) -> None:
+    if (run := _run.get()) is not None:
+        run.changes[account_id].balance_change += change
+        run.changes[account_id].currency = currency
+
+
+def record_request(host: str, sent: int, received: int) -> None:
+    if (stage := _current_stage()) is None:
+        return
+
+    traffic = stage.hosts[host]
+    traffic.requests += 1
+    traffic.bytes_sent += sent
+    traffic.bytes_received += received
+
+
+@final
+class MetricsRecorder:
+    """
+    Records synchronizer runs and writes them to `report_dir/sync-<time>.json`,
+    their account changes to `summary_dir/summary-<time>.json`, and the latest
+    run of every synchronizer to the Prometheus `textfile`. With `profile`, each
+    run is also sampled into `report_dir/profile-*.folded`. Reports, profiles
+    and summaries older than `retention_days` are dropped once a day.
+    """
+
+    _DEFAULT_REPORT_DIR = "reports"
+    _DEFAULT_SUMMARY_DIR = "reports/summaries"
+    _DEFAULT_TEXTFILE = "reports/sync_ghostfolio.prom"
+    _DEFAULT_RETENTION_DAYS = 30
+
+    def __init__(self, config: MetricsConfig, *, profile: bool = False) -> None:
+        self._report_dir = Path(config.get("report_dir", self._DEFAULT_REPORT_DIR))
+        self._summary_dir = Path(config.get("summary_dir", self._DEFAULT_SUMMARY_DIR))
+        self._textfile = Path(config.get("textfile", self._DEFAULT_TEXTFILE))
+        self._retention_days = config.get(
+            "retention_days", self._DEFAULT_RETENTION_DAYS
+        )
+        self._pruned_on: date | None = None
+        self._pending: list[RunMetrics] = []
+        self._latest: dict[tuple[str, str], RunMetrics] = {}
+        self._lock = threading.Lock()
+        self._profile = profile
+
+    @contextmanager
+    def run(self, platform: str, synchronizer: str) -> Iterator[RunMetrics]:
+        metrics = RunMetrics(platform, synchronizer)
+        profiler: AbstractContextManager[None] = nullcontext()
+        if self._profile:
+            path = self._report_dir / (
+                f"profile-{platform}-{synchronizer}-{metrics.started:%Y%m%dT%H%M%S}"
+                ".folded"
+            )
+            metrics.profile = str(path)
+            profiler = profile(path)
+
+        token = _run.set(metrics)
+        start = time.perf_counter()
+        try:
+            with profiler:
+                yield metrics
+        except BaseException:
+            metrics.success = False
+            raise
+        finally:
+            metrics.seconds = time.perf_counter() - start
+            _run.reset(token)
+            with self._lock:
+                self._pending.append(metrics)
+                self._latest[(platform, synchronizer)] = metrics
+
+    def _prometheus(self) -> str:
+        gauges: dict[str, tuple[str, list[str]]] = {
+            "run_duration_seconds": ("Duration of the latest run", []),
+            "run_success": ("Whether the latest run succeeded", []),
+            "run_timestamp_seconds": ("Start time of the latest run", []),
+            "stage_duration_seconds": ("Duration of a stage in the latest run", []),
+            "stage_calls": ("Times a stage was entered in the latest run", []),
+            "http_requests": ("HTTP requests per stage and host", []),
+            "http_bytes_sent": ("HTTP request bytes per stage and host", []),
+            "http_bytes_received": ("HTTP response bytes per stage and host", []),
+            "http_connections": ("New HTTP connections per stage and host", []),
+            "position_drift": (
+                "Platform minus Ghostfolio quantity of unreconciled positions",
+                [],
+            ),
+        }
+
+        def sample(name: str, value: float, **labels: str) -> None:
+            rendered = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            gauges[name][1].append(f"sync_ghostfolio_{name}{{{rendered}}} {value}")
+
+        for run in self._latest.values():
+            labels = {"platform": run.platform, "synchronizer": run.synchronizer}
+            sample("run_duration_seconds", round(run.seconds, 3), **labels)
+            sample("run_success", int(run.success), **labels)
+            sample("run_timestamp_seconds", run.started.timestamp(), **labels)
+            for stage, metrics in run.stages.items():
+                sample(
+                    "stage_duration_seconds",
+                    round(metrics.seconds, 3),
+                    **labels,
+                    stage=stage,
+                )
+                sample("stage_calls", metrics.calls, **labels, stage=stage)
+                for host, traffic in metrics.hosts.items():
+                    for name, value in asdict(traffic).items():
+                        sample("http_" + name, value, **labels, stage=stage, host=host)
+            for position, difference in run.drift.items():
+                sample("position_drift", difference, **labels, position=position)
+
+        lines: list[str] = []
+        for name, (description, samples) in gauges.items():
+            lines.append(f"# HELP sync_ghostfolio_{name} {description}")
+            lines.append(f"# TYPE sync_ghostfolio_{name} gauge")
+            lines.extend(samples)
+
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> None:
+        """Write the runs recorded since the last call and refresh the textfile."""
+        with self._lock:
+            runs, self._pending = self._pending, []
+            textfile = self._prometheus()
+
+        if not runs:
+            return
+
+        self._report_dir.mkdir(parents=True, exist_ok=True)
+        report = self._report_dir / f"sync-{runs[0].started:%Y%m%dT%H%M%S}.json"
+        logger.info("Writing sync run report to '%s'", report)
+        _ = report.write_text(
+            json.dumps([asdict(r) for r in runs], indent=2, default=str)
+        )
+
+        self._write_summary(runs)
+
+        # Written atomically, so the collector never reads a partial file
+        self._textfile.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._textfile.with_suffix(".tmp")
+        _ = tmp.write_text(textfile)
+        _ = tmp.replace(self._textfile)
+
+        if self._pruned_on != (today := date.today()):
+            self._prune()
+            self._pruned_on = today
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self._retention_days * 86_400
+        pruned = 0
+        for directory, pattern in (
+            (self._report_dir, "sync-*.json"),
+            (self._report_dir, "profile-*.folded"),
+            (self._summary_dir, "summary-*.json"),
+        ):
+            for path in directory.glob(pattern):
+                if path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+                    pruned += 1
+
+        if pruned:
+            logger.info(
+                "Dropped %s reports and summaries older than %s days",
+                pruned,
+                self._retention_days,
+            )
+
+    def _write_summary(self, runs: list[RunMetrics]) -> None:
+        accounts: defaultdict[str, AccountChanges] = defaultdict(AccountChanges)
+        for run in runs:
+            for account_id, changes in run.changes.items():
+                account = accounts[account_id]
+                account.activities += changes.activities
+                for currency, amount in changes.amounts.items():
+                    account.amounts[currency] += amount
+                account.balance_change += changes.balance_change
+                account.currency = changes.currency or account.currency
+
+        summary: RunSummary = {
+            "started": runs[0].started.isoformat(),
+            "success": all(run.success for run in runs),
+            "accounts": dict(accounts),
+        }
+        # Written atomically, readers only look at `summary-*.json`
+        self._summary_dir.mkdir(parents=True, exist_ok=True)
+        path = self._summary_dir / f"summary-{runs[0].started:%Y%m%dT%H%M%S}.json"
+        tmp = path.with_suffix(".tmp")
+        _ = tmp.write_text(json.dumps(summary, indent=2, default=asdict))
+        _ = tmp.replace(path)
@@ -1,4 +1,5 @@
-from typing import NotRequired, Protocol, TypedDict
+from collections.abc import Callable
+from typing import NotRequired, Protocol, TypedDict, runtime_checkable
 
 
 class GhostfolioConfig(TypedDict):
@@ -10,6 +11,14 @@ class GeneralCryptoConfig(TypedDict):
     proxy_url: NotRequired[str]
     mempool_url: NotRequired[str]
     tx_delay_days: NotRequired[int]
+    max_requests_per_second: NotRequired[float]  # Per provider, across wallets
+    clearnet_fallback: NotRequired[bool]  # Default provider while mempool is down
+    cache_dir: NotRequired[str]
+
+
+class SymbolsConfig(TypedDict):
+    cache: NotRequired[str]  # Persistent ISIN to Yahoo Finance symbol map
+    overrides: NotRequired[dict[str, str]]  # ISIN to symbol, never looked up
 
 
 class PlatformConfig(TypedDict):
@@ -30,6 +39,10 @@ class MyInvestorConfig(PlatformConfig):
 
 class CryptoConfig(PlatformConfig):
     coins: list[str]
+    # Wallets on top of the `<USER>_BTC_ZPUB` and `<USER>_ETH_ADDRESS` env vars
+    btc_zpubs: NotRequired[list[str]]
+    eth_addresses: NotRequired[list[str]]
+    eth_tokens: NotRequired[dict[str, str]]  # ERC-20 contract to CoinGecko coin ID
 
 
 class UserPlatforms(TypedDict):
@@ -40,11 +53,48 @@ class UserPlatforms(TypedDict):
     crypto: NotRequired[CryptoConfig]
 
 
+class DaemonConfig(TypedDict):
+    host: NotRequired[str]
+    port: NotRequired[int]
+    intervals: NotRequired[dict[str, int]]  # Minutes between runs per platform
+
+
+class MetricsConfig(TypedDict):
+    report_dir: NotRequired[str]
+    summary_dir: NotRequired[str]  # Run summaries read by analyze-ghostfolio
+    textfile: NotRequired[str]  # Prometheus textfile with the latest runs
+    retention_days: NotRequired[int]  # Of reports, profiles and summaries
+
+
+class HttpConfig(TypedDict):
+    max_connections: NotRequired[int]
+    max_keepalive_connections: NotRequired[int]
+    keepalive_expiry: NotRequired[float]  # Seconds an idle connection is kept
+    http2: NotRequired[bool]  # Needs the `h2` package
+    # Health of upstream hosts: circuit breaker and adaptive read timeouts
+    failure_threshold: NotRequired[int]  # Consecutive failures opening the circuit
+    reset_after: NotRequired[float]  # Seconds before probing an open circuit
+    timeout_factor: NotRequired[float]  # Read timeout as a multiple of the p95
+    min_timeout: NotRequired[float]
+    latency_cache: NotRequired[str]
+
+
 class Config(TypedDict):
     ghostfolio: GhostfolioConfig
     crypto: GeneralCryptoConfig
+    symbols: NotRequired[SymbolsConfig]
+    daemon: NotRequired[DaemonConfig]
+    metrics: NotRequired[MetricsConfig]
+    http: NotRequired[HttpConfig]
     users: dict[str, UserPlatforms]
 
 
 class Synchronizer(Protocol):
     def sync(self) -> None: ...
+
+    def reset(self) -> None: ...
+
+
+@runtime_checkable
+class Watchable(Protocol):
+    def watch(self, on_change: Callable[[], object]) -> None: ...
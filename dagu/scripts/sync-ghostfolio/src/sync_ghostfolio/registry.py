@@ -0,0 +1,231 @@
+"""
+Registry of synchronizer factories, keyed by the platform name used in `config.toml`.
+
+Each factory imports its synchronizer module lazily, so only the SDKs of the
+configured platforms (`bip_utils`, `tradernet`, ...) are loaded at start-up.
+"""
+
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING, TypeVar
+
+from ghostfolio import Ghostfolio
+
+from .models import Config, Synchronizer
+from .transport import HttpTransport
+
+if TYPE_CHECKING:
+    from .synchronizers._symbols import SymbolResolver
+
+SynchronizerFactory = Callable[
+    [str, Config, Ghostfolio, HttpTransport, dict[str, str]], list[Synchronizer]
+]
+
+F = TypeVar("F", bound=SynchronizerFactory)
+
+_FACTORIES: dict[str, SynchronizerFactory] = {}
+
+
+def register(platform: str) -> Callable[[F], F]:
+    def decorator(factory: F) -> F:
+        _FACTORIES[platform] = factory
+        return factory
+
+    return decorator
+
+
+def build_synchronizers(
+    platform: str,
+    user: str,
+    config: Config,
+    ghostfolio: Ghostfolio,
+    transport: HttpTransport,
+    env: dict[str, str],
+) -> list[Synchronizer]:
+    try:
+        factory = _FACTORIES[platform]
+    except KeyError:
+        raise ValueError(f"Unsupported platform {platform}") from None
+
+    return factory(user, config, ghostfolio, transport, env)
+
+
+def _symbol_resolver(config: Config) -> "SymbolResolver":
+    from .synchronizers._symbols import SymbolResolver
+
+    symbols_cfg = config.get("symbols", {})
+    return SymbolResolver(
+        Path(symbols_cfg.get("cache", SymbolResolver.DEFAULT_PATH)),
+        overrides=symbols_cfg.get("overrides"),
+    )
+
+
+@register("indexa_capital")
+def _indexa_capital(
+    user: str,
+    config: Config,
+    ghostfolio: Ghostfolio,
+    transport: HttpTransport,
+    env: dict[str, str],
+) -> list[Synchronizer]:
+    from .synchronizers.indexa import IndexaCapitalSynchronizer
+
+    platform_cfg = config["users"][user]["indexa_capital"]
+    return [
+        IndexaCapitalSynchronizer(
+            ghostfolio,
+            platform_cfg["ghostfolio_account_id"],
+            env[f"{user.upper()}_INDEXA_CAPITAL_API_KEY"],
+            platform_cfg["account_number"],
+            ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
+            transport=transport,
+            symbols=_symbol_resolver(config),
+        )
+    ]
+
+
+@register("indexa_capital_pension")
+def _indexa_capital_pension(
+    user: str,
+    config: Config,
+    ghostfolio: Ghostfolio,
+    transport: HttpTransport,
+    env: dict[str, str],
+) -> list[Synchronizer]:
+    from .synchronizers.indexa import IndexaCapitalSynchronizer
+
+    platform_cfg = config["users"][user]["indexa_capital_pension"]
+    return [
+        IndexaCapitalSynchronizer(
+            ghostfolio,
+            platform_cfg["ghostfolio_account_id"],
+            env[f"{user.upper()}_INDEXA_CAPITAL_API_KEY"],
+            platform_cfg["account_number"],
+            account_type="pension",
+            ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
+            transport=transport,
+            symbols=_symbol_resolver(config),
+        )
+    ]
+
+
+@register("freedom24")
+def _freedom24(
+    user: str,
+    config: Config,
+    ghostfolio: Ghostfolio,
+    transport: HttpTransport,
+    env: dict[str, str],
+) -> list[Synchronizer]:
+    from .synchronizers.freedom24 import Freedom24Synchronizer
+
+    platform_cfg = config["users"][user]["freedom24"]
+    return [
+        Freedom24Synchronizer(
+            ghostfolio,
+            platform_cfg["ghostfolio_account_id"],
+            env[f"{user.upper()}_FREEDOM24_PUBLIC_KEY"],
+            env[f"{user.upper()}_FREEDOM24_PRIVATE_KEY"],
+            ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
+            transport=transport,
+        )
+    ]
+
+
+@register("myinvestor")
+def _myinvestor(
+    user: str,
+    config: Config,
+    ghostfolio: Ghostfolio,
+    transport: HttpTransport,
+    env: dict[str, str],
+) -> list[Synchronizer]:
+    from .synchronizers.myinvestor import MyInvestorSynchronizer
+
+    platform_cfg = config["users"][user]["myinvestor"]
+    return [
+        MyInvestorSynchronizer(
+            ghostfolio,
+            platform_cfg["ghostfolio_account_id"],
+            env[f"{user.upper()}_MYINVESTOR_ACCESS_TOKEN"],
+            ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
+            transport=transport,
+            symbols=_symbol_resolver(config),
+        )
+    ]
+
+
+def _wallets(env_value: str | None, configured: list[str]) -> list[str]:
+    """Wallets of a comma-separated env var and the config, without duplicates."""
+    from_env = [wallet.strip() for wallet in (env_value or "").split(",")]
+    return list(dict.fromkeys(w for w in [*from_env, *configured] if w))
+
+
+@register("crypto")
+def _crypto(
+    user: str,
+    config: Config,
+    ghostfolio: Ghostfolio,
+    transport: HttpTransport,
+    env: dict[str, str],
+) -> list[Synchronizer]:
+    from .synchronizers.crypto import BtcSynchronizer, EthSynchronizer
+
+    crypto_config = config["users"][user]["crypto"]
+    cache_dir = Path(config["crypto"].get("cache_dir", ".cache"))
+    synchronizers: list[Synchronizer] = []
+
+    for coin in crypto_config["coins"]:
+        match coin:
+            case "BTC":
+                synchronizers.append(
+                    BtcSynchronizer(
+                        ghostfolio,
+                        crypto_config["ghostfolio_account_id"],
+                        env["COINGECKO_DEMO_API_KEY"],
+                        _wallets(
+                            env.get(f"{user.upper()}_BTC_ZPUB"),
+                            crypto_config.get("btc_zpubs", []),
+                        ),
+                        provider_url=config["crypto"].get("mempool_url"),
+                        proxy_url=config["crypto"].get("proxy_url"),
+                        max_requests_per_second=config["crypto"].get(
+                            "max_requests_per_second"
+                        ),
+                        clearnet_fallback=config["crypto"].get(
+                            "clearnet_fallback", False
+                        ),
+                        ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
+                        transport=transport,
+                        cache_dir=cache_dir,
+                    )
+                )
+
+            case "ETH":
+                synchronizers.append(
+                    EthSynchronizer(
+                        ghostfolio,
+                        crypto_config["ghostfolio_account_id"],
+                        env["COINGECKO_DEMO_API_KEY"],
+                        _wallets(
+                            env.get(f"{user.upper()}_ETH_ADDRESS"),
+                            crypto_config.get("eth_addresses", []),
+                        ),
+                        tokens=crypto_config.get("eth_tokens"),
+                        proxy_url=config["crypto"].get("proxy_url"),
+                        max_requests_per_second=config["crypto"].get(
+                            "max_requests_per_second"
+                        ),
+                        clearnet_fallback=config["crypto"].get(
+                            "clearnet_fallback", False
+                        ),
+                        ntfy_topic=config["ghostfolio"].get("ntfy_topic"),
+                        transport=transport,
+                        cache_dir=cache_dir,
+                    )
+                )
+
+            case _:
+                raise ValueError(f"Unsupported coin {coin}")
+
+    return synchronizers
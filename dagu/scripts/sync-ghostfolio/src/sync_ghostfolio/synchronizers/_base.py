@@ -1,12 +1,21 @@
 import logging
+import math
 from abc import ABC, abstractmethod
+from collections import defaultdict
 from datetime import datetime
 from functools import cached_property
+from typing import ClassVar
 
-import httpx
 from ghostfolio import Ghostfolio
 
-from ._models import ActivityType, GhostfolioAccount, GhostfolioActivity
+from ..metrics import (
+    record_activities,
+    record_balance_change,
+    record_drift,
+    span,
+)
+from ..transport import HttpTransport
+from ._models import Activity, ActivityType, GhostfolioAccount, GhostfolioActivity
 from ._notifications import NOTIFICATION_TEMPLATE
 
 logger = logging.getLogger(__name__)
@@ -14,6 +23,9 @@ logger = logging.getLogger(__name__)
 
 class PlatformSynchronizer(ABC):
     _ID_COMMENT_PREFIX: str = "ID: "
+    # Cached properties that only hold for a single run, dropped by `reset`.
+    # `_existing_ids` stays warm: `_import_activities` adds every new ID to it.
+    _RUN_CACHES: ClassVar[tuple[str, ...]] = ("_existing_activities", "_account")
 
     def __init__(
         self,
@@ -21,20 +33,25 @@ class PlatformSynchronizer(ABC):
         ghostfolio_account_id: str,
         *,
         ntfy_topic: str | None = None,
+        transport: HttpTransport | None = None,
     ) -> None:
         self._ghostfolio: Ghostfolio = ghostfolio_client
         self._ghostfolio_account_id: str = ghostfolio_account_id
         self.ntfy_topic: str | None = ntfy_topic
+        self._transport: HttpTransport = transport or HttpTransport({})
 
     @cached_property
-    def _existing_ids(self) -> set[str]:
-        activities: list[GhostfolioActivity] = self._ghostfolio.activities(
-            account_id=self._ghostfolio_account_id
-        )["activities"]
+    def _existing_activities(self) -> list[GhostfolioActivity]:
+        with span("fetch_existing_activities"):
+            return self._ghostfolio.activities(account_id=self._ghostfolio_account_id)[
+                "activities"
+            ]
 
+    @cached_property
+    def _existing_ids(self) -> set[str]:
         return set(
             activity["comment"].removeprefix(self._ID_COMMENT_PREFIX)
-            for activity in activities
+            for activity in self._existing_activities
         )
 
     @cached_property
@@ -59,13 +76,55 @@ class PlatformSynchronizer(ABC):
         pass
 
     @abstractmethod
-    def _get_new_activities(self) -> list[GhostfolioActivity]:
+    def _get_new_activities(self) -> list[Activity]:
         raise NotImplementedError
 
     @abstractmethod
     def _get_cash_balance(self) -> float | None:
         raise NotImplementedError
 
+    def _get_positions(self) -> dict[str, float] | None:
+        """
+        Current quantity per symbol on the platform, checked against the
+        booked ones after every sync. `None` if the platform can't tell.
+        """
+        return None
+
+    def _get_booked_positions(self) -> dict[str, float]:
+        """Quantity per symbol booked in Ghostfolio."""
+        positions: defaultdict[str, float] = defaultdict(float)
+        for activity in self._existing_activities:
+            if "SymbolProfile" not in activity:
+                continue
+
+            symbol = activity["SymbolProfile"]["symbol"]
+            match activity["type"]:
+                case ActivityType.BUY:
+                    positions[symbol] += activity["quantity"]
+                case ActivityType.SELL:
+                    positions[symbol] -= activity["quantity"]
+
+        return dict(positions)
+
+    def _resync(self, symbols: set[str]) -> list[Activity]:
+        """
+        Activities of `symbols` that incremental runs may have missed, e.g. by
+        fetching their whole history. Drift is only reported by default.
+        """
+        return []
+
+    @staticmethod
+    def _drifted(
+        positions: dict[str, float], booked: dict[str, float]
+    ) -> dict[str, float]:
+        drifted: dict[str, float] = {}
+        for symbol in positions.keys() | booked.keys():
+            platform, ghostfolio = positions.get(symbol, 0.0), booked.get(symbol, 0.0)
+            if not math.isclose(platform, ghostfolio, rel_tol=1e-6, abs_tol=1e-8):
+                drifted[symbol] = platform - ghostfolio
+
+        return drifted
+
     def _get_max_account_datetime(self) -> datetime:
         activities: list[GhostfolioActivity] = self._ghostfolio.activities(
             account_id=self._ghostfolio_account_id
@@ -76,11 +135,11 @@ class PlatformSynchronizer(ABC):
 
         return max(datetime.fromisoformat(activity["date"]) for activity in activities)
 
-    def _notify_activities(self, activities: list[GhostfolioActivity]) -> None:
+    def _notify_activities(self, activities: list[Activity]) -> None:
         if self.ntfy_topic is None:
             return
 
-        with httpx.Client() as http:
+        with self._transport.client() as http:
             for activity in activities:
                 r = http.post(
                     self.ntfy_topic,
@@ -88,24 +147,85 @@ class PlatformSynchronizer(ABC):
                         "Title": f"New Ghostfolio Activity in {self._account['name']}",
                         "Tags": "chart",
                     },
-                    content=NOTIFICATION_TEMPLATE[ActivityType(activity["type"])]
-                    .substitute(activity)
+                    content=NOTIFICATION_TEMPLATE[activity.type]
+                    .substitute(activity.to_import())
                     .encode(),
                 )
                 _ = r.raise_for_status()
 
-    def _sync_activities(self) -> None:
-        new_activities = self._get_new_activities()
+    def _import_activities(self, activities: list[Activity]) -> None:
         logger.info(
             "Synchronizing %s activities to Ghostfolio account ID '%s'",
-            len(new_activities),
+            len(activities),
             self._ghostfolio_account_id,
         )
-        self._ghostfolio.import_transactions({"activities": new_activities})
-        self._notify_activities(new_activities)
+        with span("import_transactions"):
+            self._ghostfolio.import_transactions(
+                {"activities": [activity.to_import() for activity in activities]}
+            )
+        amounts: defaultdict[str, float] = defaultdict(float)
+        for activity in activities:
+            amounts[activity.currency] += (
+                abs(activity.quantity * activity.unit_price) + activity.fee
+            )
+        record_activities(self._ghostfolio_account_id, len(activities), amounts)
+        self._existing_ids.update(
+            activity.comment.removeprefix(self._ID_COMMENT_PREFIX)
+            for activity in activities
+        )
+        # Fetched again when needed, so the booked positions include the import
+        if activities:
+            self.__dict__.pop("_existing_activities", None)
+        with span("notifications"):
+            self._notify_activities(activities)
+
+    def _sync_activities(self) -> None:
+        with span("get_new_activities"):
+            new_activities = self._get_new_activities()
+        self._import_activities(new_activities)
+
+    def _reconcile(self) -> None:
+        """
+        Compare the platform positions with the booked ones and re-sync the
+        drifted symbols, so incremental runs can't silently miss activities.
+        """
+        with span("get_positions"):
+            positions = self._get_positions()
+        if positions is None:
+            return
+
+        booked = self._get_booked_positions()
+        if not (drifted := self._drifted(positions, booked)):
+            logger.info("%s positions match Ghostfolio", len(positions))
+            return
+
+        logger.warning(
+            "Positions of %s drifted from Ghostfolio, re-syncing them",
+            ", ".join(sorted(drifted)),
+        )
+        # The warm ID index may still hold activities missing from Ghostfolio, so
+        # it is rebuilt from activities fetched again, this run's imports included
+        self.__dict__.pop("_existing_activities", None)
+        self.__dict__.pop("_existing_ids", None)
+        with span("resync"):
+            activities = [
+                activity
+                for activity in self._resync(set(drifted))
+                if not self._activity_exists(activity.comment)
+            ]
+        if activities:
+            self._import_activities(activities)
+
+        drifted = self._drifted(positions, self._get_booked_positions())
+        for symbol, difference in sorted(drifted.items()):
+            logger.error(
+                "Position of '%s' is off by %s after re-syncing", symbol, difference
+            )
+            record_drift(symbol, difference)
 
     def _sync_cash_balance(self) -> None:
-        balance = self._get_cash_balance()
+        with span("get_cash_balance"):
+            balance = self._get_cash_balance()
 
         if balance is None:
             return
@@ -115,19 +235,32 @@ class PlatformSynchronizer(ABC):
             self._ghostfolio_account_id,
         )
 
-        _ = self._ghostfolio.put(
-            "account",
-            object_id=self._ghostfolio_account_id,
-            data={
-                "id": self._account["id"],
-                "name": self._account["name"],
-                "currency": self._account["currency"],
-                "platformId": self._account["platformId"],
-                "balance": balance,
-            },
+        with span("put_cash_balance"):
+            _ = self._ghostfolio.put(
+                "account",
+                object_id=self._ghostfolio_account_id,
+                data={
+                    "id": self._account["id"],
+                    "name": self._account["name"],
+                    "currency": self._account["currency"],
+                    "platformId": self._account["platformId"],
+                    "balance": balance,
+                },
+            )
+        record_balance_change(
+            self._ghostfolio_account_id,
+            balance - self._account["balance"],
+            self._account["currency"],
         )
 
+    def reset(self) -> None:
+        for name in self._RUN_CACHES:
+            self.__dict__.pop(name, None)
+
     def sync(self) -> None:
         self._sync_activities()
+        with span("reconcile"):
+            self._reconcile()
         self._sync_cash_balance()
-        self._post_actions()
+        with span("post_actions"):
+            self._post_actions()
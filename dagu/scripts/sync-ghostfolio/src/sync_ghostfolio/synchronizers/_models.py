@@ -1,7 +1,8 @@
+from dataclasses import dataclass, field
 from datetime import datetime
 from decimal import Decimal
 from enum import Enum, StrEnum
-from typing import NotRequired, TypedDict
+from typing import NotRequired, TypedDict, override
 
 
 class DataSource(StrEnum):
@@ -21,6 +22,11 @@ class ActivityType(StrEnum):
 
 
 # See https://github.com/ghostfolio/ghostfolio?tab=readme-ov-file#import-activities
+class GhostfolioSymbolProfile(TypedDict):
+    dataSource: DataSource
+    symbol: str
+
+
 class GhostfolioActivity(TypedDict):
     accountId: NotRequired[str]  # Id of the account
     comment: NotRequired[str]  # Comment of the activity
@@ -32,6 +38,40 @@ class GhostfolioActivity(TypedDict):
     symbol: str  # Symbol of the activity (suitable for `dataSource`)
     type: ActivityType
     unitPrice: float
+    SymbolProfile: NotRequired[GhostfolioSymbolProfile]  # Only in responses
+
+
+@dataclass(slots=True, frozen=True)
+class Activity:
+    """
+    Activity as kept by the synchronizers, converted to the Ghostfolio import
+    JSON only when it is sent.
+    """
+
+    account_id: str
+    comment: str
+    currency: str
+    data_source: DataSource
+    date: str
+    fee: float
+    quantity: float
+    symbol: str
+    type: ActivityType
+    unit_price: float
+
+    def to_import(self) -> GhostfolioActivity:
+        return {
+            "accountId": self.account_id,
+            "comment": self.comment,
+            "currency": self.currency,
+            "dataSource": self.data_source,
+            "date": self.date,
+            "fee": self.fee,
+            "quantity": self.quantity,
+            "symbol": self.symbol,
+            "type": self.type,
+            "unitPrice": self.unit_price,
+        }
 
 
 class GhostfolioPlatform(TypedDict):
@@ -71,16 +111,37 @@ class IndexaPensionFund(Enum):
     GF_INDEXA_PENSION_EQ = "Indexa Más Rentabilidad Acciones"
 
 
-class CryptoTx(TypedDict):
+@dataclass(slots=True)
+class CryptoTx:
     id: str
     value: Decimal
     fee: Decimal
     executed_at: datetime
+    # Moved funds between our own wallets, set when merging wallets
+    internal: bool = field(default=False, kw_only=True)
+
+    @property
+    def key(self) -> str:
+        """Identifies the transfer, and its Ghostfolio activity, across wallets."""
+        return self.id
 
 
+@dataclass(slots=True)
 class BtcTx(CryptoTx):
     address: str
 
 
+@dataclass(slots=True)
 class EthTx(CryptoTx):
     block: int
+
+
+@dataclass(slots=True)
+class TokenTx(EthTx):
+    # Contract of the transferred ERC-20 token, a transaction can move several
+    address: str
+
+    @property
+    @override
+    def key(self) -> str:
+        return f"{self.id}:{self.address}"
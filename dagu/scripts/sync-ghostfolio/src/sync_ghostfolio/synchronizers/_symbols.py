@@ -0,0 +1,93 @@
+import json
+import logging
+import threading
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import final
+
+from ..profiling import RUN_THREAD_PREFIX
+from ._utils import isin_to_yahoo
+
+logger = logging.getLogger(__name__)
+
+
+@final
+class SymbolResolver:
+    """
+    ISIN to Yahoo Finance symbol map, persisted to `path` and kept in memory, so
+    every ISIN is looked up once ever. Unknown ISINs of a run are resolved
+    together, concurrently, and `overrides` (from `config.toml`) always win.
+    """
+
+    DEFAULT_PATH = Path(".cache/isin-symbols.json")
+    _MAX_WORKERS = 8
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        overrides: dict[str, str] | None = None,
+        lookup: Callable[[str], str] = isin_to_yahoo,
+    ) -> None:
+        self._path = path
+        self._overrides = overrides or {}
+        self._lookup = lookup
+        self._symbols: dict[str, str] | None = None
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict[str, str]:
+        if not self._path.exists():
+            return {}
+
+        return json.loads(self._path.read_text())
+
+    def _save(self, resolved: dict[str, str]) -> None:
+        # Merged with the file, another synchronizer may have saved in between
+        symbols = self._read() | resolved
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._path.with_suffix(".tmp")
+        _ = tmp.write_text(json.dumps(symbols, indent=2, sort_keys=True))
+        _ = tmp.replace(self._path)
+
+    def resolve_many(self, isins: Iterable[str]) -> dict[str, str]:
+        """Symbols of `isins`, looking up only the ones never resolved before."""
+        with self._lock:
+            if self._symbols is None:
+                self._symbols = self._read()
+            symbols = self._symbols | self._overrides
+
+            wanted = set(isins)
+            if unknown := sorted(wanted - symbols.keys()):
+                logger.info("Resolving Yahoo Finance symbols of %s ISINs", len(unknown))
+                with ThreadPoolExecutor(
+                    self._MAX_WORKERS, thread_name_prefix=f"{RUN_THREAD_PREFIX}symbols"
+                ) as pool:
+                    outcomes = list(pool.map(self._try_lookup, unknown))
+
+                resolved = {
+                    isin: symbol
+                    for isin, symbol in zip(unknown, outcomes, strict=True)
+                    if symbol is not None
+                }
+                if resolved:
+                    self._symbols |= resolved
+                    symbols |= resolved
+                    self._save(resolved)
+
+                if failed := [isin for isin in unknown if isin not in resolved]:
+                    raise ValueError(
+                        f"No Yahoo Finance symbol found for ISINs {', '.join(failed)}"
+                    )
+
+        return {isin: symbols[isin] for isin in wanted}
+
+    def _try_lookup(self, isin: str) -> str | None:
+        try:
+            return self._lookup(isin)
+        except ValueError as e:
+            logger.warning("%s", e)
+            return None
+
+    def resolve(self, isin: str) -> str:
+        return self.resolve_many((isin,))[isin]
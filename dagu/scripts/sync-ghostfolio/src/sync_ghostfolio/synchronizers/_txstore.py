@@ -0,0 +1,149 @@
+import logging
+import struct
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Generic, TypeVar
+
+from ._models import CryptoTx
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=CryptoTx)
+
+
+class TxStore(Generic[T]):
+    """
+    Compact on-disk store of confirmed crypto transactions, keyed by tx ID and
+    wallet address. Callers only store transactions deep enough to be safe from
+    reorgs, which never change, so stores are merged by key union and only grow.
+
+    Each record is packed as: 32-byte tx ID, value and fee as 16-byte signed
+    integers in base units, block time and block number as 64-bit integers and a
+    length-prefixed wallet address.
+    """
+
+    # Stores of an older version are ignored and their wallets fetched again.
+    # Version 2 fills in the fee of BTC transactions.
+    _MAGIC = b"GFTX\x02"
+    _RECORD = struct.Struct("<32s16s16sqqB")
+
+    def __init__(
+        self, path: Path, record: type[T], *, decimals: int, id_prefix: str = ""
+    ) -> None:
+        self._path = path
+        self._record = record
+        self._unit = Decimal(10) ** decimals
+        self._id_prefix = id_prefix
+        self._txs: dict[tuple[str, str], T] = {}
+        self._by_address: defaultdict[str, list[T]] = defaultdict(list)
+        self._changed = False
+        self.hits = 0
+        self.misses = 0
+
+        if path.exists():
+            self._load()
+
+    def _encode(self, tx: T) -> bytes:
+        address = getattr(tx, "address", "").encode()
+        return (
+            self._RECORD.pack(
+                bytes.fromhex(tx.id.removeprefix(self._id_prefix)),
+                int(tx.value * self._unit).to_bytes(16, signed=True),
+                int(tx.fee * self._unit).to_bytes(16, signed=True),
+                int(tx.executed_at.timestamp()),
+                getattr(tx, "block", -1),
+                len(address),
+            )
+            + address
+        )
+
+    def _load(self) -> None:
+        data = self._path.read_bytes()
+        if not data.startswith(self._MAGIC):
+            logger.warning("Ignoring tx store '%s' with unknown format", self._path)
+            return
+
+        offset = len(self._MAGIC)
+        records: list[T] = []
+        while offset < len(data):
+            txid, value, fee, executed_at, block, address_len = (
+                self._RECORD.unpack_from(data, offset)
+            )
+            offset += self._RECORD.size
+            address = data[offset : offset + address_len].decode()
+            offset += address_len
+
+            fields: dict[str, Any] = {}
+            if address:
+                fields["address"] = address
+            if block >= 0:
+                fields["block"] = block
+            records.append(
+                self._record(
+                    id=self._id_prefix + txid.hex(),
+                    value=int.from_bytes(value, signed=True) / self._unit,
+                    fee=int.from_bytes(fee, signed=True) / self._unit,
+                    executed_at=datetime.fromtimestamp(executed_at, tz=UTC),
+                    **fields,
+                )
+            )
+
+        self.merge(records)
+        self._changed = False
+        logger.info("Loaded %s transactions from '%s'", len(self), self._path)
+
+    def __len__(self) -> int:
+        return len(self._txs)
+
+    def ids(self) -> set[str]:
+        return {txid for txid, _ in self._txs}
+
+    def values(self) -> list[T]:
+        return list(self._txs.values())
+
+    def by_address(self, address: str) -> list[T]:
+        return list(self._by_address.get(address, []))
+
+    def merge(self, txs: Iterable[T]) -> None:
+        for tx in txs:
+            address: str = getattr(tx, "address", "")
+            key = (tx.id, address)
+            if key in self._txs:
+                continue
+
+            self._txs[key] = tx
+            self._by_address[address].append(tx)
+            self._changed = True
+
+    def clear(self) -> None:
+        """Drop every transaction, e.g. to re-fetch a wallet that drifted."""
+        self._txs.clear()
+        self._by_address.clear()
+        self._changed = True
+
+    def save(self) -> None:
+        if not self._changed:
+            return
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._path.with_suffix(".tmp")
+        _ = tmp.write_bytes(
+            self._MAGIC + b"".join(self._encode(tx) for tx in self._txs.values())
+        )
+        _ = tmp.replace(self._path)
+        self._changed = False
+
+    def log_stats(self) -> None:
+        lookups = self.hits + self.misses
+        logger.info(
+            "Tx store '%s': %s hits, %s misses (%.0f%% hit rate), %s records, %s bytes",
+            self._path.name,
+            self.hits,
+            self.misses,
+            100 * self.hits / lookups if lookups else 0,
+            len(self),
+            self._path.stat().st_size if self._path.exists() else 0,
+        )
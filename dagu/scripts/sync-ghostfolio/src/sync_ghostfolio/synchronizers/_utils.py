@@ -0,0 +1,14 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def isin_to_yahoo(isin: str) -> str:
+    # Imported lazily, `yfinance` pulls in pandas
+    from yfinance.utils import get_ticker_by_isin
+
+    logger.info("Resolving Yahoo Finance symbol for ISIN '%s'", isin)
+    if not (symbol := get_ticker_by_isin(isin)):
+        raise ValueError(f"No Yahoo Finance symbol found for ISIN '{isin}'")
+
+    return symbol
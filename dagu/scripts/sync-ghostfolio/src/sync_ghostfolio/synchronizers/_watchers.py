@@ -0,0 +1,89 @@
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable
+from typing import override
+
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.client import connect
+
+logger = logging.getLogger(__name__)
+
+
+class MempoolAddressWatcher(threading.Thread):
+    """
+    Subscribes to the mempool websocket `track-addresses` feed and reports the
+    addresses that got new confirmed transactions through `on_change`.
+
+    `on_change(None)` means that events may have been missed (connection lost or
+    tracking rejected), so callers must fall back to a full scan. Events of an
+    address before it is tracked are missed as well, so every (re)subscription
+    reports the newly tracked addresses through `on_track`, to be re-scanned.
+    """
+
+    _RECV_TIMEOUT = 30.0
+    _MAX_BACKOFF = 600.0
+
+    def __init__(
+        self,
+        ws_url: str,
+        addresses: Callable[[], frozenset[str]],
+        on_change: Callable[[set[str] | None], None],
+        on_track: Callable[[set[str]], None],
+        *,
+        proxy_url: str | None = None,
+    ) -> None:
+        super().__init__(name="mempool-watcher", daemon=True)
+        self._ws_url = ws_url
+        self._addresses = addresses
+        self._on_change = on_change
+        self._on_track = on_track
+        self._proxy_url = proxy_url
+        self._backoff = 1.0
+
+    def _watch(self) -> None:
+        with connect(self._ws_url, proxy=self._proxy_url) as ws:
+            self._backoff = 1.0
+            tracked: frozenset[str] = frozenset()
+
+            while True:
+                # Re-subscribe whenever a scan discovers new addresses
+                if (addresses := self._addresses()) != tracked:
+                    logger.info("Tracking %s BTC addresses", len(addresses))
+                    ws.send(json.dumps({"track-addresses": sorted(addresses)}))
+                    self._on_track(set(addresses - tracked))
+                    tracked = addresses
+
+                try:
+                    message = json.loads(ws.recv(timeout=self._RECV_TIMEOUT))
+                except TimeoutError:
+                    continue
+
+                if "track-addresses-error" in message:
+                    raise RuntimeError(message["track-addresses-error"])
+
+                changed = {
+                    addr
+                    for addr, txs in message.get(
+                        "multi-address-transactions", {}
+                    ).items()
+                    if txs.get("confirmed")
+                }
+                if changed:
+                    logger.info("Confirmed transactions pushed for %s", changed)
+                    self._on_change(changed)
+
+    @override
+    def run(self) -> None:
+        while True:
+            try:
+                self._watch()
+            except (OSError, ConnectionClosed, RuntimeError) as e:
+                logger.warning(
+                    "Mempool watcher disconnected (%s), falling back to polling", e
+                )
+                self._on_change(None)
+
+            time.sleep(self._backoff)
+            self._backoff = min(self._backoff * 2, self._MAX_BACKOFF)
@@ -1,8 +1,18 @@
+import contextvars
 import logging
+import threading
+import time
 from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from datetime import UTC, date, datetime, timedelta
 from decimal import Decimal
-from functools import cache, cached_property
+from functools import cached_property
+from hashlib import sha256
+from pathlib import Path
 from typing import Any, ClassVar, Generic, Protocol, TypeVar, final, override
 
 import httpx
@@ -10,20 +20,27 @@ from bip_utils import Bip44Changes, Bip84, Bip84Coins
 from bip_utils.bip.bip84.bip84 import Bip44Base
 from ghostfolio import Ghostfolio
 
+from ..metrics import span
+from ..profiling import RUN_THREAD_PREFIX
+from ..transport import HttpTransport
 from ._base import PlatformSynchronizer
 from ._models import (
+    Activity,
     ActivityType,
     BtcTx,
     CryptoTx,
     DataSource,
     EthTx,
-    GhostfolioActivity,
+    TokenTx,
 )
+from ._txstore import TxStore
+from ._watchers import MempoolAddressWatcher
 
 logger = logging.getLogger(__name__)
 
 
 T = TypeVar("T", bound=CryptoTx)
+W = TypeVar("W")
 
 
 class CryptoConfig(Protocol):
@@ -33,69 +50,235 @@ class CryptoConfig(Protocol):
     provider_url: str
     proxy_url: str | None
     tx_delay_days: int | None
+    max_requests_per_second: float | None
+    clearnet_fallback: bool
+    cache_dir: Path
 
     @property
     def coingecko_api_key(self) -> str: ...
 
 
+class _RateBudget:
+    """Spaces requests at least `1 / per_second` apart, across threads."""
+
+    def __init__(self, per_second: float | None) -> None:
+        self._interval = 1 / per_second if per_second else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, _: httpx.Request) -> None:
+        if not self._interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self._interval
+
+        if wait > 0:
+            time.sleep(wait)
+
+
 class CryptoSynchronizer(PlatformSynchronizer, CryptoConfig, ABC, Generic[T]):
+    COINGECKO_URL = "https://api.coingecko.com/api/v3"
+    _MAX_PARALLEL_SCANS = 4
+    # Whether the value of a transaction already nets the fee our wallets paid,
+    # otherwise the fee is booked on top of it
+    _VALUE_INCLUDES_FEE = False
+    # Whether this run switched to the default provider, see `_provider_get`
+    _use_fallback: bool
+    _fallback_lock: threading.Lock
+
     @cached_property
-    def _http(self) -> httpx.Client:
-        return httpx.Client(
-            base_url=self.provider_url.removesuffix("/") + self.PROVIDER_API_PATH,
+    def _rate_budget(self) -> _RateBudget:
+        # Every wallet scan draws from the same provider rate budget
+        return _RateBudget(self.max_requests_per_second)
+
+    def _provider_client(self, provider_url: str) -> httpx.Client:
+        return self._transport.client(
+            base_url=provider_url.removesuffix("/").removesuffix(self.PROVIDER_API_PATH)
+            + self.PROVIDER_API_PATH,
             proxy=self.proxy_url,
+            breaker=True,
             timeout=httpx.Timeout(30.0),
+            event_hooks={"request": [self._rate_budget.acquire]},
         )
 
+    @cached_property
+    def _http(self) -> httpx.Client:
+        return self._provider_client(self.provider_url)
+
+    @cached_property
+    def _fallback_http(self) -> httpx.Client:
+        return self._provider_client(self._DEFAULT_PROVIDER_URL)
+
+    def _provider_get(self, path: str, **kwargs: Any) -> httpx.Response:
+        """
+        GET from the provider, falling back to the default (clearnet) provider
+        for the rest of the run once the configured one fails, if enabled.
+        """
+        if not self._use_fallback:
+            try:
+                return self._http.get(path, **kwargs)
+            except httpx.TransportError as e:
+                if (
+                    not self.clearnet_fallback
+                    or self.provider_url == self._DEFAULT_PROVIDER_URL
+                ):
+                    raise
+
+                with self._fallback_lock:
+                    if not self._use_fallback:
+                        logger.warning(
+                            "Provider '%s' failed (%s), falling back to '%s'",
+                            self.provider_url,
+                            e,
+                            self._DEFAULT_PROVIDER_URL,
+                        )
+                        self._use_fallback = True
+
+        return self._fallback_http.get(path, **kwargs)
+
     @cached_property
     def _coingecko(self) -> httpx.Client:
-        return httpx.Client(
-            base_url="https://api.coingecko.com/api/v3",
+        return self._transport.client(
+            base_url=self.COINGECKO_URL,
+            breaker=True,
             params={"x_cg_demo_api_key": self.coingecko_api_key},
         )
 
-    @cache
+    @cached_property
+    def _coin_prices(self) -> dict[date, float]:
+        # Past prices don't change, so they are kept for the life of the daemon
+        return {}
+
     def _get_coin_price(self, date: date) -> float:
+        if (price := self._coin_prices.get(date)) is not None:
+            return price
+
         logger.info(
             "Getting '%s' price for %s", self.COINGECKO_COIN_ID, date.isoformat()
         )
-        r = self._coingecko.get(
-            f"/coins/{self.COINGECKO_COIN_ID}/history",
-            params={"date": date.isoformat(), "localization": False},
-        )
+        with span("price_lookup"):
+            r = self._coingecko.get(
+                f"/coins/{self.COINGECKO_COIN_ID}/history",
+                params={"date": date.isoformat(), "localization": False},
+            )
         _ = r.raise_for_status()
-        return r.json()["market_data"]["current_price"]["usd"]
+        price: float = r.json()["market_data"]["current_price"]["usd"]
+        self._coin_prices[date] = price
+        return price
+
+    def _scan_wallets(
+        self, wallets: Sequence[W], scan: Callable[[W], list[T]]
+    ) -> list[list[T]]:
+        """Transactions of every wallet, scanned in parallel."""
+        with ThreadPoolExecutor(
+            min(len(wallets), self._MAX_PARALLEL_SCANS),
+            thread_name_prefix=f"{RUN_THREAD_PREFIX}{self.COINGECKO_COIN_ID}-scan",
+        ) as pool:
+            # Each scan runs in a copy of the context, so metrics see its stage
+            futures = [
+                pool.submit(contextvars.copy_context().run, scan, wallet)
+                for wallet in wallets
+            ]
+            return [future.result() for future in futures]
+
+    def _merge_wallets(self, wallet_txs: list[list[T]]) -> list[T]:
+        """
+        Merge the transactions of every wallet by ID, so the value of one seen in
+        more than one wallet is what it moved in or out of the wallets as a
+        whole. It is marked internal if nothing but its fee left them, i.e. it
+        only moved funds between our own wallets.
+        """
+        merged: dict[str, T] = {}
+        shared: set[str] = set()
+        for txs in wallet_txs:
+            for tx in txs:
+                if (known := merged.get(tx.key)) is None:
+                    merged[tx.key] = replace(tx)
+                else:
+                    known.value += tx.value
+                    shared.add(tx.key)
+
+        for key in shared:
+            tx = merged[key]
+            tx.internal = (
+                tx.value == -tx.fee if self._VALUE_INCLUDES_FEE else not tx.value
+            )
+
+        if internal := sum(tx.internal for tx in merged.values()):
+            logger.info("Found %s internal transfers between wallets", internal)
+
+        return list(merged.values())
 
     @abstractmethod
     def _get_transactions(self) -> list[T]:
         raise NotImplementedError
 
+    def _symbol(self, tx: T) -> str:
+        """CoinGecko ID of the coin moved by `tx`."""
+        return self.COINGECKO_COIN_ID
+
+    def _price_date(self, tx: T) -> date:
+        return tx.executed_at.date() - timedelta(days=self.tx_delay_days or 0)
+
+    def _get_prices(self, txs: list[T]) -> list[float]:
+        """USD price of the coin moved by every transaction, on its price date."""
+        return [self._get_coin_price(self._price_date(tx)) for tx in txs]
+
+    def _internal_transfer(self, tx: T, price: float) -> Activity | None:
+        """Fee of an internal transfer, which otherwise keeps the holdings."""
+        if not tx.fee:
+            return None
+
+        return Activity(
+            account_id=self._ghostfolio_account_id,
+            comment=self._ID_COMMENT_PREFIX + tx.key,
+            currency="USD",
+            data_source=DataSource.COINGECKO,
+            date=tx.executed_at.isoformat(),
+            fee=float(tx.fee) * price,
+            quantity=0,
+            symbol=self._symbol(tx),
+            type=ActivityType.FEE,
+            unit_price=0,
+        )
+
     @override
-    def _get_new_activities(self) -> list[GhostfolioActivity]:
-        return [
-            {
-                "accountId": self._ghostfolio_account_id,
-                "comment": self._ID_COMMENT_PREFIX + tx["id"],
-                "currency": "USD",
-                "dataSource": DataSource["COINGECKO"],
-                "date": tx["executed_at"].isoformat(),
-                "fee": float(tx["fee"])
-                * self._get_coin_price(
-                    tx["executed_at"].date() - timedelta(days=self.tx_delay_days or 0)
-                ),
-                "quantity": float(abs(tx["value"])),
-                "symbol": self.COINGECKO_COIN_ID,
-                "type": ActivityType["BUY"]
-                if tx["value"] > 0
-                else ActivityType["SELL"],
-                "unitPrice": self._get_coin_price(
-                    tx["executed_at"].date() - timedelta(days=self.tx_delay_days or 0)
-                ),
-            }
+    def _get_new_activities(self) -> list[Activity]:
+        # Every run tries the configured provider first, its circuit fails fast
+        self._use_fallback = False
+        new_txs = [
+            tx
             for tx in self._get_transactions()
-            if not self._activity_exists(self._ID_COMMENT_PREFIX + tx["id"])
+            if not self._activity_exists(self._ID_COMMENT_PREFIX + tx.key)
         ]
 
+        activities: list[Activity] = []
+        for tx, price in zip(new_txs, self._get_prices(new_txs), strict=True):
+            if tx.internal:
+                if (activity := self._internal_transfer(tx, price)) is not None:
+                    activities.append(activity)
+                continue
+
+            activities.append(
+                Activity(
+                    account_id=self._ghostfolio_account_id,
+                    comment=self._ID_COMMENT_PREFIX + tx.key,
+                    currency="USD",
+                    data_source=DataSource.COINGECKO,
+                    date=tx.executed_at.isoformat(),
+                    fee=0 if self._VALUE_INCLUDES_FEE else float(tx.fee) * price,
+                    quantity=float(abs(tx.value)),
+                    symbol=self._symbol(tx),
+                    type=ActivityType.BUY if tx.value > 0 else ActivityType.SELL,
+                    unit_price=price,
+                )
+            )
+
+        return activities
+
     @override
     def _get_cash_balance(self) -> None:
         return None
@@ -104,52 +287,107 @@ class CryptoSynchronizer(PlatformSynchronizer, CryptoConfig, ABC, Generic[T]):
 @final
 class BtcSynchronizer(CryptoSynchronizer[BtcTx]):
     _GAP_LIMIT = 20
+    _CHAIN_PAGE_SIZE = 25
     _DEFAULT_PROVIDER_URL = "https://mempool.space/api"
     PROVIDER_API_PATH = "/api"
     COINGECKO_COIN_ID = "bitcoin"
+    # Transactions are only cached this deep, so reorgs can't leave stale ones
+    _MIN_CONFIRMATIONS = 6
+    # Inputs and outputs are netted per address, fees included
+    _VALUE_INCLUDES_FEE = True
 
     def __init__(
         self,
         ghostfolio_client: Ghostfolio,
         ghostfolio_account_id: str,
         coingecko_api_key: str,
-        zpub: str,
+        zpubs: Sequence[str],
         *,
         ntfy_topic: str | None = None,
+        transport: HttpTransport | None = None,
         provider_url: str | None = None,
         proxy_url: str | None = None,
         tx_delay_days: int | None = None,
+        max_requests_per_second: float | None = None,
+        clearnet_fallback: bool = False,
+        cache_dir: Path = Path(".cache"),
     ) -> None:
         super().__init__(
-            ghostfolio_client, ghostfolio_account_id, ntfy_topic=ntfy_topic
+            ghostfolio_client,
+            ghostfolio_account_id,
+            ntfy_topic=ntfy_topic,
+            transport=transport,
         )
+        if not zpubs:
+            raise ValueError("At least one BTC zpub is required")
+
         self._coingecko_api_key = coingecko_api_key
-        self._zpub = zpub
+        self._zpubs = list(zpubs)
         self.provider_url = provider_url or self._DEFAULT_PROVIDER_URL
         self.proxy_url = proxy_url
         self.tx_delay_days = tx_delay_days
+        self.max_requests_per_second = max_requests_per_second
+        self.clearnet_fallback = clearnet_fallback
+        self._use_fallback = False
+        self._fallback_lock = threading.Lock()
+        self.cache_dir = cache_dir
+        self._tx_stores = {
+            zpub: TxStore(
+                cache_dir / f"{self._wallet_label(zpub)}.txs", BtcTx, decimals=8
+            )
+            for zpub in self._zpubs
+        }
+        # Transactions and balance (sats) per scanned address of every wallet,
+        # kept warm between runs. Scan threads add addresses under the lock.
+        self._address_txs: dict[str, list[BtcTx]] = {}
+        self._address_lock = threading.Lock()
+        self._address_balances: dict[str, int] = {}
+        # Addresses whose balance was fetched by the current run
+        self._fresh_balances: set[str] = set()
+        self._wallet_addresses: dict[str, set[str]] = {
+            zpub: set() for zpub in self._zpubs
+        }
+        # Derivation is slow, and every run walks the same addresses again
+        self._derived_addresses: dict[tuple[str, Bip44Changes, int], str] = {}
+        # Addresses to re-scan on the next run, `None` means a full scan
+        self._dirty: set[str] | None = None
+        self._dirty_lock = threading.Lock()
 
     @property
     @override
     def coingecko_api_key(self) -> str:
         return self._coingecko_api_key
 
+    @staticmethod
+    def _wallet_label(zpub: str) -> str:
+        # Names the wallet in logs and metrics without revealing its zpub
+        return f"btc-{sha256(zpub.encode()).hexdigest()[:16]}"
+
     @cached_property
-    def _derivation_ctx(self) -> Bip44Base:
-        return Bip84.FromExtendedKey(self._zpub, Bip84Coins.BITCOIN)
+    def _derivation_ctxs(self) -> dict[str, Bip44Base]:
+        return {
+            zpub: Bip84.FromExtendedKey(zpub, Bip84Coins.BITCOIN)
+            for zpub in self._zpubs
+        }
 
     @staticmethod
     def _sats_to_btc(sats: int) -> Decimal:
         return Decimal(sats) / 100_000_000
 
-    def _derive_address(self, change_type: Bip44Changes, index: int) -> str:
+    def _derive_address(self, zpub: str, change_type: Bip44Changes, index: int) -> str:
+        key = (zpub, change_type, index)
+        if (address := self._derived_addresses.get(key)) is not None:
+            return address
+
         logger.info("Deriving %s address at index %s", change_type.name, index)
-        return (
-            self._derivation_ctx.Change(change_type)
+        address = self._derived_addresses[key] = (
+            self._derivation_ctxs[zpub]
+            .Change(change_type)
             .AddressIndex(index)
             .PublicKey()
             .ToAddress()
         )
+        return address
 
     def _compute_tx_net_sats_value(self, tx: dict[str, Any], addr: str) -> int:
         value = 0
@@ -164,8 +402,79 @@ class BtcSynchronizer(CryptoSynchronizer[BtcTx]):
 
         return value
 
+    def _parse_transaction(self, tx: dict[str, Any], addr: str) -> BtcTx:
+        return BtcTx(
+            id=tx["txid"],
+            value=self._sats_to_btc(self._compute_tx_net_sats_value(tx, addr)),
+            # Of the whole transaction, whoever paid it
+            fee=self._sats_to_btc(tx["fee"]),
+            executed_at=datetime.fromtimestamp(
+                tx["status"]["block_time"],
+                tz=UTC,
+            ),
+            address=addr,
+        )
+
+    def _get_chain_stats(self, addr: str) -> dict[str, Any]:
+        """Confirmed stats of `addr`, recording its balance for this run."""
+        r = self._provider_get(f"/address/{addr}")
+        _ = r.raise_for_status()
+        chain_stats = r.json()["chain_stats"]
+        with self._address_lock:
+            self._address_balances[addr] = (
+                chain_stats["funded_txo_sum"] - chain_stats["spent_txo_sum"]
+            )
+            self._fresh_balances.add(addr)
+        return chain_stats
+
+    def _tip_height(self) -> int:
+        r = self._provider_get("/blocks/tip/height")
+        _ = r.raise_for_status()
+        return int(r.text)
+
+    def _get_address_transactions(
+        self, addr: str, tx_store: TxStore[BtcTx], tip_height: int
+    ) -> list[BtcTx]:
+        cached = tx_store.by_address(addr)
+
+        chain_stats = self._get_chain_stats(addr)
+        if chain_stats["tx_count"] == len(cached):
+            tx_store.hits += len(cached)
+            return cached
+
+        # Pages are sorted newest first, so stop at the first known transaction
+        known = {tx.id for tx in cached}
+        new_txs: list[BtcTx] = []
+        confirmed_txs: list[BtcTx] = []
+        path = f"/address/{addr}/txs/chain"
+        while True:
+            r = self._provider_get(path)
+            _ = r.raise_for_status()
+
+            page = r.json()
+            unseen = [tx for tx in page if tx["txid"] not in known]
+            for tx in unseen:
+                btc_tx = self._parse_transaction(tx, addr)
+                new_txs.append(btc_tx)
+                confirmations = tip_height - tx["status"]["block_height"] + 1
+                if confirmations >= self._MIN_CONFIRMATIONS:
+                    confirmed_txs.append(btc_tx)
+            if len(unseen) < len(page) or len(page) < self._CHAIN_PAGE_SIZE:
+                break
+
+            path = f"/address/{addr}/txs/chain/{page[-1]['txid']}"
+
+        tx_store.hits += len(cached)
+        tx_store.misses += len(new_txs)
+        tx_store.merge(confirmed_txs)
+        return [*new_txs, *cached]
+
     def _get_transactions_for_change_type(
-        self, change_type: Bip44Changes
+        self,
+        zpub: str,
+        change_type: Bip44Changes,
+        dirty: set[str] | None,
+        tip_height: int,
     ) -> list[BtcTx]:
         logger.info("Retrieving BTC transactions for %s", change_type.name)
         consecutive_empty = 0
@@ -173,29 +482,20 @@ class BtcSynchronizer(CryptoSynchronizer[BtcTx]):
 
         transactions: list[BtcTx] = []
         while consecutive_empty < self._GAP_LIMIT:
-            addr = self._derive_address(change_type, idx)
-            r = self._http.get(f"/address/{addr}/txs/chain")
-            _ = r.raise_for_status()
+            addr = self._derive_address(zpub, change_type, idx)
+            self._wallet_addresses[zpub].add(addr)
+            if dirty is None or addr in dirty or addr not in self._address_txs:
+                address_txs = self._get_address_transactions(
+                    addr, self._tx_stores[zpub], tip_height
+                )
+                with self._address_lock:
+                    self._address_txs[addr] = address_txs
 
-            txs = r.json()
+            txs = self._address_txs[addr]
 
             if txs:
                 consecutive_empty = 0
-                for tx in txs:
-                    transactions.append(
-                        {
-                            "id": tx["txid"],
-                            "value": self._sats_to_btc(
-                                self._compute_tx_net_sats_value(tx, addr)
-                            ),
-                            "fee": Decimal(0),
-                            "executed_at": datetime.fromtimestamp(
-                                tx["status"]["block_time"],
-                                tz=UTC,
-                            ),
-                            "address": addr,
-                        }
-                    )
+                transactions.extend(txs)
             else:
                 consecutive_empty += 1
 
@@ -203,22 +503,157 @@ class BtcSynchronizer(CryptoSynchronizer[BtcTx]):
 
         return transactions
 
+    def _get_wallet_transactions(
+        self, zpub: str, dirty: set[str] | None, tip_height: int
+    ) -> list[BtcTx]:
+        aggregated_txs: dict[str, BtcTx] = {}
+        tx_store = self._tx_stores[zpub]
+
+        try:
+            for type_ in Bip44Changes:
+                found_txs = self._get_transactions_for_change_type(
+                    zpub, type_, dirty, tip_height
+                )
+
+                for tx in found_txs:
+                    try:
+                        logger.debug("Merging fragmented transaction '%s'", tx.id)
+                        aggregated_txs[tx.id].value += tx.value
+                    except KeyError:
+                        aggregated_txs[tx.id] = replace(tx)
+        finally:
+            tx_store.save()
+            tx_store.log_stats()
+
+        return [tx for tx in aggregated_txs.values() if tx.value]
+
+    def _mark_dirty(self, addresses: set[str] | None) -> None:
+        with self._dirty_lock:
+            if addresses is None or self._dirty is None:
+                self._dirty = None
+            else:
+                self._dirty |= addresses
+
+    def _tracked_addresses(self) -> frozenset[str]:
+        with self._address_lock:
+            return frozenset(self._address_txs)
+
+    def watch(self, on_change: Callable[[], object]) -> None:
+        """
+        Track the scanned addresses of every wallet through the mempool
+        websocket, so later runs only re-scan the addresses that got new
+        confirmed transactions. Falls back to full scans (polling) while the
+        websocket is unavailable, and re-scans newly tracked addresses, which
+        may have changed between their scan and their subscription.
+        """
+
+        def handle_change(addresses: set[str] | None) -> None:
+            self._mark_dirty(addresses)
+            if addresses is not None:
+                on_change()
+
+        base_url = self.provider_url.removesuffix("/").removesuffix(
+            self.PROVIDER_API_PATH
+        )
+        ws_url = base_url.replace("http", "ws", 1) + self.PROVIDER_API_PATH + "/v1/ws"
+        MempoolAddressWatcher(
+            ws_url,
+            self._tracked_addresses,
+            handle_change,
+            self._mark_dirty,
+            proxy_url=self.proxy_url,
+        ).start()
+
     @override
     def _get_transactions(self) -> list[BtcTx]:
-        aggregated_txs: dict[str, BtcTx] = {}
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        with self._address_lock:
+            self._fresh_balances.clear()
+
+        try:
+            tip_height = self._tip_height()
+            wallet_txs = self._scan_wallets(
+                self._zpubs,
+                lambda zpub: self._get_wallet_transactions(zpub, dirty, tip_height),
+            )
+        except Exception:
+            self._mark_dirty(None)
+            raise
 
-        for type_ in Bip44Changes:
-            found_txs = self._get_transactions_for_change_type(type_)
+        return self._merge_wallets(wallet_txs)
 
-            for tx in found_txs:
-                id_ = tx["id"]
-                try:
-                    logger.debug("Merging fragmented transaction '%s'", id_)
-                    aggregated_txs[id_]["value"] += tx["value"]
-                except KeyError:
-                    aggregated_txs[id_] = tx
+    @override
+    def _get_positions(self) -> dict[str, float]:
+        """
+        On-chain balance of every wallet. Addresses that were not re-scanned by
+        this run get their balance fetched again, so the balance can't go stale
+        together with the transactions of incremental runs.
+        """
+        stale = [
+            addr
+            for addresses in self._wallet_addresses.values()
+            for addr in addresses
+            if addr not in self._fresh_balances
+        ]
+        if stale:
+            logger.info("Refreshing the balance of %s BTC addresses", len(stale))
+            with ThreadPoolExecutor(
+                self._MAX_PARALLEL_SCANS,
+                thread_name_prefix=f"{RUN_THREAD_PREFIX}btc-balance",
+            ) as pool:
+                futures = [
+                    pool.submit(
+                        contextvars.copy_context().run, self._get_chain_stats, addr
+                    )
+                    for addr in stale
+                ]
+                for future in futures:
+                    _ = future.result()
+
+        sats = sum(
+            self._address_balances[addr]
+            for addresses in self._wallet_addresses.values()
+            for addr in addresses
+        )
+        return {self.COINGECKO_COIN_ID: float(self._sats_to_btc(sats))}
 
-        return [tx for tx in aggregated_txs.values() if tx["value"]]
+    @override
+    def _get_booked_positions(self) -> dict[str, float]:
+        # Internal transfers are booked as a USD FEE without a quantity, so
+        # subtract the BTC they spent, i.e. what left the wallets
+        fees = {
+            a["comment"].removeprefix(self._ID_COMMENT_PREFIX)
+            for a in self._existing_activities
+            if a["type"] == ActivityType.FEE
+        }
+        with self._address_lock:
+            spent = -sum(
+                (
+                    tx.value
+                    for txs in self._address_txs.values()
+                    for tx in txs
+                    if tx.key in fees
+                ),
+                Decimal(0),
+            )
+
+        booked = super()._get_booked_positions()
+        return {
+            self.COINGECKO_COIN_ID: booked.get(self.COINGECKO_COIN_ID, 0.0)
+            - float(spent)
+        }
+
+    @override
+    def _resync(self, symbols: set[str]) -> list[Activity]:
+        # Drop the cached transactions of every wallet and scan them again
+        logger.info("Re-scanning %s BTC wallets", len(self._zpubs))
+        for tx_store in self._tx_stores.values():
+            tx_store.clear()
+        with self._address_lock:
+            self._address_txs.clear()
+
+        return self._get_new_activities()
 
 
 @final
@@ -226,27 +661,74 @@ class EthSynchronizer(CryptoSynchronizer[EthTx]):
     _DEFAULT_PROVIDER_URL = "https://eth.blockscout.com"
     PROVIDER_API_PATH = "/api/v2"
     COINGECKO_COIN_ID = "ethereum"
+    # CoinGecko asset platform of the ERC-20 token contracts
+    _COINGECKO_PLATFORM = "ethereum"
+    _MIN_CONFIRMATIONS = 12
+    # Every token adds a scan per wallet, mostly waiting on the provider
+    _MAX_PARALLEL_SCANS = 8
 
     def __init__(
         self,
         ghostfolio_client: Ghostfolio,
         ghostfolio_account_id: str,
         coingecko_api_key: str,
-        address: str,
+        addresses: Sequence[str],
         *,
         ntfy_topic: str | None = None,
+        transport: HttpTransport | None = None,
         provider_url: str | None = None,
         proxy_url: str | None = None,
         tx_delay_days: int | None = None,
+        max_requests_per_second: float | None = None,
+        clearnet_fallback: bool = False,
+        tokens: dict[str, str] | None = None,
+        cache_dir: Path = Path(".cache"),
     ) -> None:
         super().__init__(
-            ghostfolio_client, ghostfolio_account_id, ntfy_topic=ntfy_topic
+            ghostfolio_client,
+            ghostfolio_account_id,
+            ntfy_topic=ntfy_topic,
+            transport=transport,
         )
+        if not addresses:
+            raise ValueError("At least one ETH address is required")
+
         self._coingecko_api_key = coingecko_api_key
-        self._address = address
+        self._addresses = list(addresses)
         self.provider_url = provider_url or self._DEFAULT_PROVIDER_URL
         self.proxy_url = proxy_url
         self.tx_delay_days = tx_delay_days
+        self.max_requests_per_second = max_requests_per_second
+        self.clearnet_fallback = clearnet_fallback
+        self._use_fallback = False
+        self._fallback_lock = threading.Lock()
+        self.cache_dir = cache_dir
+        self._tx_stores = {
+            address: TxStore(
+                cache_dir
+                / f"eth-{sha256(address.lower().encode()).hexdigest()[:16]}.txs",
+                EthTx,
+                decimals=18,
+                id_prefix="0x",
+            )
+            for address in self._addresses
+        }
+        # ERC-20 token contract to CoinGecko coin ID
+        self._tokens = {
+            contract.lower(): coin_id for contract, coin_id in (tokens or {}).items()
+        }
+        self._token_stores = {
+            address: TxStore(
+                cache_dir
+                / f"eth-tokens-{sha256(address.lower().encode()).hexdigest()[:16]}.txs",
+                TokenTx,
+                decimals=18,
+                id_prefix="0x",
+            )
+            for address in self._addresses
+        }
+        # Token scans of a wallet run concurrently and share its store
+        self._token_lock = threading.Lock()
 
     @property
     @override
@@ -257,33 +739,212 @@ class EthSynchronizer(CryptoSynchronizer[EthTx]):
     def _wei_to_eth(wei: int) -> Decimal:
         return Decimal(wei) / 1_000_000_000_000_000_000
 
-    @override
-    def _get_transactions(self) -> list[EthTx]:
-        logger.info("Retrieving ETH transactions")
+    def _get_address_transactions(self, address: str) -> list[EthTx]:
+        logger.info("Retrieving ETH transactions of '%s'", address)
+        tx_store = self._tx_stores[address]
+        known = tx_store.ids()
         txs: list[dict[str, Any]] = []
         next_page_params = None
 
+        # Pages are sorted newest first, so stop at the first known transaction
         while True:
-            r = self._http.get(
-                f"/addresses/{self._address}/transactions", params=next_page_params
+            r = self._provider_get(
+                f"/addresses/{address}/transactions", params=next_page_params
             )
             _ = r.raise_for_status()
 
             data = r.json()
-            txs.extend(data["items"])
+            unseen = [tx for tx in data["items"] if tx["hash"] not in known]
+            txs.extend(unseen)
             next_page_params = data["next_page_params"]
-            if next_page_params is None:
+            if len(unseen) < len(data["items"]) or next_page_params is None:
+                break
+
+        cached = tx_store.values()
+        new_txs: list[EthTx] = []
+        confirmed_txs: list[EthTx] = []
+        for tx in txs:
+            if tx["status"] != "ok":
+                continue
+
+            eth_tx = EthTx(
+                id=tx["hash"],
+                value=self._wei_to_eth(int(tx["value"]))
+                * (-1 if tx["from"]["hash"].lower() == address.lower() else 1),
+                fee=self._wei_to_eth(int(tx["fee"]["value"])),
+                executed_at=datetime.fromisoformat(tx["timestamp"]),
+                block=tx["block_number"],
+            )
+            new_txs.append(eth_tx)
+            if (tx.get("confirmations") or 0) >= self._MIN_CONFIRMATIONS:
+                confirmed_txs.append(eth_tx)
+
+        tx_store.hits += len(cached)
+        tx_store.misses += len(new_txs)
+        tx_store.merge(confirmed_txs)
+        tx_store.save()
+        tx_store.log_stats()
+
+        return [*new_txs, *cached]
+
+    def _latest_block(self) -> int:
+        r = self._provider_get("/blocks", params={"type": "block"})
+        _ = r.raise_for_status()
+        return r.json()["items"][0]["height"]
+
+    def _get_token_transactions(
+        self, address: str, contract: str, latest_block: int
+    ) -> list[EthTx]:
+        logger.info(
+            "Retrieving '%s' transfers of '%s'", self._tokens[contract], address
+        )
+        tx_store = self._token_stores[address]
+        with self._token_lock:
+            cached = tx_store.by_address(contract)
+        # Transfers are stored once confirmed, a whole block at a time, so every
+        # transfer above the newest stored block is new
+        watermark = max((tx.block for tx in cached), default=-1)
+        transfers: dict[str, TokenTx] = {}
+        next_page_params: dict[str, Any] = {}
+
+        # Pages are sorted newest first, so stop at the watermark
+        while True:
+            r = self._provider_get(
+                f"/addresses/{address}/token-transfers",
+                params={"type": "ERC-20", "token": contract, **next_page_params},
+            )
+            _ = r.raise_for_status()
+
+            data = r.json()
+            unseen = [t for t in data["items"] if t["block_number"] > watermark]
+            for transfer in unseen:
+                total = transfer["total"]
+                value = Decimal(int(total["value"])).scaleb(-int(total["decimals"]))
+                direction = (transfer["to"]["hash"].lower() == address.lower()) - (
+                    transfer["from"]["hash"].lower() == address.lower()
+                )
+                # A transaction can move the same token more than once
+                if (tx := transfers.get(transfer["transaction_hash"])) is not None:
+                    tx.value += value * direction
+                    continue
+
+                transfers[transfer["transaction_hash"]] = TokenTx(
+                    id=transfer["transaction_hash"],
+                    value=value * direction,
+                    fee=Decimal(0),  # Gas is paid in ETH, by its transaction
+                    executed_at=datetime.fromisoformat(transfer["timestamp"]),
+                    block=transfer["block_number"],
+                    address=contract,
+                )
+
+            next_page_params = data["next_page_params"] or {}
+            if len(unseen) < len(data["items"]) or not next_page_params:
                 break
 
+        new_txs = list(transfers.values())
+        with self._token_lock:
+            tx_store.hits += len(cached)
+            tx_store.misses += len(new_txs)
+            tx_store.merge(
+                tx
+                for tx in new_txs
+                if latest_block - tx.block >= self._MIN_CONFIRMATIONS
+            )
+
+        return [*new_txs, *cached]
+
+    @override
+    def _symbol(self, tx: EthTx) -> str:
+        if isinstance(tx, TokenTx):
+            return self._tokens[tx.address]
+
+        return self.COINGECKO_COIN_ID
+
+    def _get_token_prices(self, contract: str, dates: set[date]) -> dict[date, float]:
+        """USD prices of a token on `dates`, from a single range lookup."""
+        logger.info(
+            "Getting '%s' prices from %s to %s",
+            self._tokens[contract],
+            min(dates).isoformat(),
+            max(dates).isoformat(),
+        )
+        midnights = {
+            day: datetime(day.year, day.month, day.day, tzinfo=UTC).timestamp()
+            for day in dates
+        }
+        with span("price_lookup"):
+            r = self._coingecko.get(
+                f"/coins/{self._COINGECKO_PLATFORM}/contract/{contract}"
+                "/market_chart/range",
+                params={
+                    "vs_currency": "usd",
+                    "from": int(min(midnights.values())) - 86_400,
+                    "to": int(max(midnights.values())) + 86_400,
+                },
+            )
+        _ = r.raise_for_status()
+
+        # Sorted by time, the price closest to midnight is the one of the day
+        prices: list[list[float]] = r.json()["prices"]
+        if not prices:
+            raise ValueError(f"No CoinGecko prices for token '{contract}'")
+
+        times = [ms / 1000 for ms, _ in prices]
+        result: dict[date, float] = {}
+        for day, midnight in midnights.items():
+            i = bisect_left(times, midnight)
+            closest = min(
+                (j for j in (i - 1, i) if 0 <= j < len(times)),
+                key=lambda j: abs(times[j] - midnight),
+            )
+            result[day] = prices[closest][1]
+
+        return result
+
+    @override
+    def _get_prices(self, txs: list[EthTx]) -> list[float]:
+        # One price range lookup per token, rather than one per token and day
+        token_dates: defaultdict[str, set[date]] = defaultdict(set)
+        for tx in txs:
+            if isinstance(tx, TokenTx):
+                token_dates[tx.address].add(self._price_date(tx))
+        token_prices = {
+            contract: self._get_token_prices(contract, dates)
+            for contract, dates in token_dates.items()
+        }
+
         return [
-            {
-                "id": tx["hash"],
-                "value": self._wei_to_eth(int(tx["value"]))
-                * (-1 if tx["from"]["hash"] == self._address else 1),
-                "fee": self._wei_to_eth(tx["fee"]["value"]),
-                "executed_at": datetime.fromisoformat(tx["timestamp"]),
-                "block": tx["block_number"],
-            }
+            token_prices[tx.address][self._price_date(tx)]
+            if isinstance(tx, TokenTx)
+            else self._get_coin_price(self._price_date(tx))
             for tx in txs
-            if tx["status"] == "ok"
         ]
+
+    # No `_get_positions`: on-chain balances net the gas of sent transactions,
+    # which isn't told apart from the fee of received ones in `EthTx`
+
+    @override
+    def _get_transactions(self) -> list[EthTx]:
+        # Native transactions and every token of every wallet are scanned
+        # concurrently, so tokens add parallel scans rather than run time
+        latest_block = self._latest_block() if self._tokens else 0
+        scans: list[tuple[str, str | None]] = [
+            (address, contract)
+            for address in self._addresses
+            for contract in [None, *self._tokens]
+        ]
+
+        def scan(job: tuple[str, str | None]) -> list[EthTx]:
+            address, contract = job
+            if contract is None:
+                return self._get_address_transactions(address)
+
+            return self._get_token_transactions(address, contract, latest_block)
+
+        try:
+            return self._merge_wallets(self._scan_wallets(scans, scan))
+        finally:
+            if self._tokens:
+                for tx_store in self._token_stores.values():
+                    tx_store.save()
+                    tx_store.log_stats()
@@ -1,13 +1,15 @@
 import logging
+from collections import defaultdict
 from datetime import date, timedelta
 from functools import cached_property
-from typing import final, override
+from typing import Any, final, override
 
 from ghostfolio import Ghostfolio
 from tradernet import Tradernet
 
+from ..transport import HttpTransport
 from ._base import PlatformSynchronizer
-from ._models import ActivityType, DataSource, GhostfolioActivity
+from ._models import Activity, ActivityType, DataSource
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +20,9 @@ class Freedom24Synchronizer(PlatformSynchronizer):
     _IGNORE_INSTRUMENTS = ("USD/EUR",)
     _BUY_TRADE_TYPE = 1
     _MAIN_CASH_ACCOUNT_CURRENCY = "EUR"
+    # Trades are re-fetched from here when reconciling a drifted position
+    _HISTORY_START = date(2015, 1, 1)
+    _RUN_CACHES = (*PlatformSynchronizer._RUN_CACHES, "_sync_from", "_user_data")
 
     def __init__(
         self,
@@ -27,11 +32,16 @@ class Freedom24Synchronizer(PlatformSynchronizer):
         freedom24_private_key: str,
         *,
         ntfy_topic: str | None = None,
+        transport: HttpTransport | None = None,
     ) -> None:
         super().__init__(
-            ghostfolio_client, ghostfolio_account_id, ntfy_topic=ntfy_topic
+            ghostfolio_client,
+            ghostfolio_account_id,
+            ntfy_topic=ntfy_topic,
+            transport=transport,
         )
         self._tradernet = Tradernet(freedom24_public_key, freedom24_private_key)
+        self._tradernet.session = self._transport.session()
 
     @cached_property
     def _sync_from(self) -> date:
@@ -49,39 +59,64 @@ class Freedom24Synchronizer(PlatformSynchronizer):
 
         return symbol
 
-    def _get_trades(self) -> list[GhostfolioActivity]:
-        logger.info("Retrieving trades from %s onwards", self._sync_from.isoformat())
+    @cached_property
+    def _user_data(self) -> dict[str, Any]:
+        return self._tradernet.get_user_data()
+
+    def _get_trades(self, start: date) -> list[Activity]:
+        logger.info("Retrieving trades from %s onwards", start.isoformat())
         trades = self._tradernet.get_trades_history(
-            start=self._sync_from, end=(date.today() - timedelta(days=1))
+            start=start, end=(date.today() - timedelta(days=1))
         )["trades"]["trade"]
 
         return [
-            {
-                "accountId": self._ghostfolio_account_id,
-                "comment": self._ID_COMMENT_PREFIX + str(trade["id"]),
-                "currency": trade["curr_c"],
-                "dataSource": DataSource["YAHOO"],
-                "date": trade["date"] + "Z",
-                "fee": float(trade["commission"]),
-                "quantity": float(trade["q"]),
-                "symbol": self._convert_symbol_to_yahoo(trade["instr_nm"]),
-                "type": ActivityType["BUY"]
+            Activity(
+                account_id=self._ghostfolio_account_id,
+                comment=self._ID_COMMENT_PREFIX + str(trade["id"]),
+                currency=trade["curr_c"],
+                data_source=DataSource["YAHOO"],
+                date=trade["date"] + "Z",
+                fee=float(trade["commission"]),
+                quantity=float(trade["q"]),
+                symbol=self._convert_symbol_to_yahoo(trade["instr_nm"]),
+                type=ActivityType["BUY"]
                 if int(trade["type"]) == self._BUY_TRADE_TYPE
                 else ActivityType["SELL"],
-                "unitPrice": float(trade["p"]),
-            }
+                unit_price=float(trade["p"]),
+            )
             for trade in trades
             if trade["instr_nm"] not in self._IGNORE_INSTRUMENTS
         ]
 
     @override
-    def _get_new_activities(self) -> list[GhostfolioActivity]:
-        return self._get_trades()
+    def _get_new_activities(self) -> list[Activity]:
+        return self._get_trades(self._sync_from)
+
+    @override
+    def _get_positions(self) -> dict[str, float]:
+        logger.info("Retrieving positions")
+        quantities: defaultdict[str, float] = defaultdict(float)
+        for position in self._user_data["OPQ"]["ps"]["pos"]:
+            if position["i"] not in self._IGNORE_INSTRUMENTS:
+                quantities[self._convert_symbol_to_yahoo(position["i"])] += float(
+                    position["q"]
+                )
+
+        return dict(quantities)
+
+    @override
+    def _resync(self, symbols: set[str]) -> list[Activity]:
+        # Trades before `_sync_from` are never fetched again by incremental runs
+        return [
+            trade
+            for trade in self._get_trades(self._HISTORY_START)
+            if trade.symbol in symbols
+        ]
 
     @override
     def _get_cash_balance(self) -> float:
         logger.info("Retrieving main account cash balance")
-        accounts = self._tradernet.get_user_data()["OPQ"]["ps"]["acc"]
+        accounts = self._user_data["OPQ"]["ps"]["acc"]
         return next(
             acc["s"]
             for acc in accounts
@@ -1,18 +1,20 @@
 import logging
-from typing import Literal, final, override
+from collections import defaultdict
+from functools import cached_property
+from typing import Any, Literal, final, override
 
-import httpx
 from ghostfolio import Ghostfolio
 
+from ..transport import HttpTransport
 from ._base import PlatformSynchronizer
 from ._models import (
+    Activity,
     ActivityType,
     DataSource,
-    GhostfolioActivity,
     IndexaFee,
     IndexaPensionFund,
 )
-from ._utils import isin_to_yahoo
+from ._symbols import SymbolResolver
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +31,7 @@ class IndexaCapitalSynchronizer(PlatformSynchronizer):
         "sell": ("BAJA IIC SWITCH", "REEMBOLSO FONDOS INVERSIÓN"),
         "fee": ("CUSTODIA INVERSIS", "CARGO COMISION GESTION"),
     }
+    _RUN_CACHES = (*PlatformSynchronizer._RUN_CACHES, "_portfolio")
 
     def __init__(
         self,
@@ -39,18 +42,31 @@ class IndexaCapitalSynchronizer(PlatformSynchronizer):
         *,
         account_type: Literal["mutual", "pension"] = "mutual",
         ntfy_topic: str | None = None,
+        transport: HttpTransport | None = None,
+        symbols: SymbolResolver | None = None,
     ) -> None:
         super().__init__(
-            ghostfolio_client, ghostfolio_account_id, ntfy_topic=ntfy_topic
+            ghostfolio_client,
+            ghostfolio_account_id,
+            ntfy_topic=ntfy_topic,
+            transport=transport,
         )
         self._account_number = indexa_capital_account_number
-        self._indexa = httpx.Client(
+        self._indexa = self._transport.client(
+            breaker=True,
             base_url=f"{self.BASE_URL}/accounts/{self._account_number}",
             headers={"X-AUTH-TOKEN": indexa_capital_api_key},
         )
         self.account_type = account_type
+        self._symbols = symbols or SymbolResolver(SymbolResolver.DEFAULT_PATH)
 
-    def _get_instrument_transactions(self) -> list[GhostfolioActivity]:
+    @cached_property
+    def _portfolio(self) -> dict[str, Any]:
+        r = self._indexa.get("/portfolio")
+        _ = r.raise_for_status()
+        return r.json()
+
+    def _get_instrument_transactions(self) -> list[Activity]:
         logger.info(
             "Retrieving instrument transactions for account number '%s'",
             self._account_number,
@@ -58,29 +74,37 @@ class IndexaCapitalSynchronizer(PlatformSynchronizer):
         r = self._indexa.get("/instrument-transactions")
         _ = r.raise_for_status()
 
+        transactions = r.json()
+        symbols = (
+            self._symbols.resolve_many(
+                t["instrument"]["isin_code"] for t in transactions
+            )
+            if self.account_type == "mutual"
+            else {}
+        )
         return [
-            {
-                "accountId": self._ghostfolio_account_id,
-                "comment": self._ID_COMMENT_PREFIX + transaction["reference"],
-                "currency": transaction["currency"],
-                "dataSource": DataSource["YAHOO"]
+            Activity(
+                account_id=self._ghostfolio_account_id,
+                comment=self._ID_COMMENT_PREFIX + transaction["reference"],
+                currency=transaction["currency"],
+                data_source=DataSource["YAHOO"]
                 if self.account_type == "mutual"
                 else DataSource["MANUAL"],
-                "date": transaction["executed_at"].partition(" ")[0],
-                "fee": 0,
-                "quantity": transaction["titles"],
-                "symbol": isin_to_yahoo(transaction["instrument"]["isin_code"])
+                date=transaction["executed_at"].partition(" ")[0],
+                fee=0,
+                quantity=transaction["titles"],
+                symbol=symbols[transaction["instrument"]["isin_code"]]
                 if self.account_type == "mutual"
                 else IndexaPensionFund(transaction["instrument"]["name"]).name,
-                "type": ActivityType["BUY"]
+                type=ActivityType["BUY"]
                 if transaction["operation_type"] in self.OPERATIONS["buy"]
                 else ActivityType["SELL"],
-                "unitPrice": transaction["price"],
-            }
-            for transaction in r.json()
+                unit_price=transaction["price"],
+            )
+            for transaction in transactions
         ]
 
-    def _get_fees(self) -> list[GhostfolioActivity]:
+    def _get_fees(self) -> list[Activity]:
         if self.account_type == "pension":
             return []
 
@@ -89,20 +113,20 @@ class IndexaCapitalSynchronizer(PlatformSynchronizer):
         _ = r.raise_for_status()
 
         return [
-            {
-                "accountId": self._ghostfolio_account_id,
-                "comment": self._ID_COMMENT_PREFIX + transaction["reference"],
-                "currency": transaction["currency"],
-                "dataSource": DataSource["MANUAL"],
-                "date": transaction["date"],
-                "fee": abs(transaction["amount"]),
-                "quantity": 0,
-                "symbol": IndexaFee.GF_INDEXA_CUST_FEE.name
+            Activity(
+                account_id=self._ghostfolio_account_id,
+                comment=self._ID_COMMENT_PREFIX + transaction["reference"],
+                currency=transaction["currency"],
+                data_source=DataSource["MANUAL"],
+                date=transaction["date"],
+                fee=abs(transaction["amount"]),
+                quantity=0,
+                symbol=IndexaFee.GF_INDEXA_CUST_FEE.name
                 if "CUSTODIA" in transaction["operation_type"]
                 else IndexaFee.GF_INDEXA_MGMT_FEE.name,
-                "type": ActivityType["FEE"],
-                "unitPrice": 0,
-            }
+                type=ActivityType["FEE"],
+                unit_price=0,
+            )
             for transaction in r.json()
             if transaction["operation_type"] in self.OPERATIONS["fee"]
         ]
@@ -113,9 +137,7 @@ class IndexaCapitalSynchronizer(PlatformSynchronizer):
             return
 
         # Update Pension Funds Net Asset Value (NAV)
-        r = self._indexa.get("/portfolio")
-        r.raise_for_status()
-        positions = r.json()["instrument_accounts"][0]["positions"]
+        positions = self._portfolio["instrument_accounts"][0]["positions"]
 
         for position in positions:
             self._ghostfolio.post(
@@ -129,9 +151,33 @@ class IndexaCapitalSynchronizer(PlatformSynchronizer):
             )
 
     @override
-    def _get_new_activities(self) -> list[GhostfolioActivity]:
+    def _get_new_activities(self) -> list[Activity]:
         activities = [*self._get_instrument_transactions(), *self._get_fees()]
-        return [a for a in activities if not self._activity_exists(a["comment"])]
+        return [a for a in activities if not self._activity_exists(a.comment)]
+
+    @override
+    def _get_positions(self) -> dict[str, float]:
+        logger.info(
+            "Retrieving positions for account number '%s'", self._account_number
+        )
+        positions = self._portfolio["instrument_accounts"][0]["positions"]
+        symbols = (
+            self._symbols.resolve_many(p["instrument"]["isin_code"] for p in positions)
+            if self.account_type == "mutual"
+            else {}
+        )
+
+        quantities: defaultdict[str, float] = defaultdict(float)
+        for position in positions:
+            instrument = position["instrument"]
+            symbol = (
+                symbols[instrument["isin_code"]]
+                if self.account_type == "mutual"
+                else IndexaPensionFund(instrument["name"]).name
+            )
+            quantities[symbol] += position["titles"]
+
+        return dict(quantities)
 
     @override
     def _get_cash_balance(self) -> float | None:
@@ -141,7 +187,4 @@ class IndexaCapitalSynchronizer(PlatformSynchronizer):
         logger.info(
             "Retrieving cash balance for account number '%s'", self._account_number
         )
-        r = self._indexa.get("/portfolio")
-        _ = r.raise_for_status()
-
-        return r.json()["portfolio"]["cash_amount"]
+        return self._portfolio["portfolio"]["cash_amount"]
@@ -1,14 +1,14 @@
 import logging
 from datetime import date, timedelta
 from functools import cached_property
-from typing import final, override
+from typing import Any, final, override
 
-import httpx
 from ghostfolio import Ghostfolio
 
+from ..transport import HttpTransport
 from ._base import PlatformSynchronizer
-from ._models import ActivityType, DataSource, GhostfolioActivity
-from ._utils import isin_to_yahoo
+from ._models import Activity, ActivityType, DataSource
+from ._symbols import SymbolResolver
 
 logger = logging.getLogger(__name__)
 
@@ -27,35 +27,38 @@ class MyInvestorSynchronizer(PlatformSynchronizer):
         access_token: str,
         *,
         ntfy_topic: str | None = None,
+        transport: HttpTransport | None = None,
+        symbols: SymbolResolver | None = None,
     ) -> None:
         super().__init__(
-            ghostfolio_client, ghostfolio_account_id, ntfy_topic=ntfy_topic
+            ghostfolio_client,
+            ghostfolio_account_id,
+            ntfy_topic=ntfy_topic,
+            transport=transport,
         )
-        self._http = httpx.Client(
+        self._http = self._transport.client(
+            breaker=True,
             base_url=self.BASE_URL,
             headers={"Authorization": f"Bearer {access_token}"},
         )
+        self._symbols = symbols or SymbolResolver(SymbolResolver.DEFAULT_PATH)
 
     @cached_property
     def _account_id(self) -> str:
         logger.info("Discovering MyInvestor securities account")
-        r = self._http.get(
-            "/cperf-server/api/v2/securities-accounts/self-basic"
-        )
+        r = self._http.get("/cperf-server/api/v2/securities-accounts/self-basic")
         r.raise_for_status()
         return r.json()["payload"]["data"][0]["accountId"]
 
     @cached_property
     def _cash_account_id(self) -> str:
         logger.info("Discovering MyInvestor cash account")
-        r = self._http.get(
-            "/cperf-server/api/v2/securities-accounts/self-basic"
-        )
+        r = self._http.get("/cperf-server/api/v2/securities-accounts/self-basic")
         r.raise_for_status()
         return r.json()["payload"]["data"][0]["cashAccountId"]
 
     @override
-    def _get_new_activities(self) -> list[GhostfolioActivity]:
+    def _get_new_activities(self) -> list[Activity]:
         date_from = date.today() - timedelta(days=180)
         logger.info(
             "Retrieving MyInvestor orders from %s onwards",
@@ -71,10 +74,14 @@ class MyInvestorSynchronizer(PlatformSynchronizer):
         r.raise_for_status()
         orders = r.json()["payload"]["data"]
 
-        activities: list[GhostfolioActivity] = []
+        valid: list[tuple[dict[str, Any], ActivityType, float]] = []
         for order in orders:
             op_type = next(
-                (t for t, ops in self.OPERATIONS.items() if order["operationType"] in ops),
+                (
+                    t
+                    for t, ops in self.OPERATIONS.items()
+                    if order["operationType"] in ops
+                ),
                 None,
             )
             if op_type is None:
@@ -93,22 +100,26 @@ class MyInvestorSynchronizer(PlatformSynchronizer):
                 )
                 continue
 
-            activities.append(
-                {
-                    "accountId": self._ghostfolio_account_id,
-                    "comment": self._ID_COMMENT_PREFIX + order["reference"],
-                    "currency": order["currency"],
-                    "dataSource": DataSource.YAHOO,
-                    "date": order["orderDate"].partition("T")[0],
-                    "fee": 0,
-                    "quantity": shares,
-                    "symbol": isin_to_yahoo(order["isin"]),
-                    "type": op_type,
-                    "unitPrice": float(order["cash"]) / shares,
-                }
+            valid.append((order, op_type, shares))
+
+        symbols = self._symbols.resolve_many(order["isin"] for order, _, _ in valid)
+        activities = [
+            Activity(
+                account_id=self._ghostfolio_account_id,
+                comment=self._ID_COMMENT_PREFIX + order["reference"],
+                currency=order["currency"],
+                data_source=DataSource.YAHOO,
+                date=order["orderDate"].partition("T")[0],
+                fee=0,
+                quantity=shares,
+                symbol=symbols[order["isin"]],
+                type=op_type,
+                unit_price=float(order["cash"]) / shares,
             )
+            for order, op_type, shares in valid
+        ]
 
-        return [a for a in activities if not self._activity_exists(a["comment"])]
+        return [a for a in activities if not self._activity_exists(a.comment)]
 
     @override
     def _get_cash_balance(self) -> float | None:
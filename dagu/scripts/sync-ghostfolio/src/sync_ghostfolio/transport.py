@@ -0,0 +1,494 @@
+"""
+Shared HTTP transport of the Ghostfolio client and the synchronizers.
+
+Clients created by `HttpTransport.client` send through one keep-alive connection
+pool per proxy, so repeated requests to a host reuse their TCP (and TLS)
+connection instead of paying a handshake per client or per call. Closing such a
+client leaves the pool open. New connections are counted per host, so reuse
+shows up in the run metrics and in the log when the transport is closed.
+Requests and their bytes are recorded in the run metrics here too, along with
+those of the `requests` sessions from `HttpTransport.session`.
+
+Clients of upstream APIs opt into a health layer per host: read timeouts adapt
+to the rolling p95 latency of the host, and a circuit breaker fails requests
+fast after repeated errors, so a dead upstream costs one timeout instead of one
+per request.
+
+`analyze_ghostfolio.transport` keeps a copy of the pooling, without the metrics
+and the health layer. The projects are built into separate venvs and share no
+package, so fixes to the pooling go in both.
+"""
+
+import importlib.util
+import json
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, final, override
+
+import httpx
+import requests
+from ghostfolio import Ghostfolio
+from requests.adapters import HTTPAdapter
+
+from .metrics import record_connection, record_request
+from .models import HttpConfig
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    connections: int = 0
+
+    @property
+    def reused(self) -> int:
+        return self.requests - self.connections
+
+
+class HostUnavailable(httpx.TransportError):
+    """Raised without sending a request while the circuit of its host is open."""
+
+
+@final
+class HostHealth:
+    """
+    Rolling latency and circuit breaker of one upstream host. The circuit opens
+    after `failure_threshold` consecutive failures (transport errors and 5xx
+    responses) and lets a single probe request through after `reset_after`
+    seconds, closing again if it succeeds.
+    """
+
+    _WINDOW = 50
+    _MIN_SAMPLES = 10
+
+    def __init__(
+        self,
+        host: str,
+        *,
+        failure_threshold: int,
+        reset_after: float,
+        timeout_factor: float,
+        min_timeout: float,
+        latencies: list[float] | None = None,
+    ) -> None:
+        self.host = host
+        self._failure_threshold = failure_threshold
+        self._reset_after = reset_after
+        self._timeout_factor = timeout_factor
+        self._min_timeout = min_timeout
+        self._latencies = deque(latencies or (), maxlen=self._WINDOW)
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def latencies(self) -> list[float]:
+        with self._lock:
+            return list(self._latencies)
+
+    @property
+    def p95(self) -> float | None:
+        with self._lock:
+            if len(self._latencies) < self._MIN_SAMPLES:
+                return None
+
+            ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def read_timeout(self, configured: float | None) -> float | None:
+        """`configured`, lowered to a multiple of the p95 latency once known."""
+        if (p95 := self.p95) is None:
+            return configured
+
+        adaptive = max(self._min_timeout, p95 * self._timeout_factor)
+        return adaptive if configured is None else min(configured, adaptive)
+
+    def acquire(self, request: httpx.Request) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+
+            if self._probing or time.monotonic() - self._opened_at < self._reset_after:
+                raise HostUnavailable(
+                    f"Circuit of '{self.host}' is open after "
+                    f"{self._failures} consecutive failures",
+                    request=request,
+                )
+
+            self._probing = True
+
+        logger.info("Probing '%s' with a half-open circuit", self.host)
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+            closed = self._opened_at is not None
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+        if closed:
+            logger.info("Circuit of '%s' closed", self.host)
+
+    def release(self) -> None:
+        """End a request that neither succeeded nor failed, e.g. a cancelled one."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if not self._probing and self._failures < self._failure_threshold:
+                return
+
+            self._opened_at = time.monotonic()
+            self._probing = False
+
+        logger.warning(
+            "Circuit of '%s' opened after %s consecutive failures, failing fast "
+            "for %ss",
+            self.host,
+            self._failures,
+            self._reset_after,
+        )
+
+
+class _CountedStream(httpx.SyncByteStream):
+    """Response body recording its request in the run metrics once closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, host: str, sent: int) -> None:
+        self._stream = stream
+        self._host = host
+        self._sent = sent
+        self._received = 0
+
+    @override
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._received += len(chunk)
+            yield chunk
+
+    @override
+    def close(self) -> None:
+        self._stream.close()
+        record_request(self._host, self._sent, self._received)
+
+
+class _CountingAdapter(HTTPAdapter):
+    @override
+    def send(
+        self, request: requests.PreparedRequest, stream: bool = False, **kwargs: Any
+    ) -> requests.Response:
+        response = super().send(request, stream=stream, **kwargs)
+        record_request(
+            httpx.URL(response.url).host,
+            len(request.body or b""),
+            0 if stream else len(response.content),
+        )
+        return response
+
+
+class _SharedPool(httpx.BaseTransport):
+    def __init__(
+        self,
+        pool: httpx.HTTPTransport,
+        transport: "HttpTransport",
+        *,
+        breaker: bool,
+    ) -> None:
+        self._pool = pool
+        self._transport = transport
+        self._breaker = breaker
+
+    @override
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = self._send(request)
+        response.stream = _CountedStream(
+            response.stream,  # ty:ignore[invalid-argument-type]
+            request.url.host,
+            int(request.headers.get("Content-Length", 0)),
+        )
+        return response
+
+    def _send(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+
+        def trace(event: str, info: dict[str, Any]) -> None:
+            if event.endswith("connect_tcp.complete"):
+                self._transport._count(host, connection=True)
+                record_connection(host)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        if not self._breaker:
+            self._transport._count(host)
+            return self._pool.handle_request(request)
+
+        health = self._transport.health(request.url.netloc.decode())
+        health.acquire(request)
+        timeout = request.extensions.get("timeout", {})
+        request.extensions["timeout"] = {
+            **timeout,
+            "read": health.read_timeout(timeout.get("read")),
+        }
+
+        self._transport._count(host)
+        start = time.monotonic()
+        try:
+            response = self._pool.handle_request(request)
+        except httpx.TransportError:
+            health.record_failure()
+            raise
+        except BaseException:
+            # Let the next request probe the host instead of keeping it open
+            health.release()
+            raise
+
+        if response.is_server_error:
+            health.record_failure()
+        else:
+            health.record_success(time.monotonic() - start)
+        return response
+
+    @override
+    def close(self) -> None:
+        # Owned by the `HttpTransport`, which outlives the clients using it
+        pass
+
+
+@final
+class HttpTransport:
+    """
+    Keep-alive connection pools shared by every client, one per proxy, and the
+    health of every upstream host. Pool limits, HTTP/2 and the circuit breaker
+    come from the `[http]` config section. Host latencies are kept in
+    `latency_cache`, so the timeouts of a run start from the previous ones.
+    """
+
+    DEFAULT_LATENCY_CACHE = Path(".cache/http-latency.json")
+    _DEFAULT_MAX_CONNECTIONS = 100
+    _DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+    _DEFAULT_KEEPALIVE_EXPIRY = 60.0
+    _DEFAULT_FAILURE_THRESHOLD = 3
+    _DEFAULT_RESET_AFTER = 60.0
+    _DEFAULT_TIMEOUT_FACTOR = 4.0
+    _DEFAULT_MIN_TIMEOUT = 2.0
+
+    def __init__(
+        self, config: HttpConfig, *, latency_cache: Path | None = None
+    ) -> None:
+        self._limits = httpx.Limits(
+            max_connections=config.get(
+                "max_connections", self._DEFAULT_MAX_CONNECTIONS
+            ),
+            max_keepalive_connections=config.get(
+                "max_keepalive_connections", self._DEFAULT_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            keepalive_expiry=config.get(
+                "keepalive_expiry", self._DEFAULT_KEEPALIVE_EXPIRY
+            ),
+        )
+        self._http2 = config.get("http2", False)
+        if self._http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 needs the 'h2' package, falling back to HTTP/1.1")
+            self._http2 = False
+
+        self._failure_threshold = config.get(
+            "failure_threshold", self._DEFAULT_FAILURE_THRESHOLD
+        )
+        self._reset_after = config.get("reset_after", self._DEFAULT_RESET_AFTER)
+        self._timeout_factor = config.get(
+            "timeout_factor", self._DEFAULT_TIMEOUT_FACTOR
+        )
+        self._min_timeout = config.get("min_timeout", self._DEFAULT_MIN_TIMEOUT)
+        self._latency_cache = latency_cache
+        self._cached_latencies: dict[str, list[float]] = (
+            json.loads(latency_cache.read_text())
+            if latency_cache is not None and latency_cache.exists()
+            else {}
+        )
+
+        self._pools: dict[str | None, httpx.HTTPTransport] = {}
+        self._stats: dict[str, PoolStats] = {}
+        self._health: dict[str, HostHealth] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, host: str, *, connection: bool = False) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(host, PoolStats())
+            if connection:
+                stats.connections += 1
+            else:
+                stats.requests += 1
+
+    def _pool(self, proxy: str | None) -> httpx.HTTPTransport:
+        with self._lock:
+            if proxy not in self._pools:
+                self._pools[proxy] = httpx.HTTPTransport(
+                    proxy=proxy, limits=self._limits, http2=self._http2
+                )
+            return self._pools[proxy]
+
+    def health(self, host: str) -> HostHealth:
+        with self._lock:
+            if host not in self._health:
+                self._health[host] = HostHealth(
+                    host,
+                    failure_threshold=self._failure_threshold,
+                    reset_after=self._reset_after,
+                    timeout_factor=self._timeout_factor,
+                    min_timeout=self._min_timeout,
+                    latencies=self._cached_latencies.get(host),
+                )
+            return self._health[host]
+
+    def client(
+        self, *, proxy: str | None = None, breaker: bool = False, **kwargs: Any
+    ) -> httpx.Client:
+        """
+        An `httpx.Client` sending through the pool of `proxy`. With `breaker`,
+        requests go through the health layer of their host.
+        """
+        return httpx.Client(
+            transport=_SharedPool(self._pool(proxy), self, breaker=breaker), **kwargs
+        )
+
+    def session(self) -> requests.Session:
+        """
+        A `requests.Session` recording its requests in the run metrics, for SDKs
+        built on `requests`. It keeps its own connection pool.
+        """
+        session = requests.Session()
+        adapter = _CountingAdapter()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _save_latencies(self) -> None:
+        if self._latency_cache is None:
+            return
+
+        with self._lock:
+            health = list(self._health.values())
+        latencies = self._cached_latencies | {
+            h.host: h.latencies for h in health if h.latencies
+        }
+        self._latency_cache.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._latency_cache.with_suffix(".tmp")
+        _ = tmp.write_text(json.dumps(latencies, indent=2, sort_keys=True))
+        _ = tmp.replace(self._latency_cache)
+
+    @property
+    def stats(self) -> dict[str, PoolStats]:
+        with self._lock:
+            return {
+                host: PoolStats(stats.requests, stats.connections)
+                for host, stats in self._stats.items()
+            }
+
+    def close(self) -> None:
+        for host, stats in sorted(self.stats.items()):
+            logger.info(
+                "Sent %s requests to '%s' over %s connections (%s reused)",
+                stats.requests,
+                host,
+                stats.connections,
+                stats.reused,
+            )
+        self._save_latencies()
+
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            pool.close()
+
+
+class PooledGhostfolio(Ghostfolio):
+    """
+    Ghostfolio client sending through a shared `HttpTransport`. The SDK opens a
+    new connection for every request.
+    """
+
+    def __init__(self, token: str, host: str, transport: HttpTransport) -> None:
+        super().__init__(token, host=host)
+        self._http = transport.client(timeout=httpx.Timeout(60.0))
+        # Concurrent first requests would authenticate once each
+        self._auth_lock = threading.Lock()
+
+    def _send(self, method: str, url: str, **kwargs: Any) -> dict[str, Any]:
+        r = self._http.request(method, url, **kwargs)
+        if r.is_error:
+            logger.error(r.text)
+        _ = r.raise_for_status()
+        return r.json()
+
+    @property
+    def _auth(self) -> dict[str, str]:
+        return {"Authorization": f"Bearer {self._jwt_token}"}
+
+    @override
+    def _refresh_jwt_token(self) -> None:
+        with self._auth_lock:
+            if self._jwt_token is not None and self._jwt_token_expiry > datetime.now():  # ty:ignore[unsupported-operator]
+                return
+
+            self._jwt_token = self._send(
+                "POST",
+                f"{self.host}/api/v1/auth/anonymous/",
+                data={"accessToken": self._token},
+            )["authToken"]
+            self._jwt_token_expiry = datetime.now() + timedelta(days=30)
+
+    @override
+    def get(
+        self,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        api_version: str = "v1",
+    ) -> dict[str, Any]:
+        self._refresh_jwt_token()
+        return self._send(
+            "GET",
+            self._url(endpoint, api_version=api_version),
+            headers=self._auth,
+            params=params,
+        )
+
+    @override
+    def post(
+        self,
+        endpoint: str,
+        data: dict[str, Any] | None = None,
+        api_version: str = "v1",
+        object_id: str | None = None,
+    ) -> dict[str, Any]:
+        self._refresh_jwt_token()
+        return self._send(
+            "POST",
+            self._url(endpoint, object_id, api_version),
+            headers=self._auth,
+            json=data,
+        )
+
+    @override
+    def put(
+        self,
+        endpoint: str,
+        data: dict[str, Any] | None = None,
+        api_version: str = "v1",
+        object_id: str | None = None,
+    ) -> dict[str, Any]:
+        self._refresh_jwt_token()
+        return self._send(
+            "PUT",
+            self._url(endpoint, object_id, api_version),
+            headers=self._auth,
+            json=data,
+        )
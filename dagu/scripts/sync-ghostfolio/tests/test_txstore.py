@@ -0,0 +1,79 @@
+"""
+Transaction caching against the local stand-ins:
+
+    PYTHONPATH=src uv run python -m unittest discover tests
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+from typing import override
+from unittest import mock
+
+from benchmarks import standins
+from benchmarks.standins import StandIn
+from sync_ghostfolio.synchronizers import crypto
+from sync_ghostfolio.synchronizers._models import BtcTx
+from sync_ghostfolio.synchronizers._txstore import TxStore
+from sync_ghostfolio.transport import HttpTransport, PooledGhostfolio
+
+
+class BtcTxStoreTest(unittest.TestCase):
+    @override
+    def setUp(self) -> None:
+        self.standin = StandIn()
+        self.standin.btc_wallet = standins.btc_wallet(1, 2)
+        self.address = standins.btc_address(0)
+        # The newest transaction was just mined
+        newest = self.standin.btc_wallet[self.address][0]
+        newest["status"]["block_height"] = self.standin.btc_tip_height
+        self.standin.start()
+        self.addCleanup(self.standin.stop)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+        self.transport = HttpTransport({})
+        self.addCleanup(self.transport.close)
+        patch = mock.patch.object(
+            crypto.BtcSynchronizer,
+            "COINGECKO_URL",
+            self.standin.url + standins.COINGECKO_PREFIX,
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def _sync(self) -> None:
+        crypto.BtcSynchronizer(
+            PooledGhostfolio(
+                "test", self.standin.url + standins.GHOSTFOLIO_PREFIX, self.transport
+            ),
+            standins.ACCOUNT_ID,
+            "test",
+            [standins.zpub()],
+            provider_url=self.standin.url + standins.MEMPOOL_PREFIX,
+            cache_dir=self.cache_dir,
+            transport=self.transport,
+        ).sync()
+
+    def _stored(self) -> int:
+        (path,) = self.cache_dir.glob("*.txs")
+        return len(TxStore(path, BtcTx, decimals=8).by_address(self.address))
+
+    def test_shallow_transactions_are_imported_but_not_stored(self) -> None:
+        self._sync()
+
+        self.assertEqual(len(self.standin.ghostfolio_activities), 2)
+        self.assertEqual(self._stored(), 1)
+
+    def test_transactions_are_stored_once_deep_enough(self) -> None:
+        self._sync()
+        self.standin.btc_tip_height += 5
+
+        self._sync()
+        self.assertEqual(len(self.standin.ghostfolio_activities), 2)
+        self.assertEqual(self._stored(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
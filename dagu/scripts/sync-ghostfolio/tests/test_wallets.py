@@ -0,0 +1,115 @@
+"""
+Transactions spanning several BTC wallets against the local stand-ins:
+
+    PYTHONPATH=src uv run python -m unittest discover tests
+"""
+
+import hashlib
+import tempfile
+import unittest
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, override
+from unittest import mock
+
+from benchmarks import standins
+from benchmarks.standins import StandIn
+from sync_ghostfolio.synchronizers import crypto
+from sync_ghostfolio.transport import HttpTransport, PooledGhostfolio
+
+_EXTERNAL = "bc1qexternal"
+
+
+class BtcWalletsTest(unittest.TestCase):
+    @override
+    def setUp(self) -> None:
+        self.standin = StandIn()
+        self.standin.start()
+        self.addCleanup(self.standin.stop)
+        # First receive address of each wallet
+        self.first = standins.btc_address(0, account=0)
+        self.second = standins.btc_address(0, account=1)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+        self.transport = HttpTransport({})
+        self.addCleanup(self.transport.close)
+        patch = mock.patch.object(
+            crypto.BtcSynchronizer,
+            "COINGECKO_URL",
+            self.standin.url + standins.COINGECKO_PREFIX,
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def _confirm(
+        self, inputs: dict[str, int], outputs: dict[str, int]
+    ) -> dict[str, Any]:
+        """Confirm a transaction on every address it spends from or pays to."""
+        tx = {
+            "txid": hashlib.sha256(repr((inputs, outputs)).encode()).hexdigest(),
+            "vin": [
+                {"prevout": {"scriptpubkey_address": addr, "value": sats}}
+                for addr, sats in inputs.items()
+            ],
+            "vout": [
+                {"scriptpubkey_address": addr, "value": sats}
+                for addr, sats in outputs.items()
+            ],
+            "fee": sum(inputs.values()) - sum(outputs.values()),
+            "status": {
+                "confirmed": True,
+                "block_height": self.standin.btc_tip_height - 10,
+                "block_time": int(datetime(2024, 1, 1, tzinfo=UTC).timestamp()),
+            },
+        }
+        for addr in inputs.keys() | outputs.keys():
+            self.standin.btc_wallet.setdefault(addr, []).insert(0, tx)
+        return tx
+
+    def _sync(self) -> list[dict[str, Any]]:
+        crypto.BtcSynchronizer(
+            PooledGhostfolio(
+                "test", self.standin.url + standins.GHOSTFOLIO_PREFIX, self.transport
+            ),
+            standins.ACCOUNT_ID,
+            "test",
+            [standins.zpub(0), standins.zpub(1)],
+            provider_url=self.standin.url + standins.MEMPOOL_PREFIX,
+            cache_dir=self.cache_dir,
+            transport=self.transport,
+        ).sync()
+        return self.standin.ghostfolio_activities
+
+    def test_deposit_into_two_wallets_is_a_buy(self) -> None:
+        _ = self._confirm(
+            {_EXTERNAL: 100_000}, {self.first: 40_000, self.second: 50_000}
+        )
+
+        (activity,) = self._sync()
+        self.assertEqual(activity["type"], "BUY")
+        self.assertAlmostEqual(activity["quantity"], 0.0009)
+
+    def test_payment_from_two_wallets_is_a_sell(self) -> None:
+        _ = self._confirm(
+            {self.first: 40_000, self.second: 50_000}, {_EXTERNAL: 80_000}
+        )
+
+        (activity,) = self._sync()
+        self.assertEqual(activity["type"], "SELL")
+        # The network fee left the wallets too
+        self.assertAlmostEqual(activity["quantity"], 0.0009)
+        self.assertEqual(activity["fee"], 0)
+
+    def test_transfer_between_wallets_books_its_fee(self) -> None:
+        _ = self._confirm({self.first: 50_000}, {self.second: 40_000})
+
+        (activity,) = self._sync()
+        self.assertEqual(activity["type"], "FEE")
+        self.assertEqual(activity["quantity"], 0)
+        self.assertAlmostEqual(activity["fee"], 0.0001 * 50_000)
+
+
+if __name__ == "__main__":
+    unittest.main()
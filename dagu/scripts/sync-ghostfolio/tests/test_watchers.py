@@ -0,0 +1,206 @@
+"""
+Push-based BTC change detection against a local mempool websocket stand-in:
+
+    PYTHONPATH=src uv run python -m unittest discover tests
+"""
+
+import hashlib
+import logging
+import queue
+import tempfile
+import unittest
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, override
+from unittest import mock
+
+from benchmarks import standins
+from benchmarks.standins import MempoolWebsocket, StandIn
+from sync_ghostfolio.synchronizers import crypto
+from sync_ghostfolio.synchronizers._watchers import MempoolAddressWatcher
+from sync_ghostfolio.transport import HttpTransport, PooledGhostfolio
+
+_TIMEOUT = 5.0
+
+
+class _FastWatcher(MempoolAddressWatcher):
+    # Re-check the tracked addresses quickly instead of every 30s
+    _RECV_TIMEOUT = 0.05
+
+
+def _receive(standin: StandIn, addr: str, sats: int) -> None:
+    """Confirm a new transaction paying `sats` to `addr` on the stand-in."""
+    txs = standin.btc_wallet.setdefault(addr, [])
+    txs.insert(
+        0,
+        {
+            "txid": hashlib.sha256(f"{addr}:{len(txs)}".encode()).hexdigest(),
+            "vin": [{"prevout": {"scriptpubkey_address": "bc1qsender", "value": 0}}],
+            "vout": [{"scriptpubkey_address": addr, "value": sats}],
+            "fee": 0,
+            "status": {
+                "confirmed": True,
+                "block_height": standin.btc_tip_height,
+                "block_time": int(datetime(2024, 1, 1, tzinfo=UTC).timestamp()),
+            },
+        },
+    )
+
+
+class MempoolAddressWatcherTest(unittest.TestCase):
+    @override
+    def setUp(self) -> None:
+        self.ws = MempoolWebsocket()
+        self.ws.start()
+        self.addCleanup(self.ws.stop)
+        self.addresses = frozenset({"bc1qa", "bc1qb"})
+        self.changes: queue.Queue[set[str] | None] = queue.Queue()
+        self.tracked: queue.Queue[set[str]] = queue.Queue()
+        self.watcher = _FastWatcher(
+            self.ws.url,
+            lambda: self.addresses,
+            self.changes.put,
+            self.tracked.put,
+        )
+        self.watcher.start()
+
+    def test_reports_pushed_confirmations(self) -> None:
+        self.ws.wait_for(lambda: bool(self.ws.tracked))
+        self.ws.push({"bc1qa"})
+
+        self.assertEqual(self.changes.get(timeout=_TIMEOUT), {"bc1qa"})
+
+    def test_reports_newly_tracked_addresses(self) -> None:
+        self.assertEqual(self.tracked.get(timeout=_TIMEOUT), set(self.addresses))
+
+        self.addresses = self.addresses | {"bc1qc"}
+        self.ws.wait_for(lambda: self.ws.tracked == self.addresses)
+        self.assertEqual(self.tracked.get(timeout=_TIMEOUT), {"bc1qc"})
+
+    def test_disconnect_falls_back_to_full_scans(self) -> None:
+        self.assertEqual(self.tracked.get(timeout=_TIMEOUT), set(self.addresses))
+        self.ws.wait_for(lambda: self.ws.tracked == self.addresses)
+        self.ws.disconnect()
+
+        self.assertIsNone(self.changes.get(timeout=_TIMEOUT))
+        # Reconnects after the backoff and tracks every address again
+        self.assertEqual(self.tracked.get(timeout=_TIMEOUT), set(self.addresses))
+
+
+class BtcWatchTest(unittest.TestCase):
+    @override
+    def setUp(self) -> None:
+        self.standin = StandIn()
+        self.standin.btc_wallet = standins.btc_wallet(3, 1)
+        self.standin.start()
+        self.addCleanup(self.standin.stop)
+        self.ws = MempoolWebsocket()
+        self.ws.start()
+        self.addCleanup(self.ws.stop)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache_dir = Path(tmp.name)
+        transport = HttpTransport({})
+        self.addCleanup(transport.close)
+        patches: list[Any] = [
+            mock.patch.object(
+                crypto.BtcSynchronizer,
+                "COINGECKO_URL",
+                self.standin.url + standins.COINGECKO_PREFIX,
+            ),
+            # The stand-ins listen on different ports, point the watcher at ours
+            mock.patch.object(
+                crypto,
+                "MempoolAddressWatcher",
+                lambda _, *args, **kwargs: _FastWatcher(self.ws.url, *args, **kwargs),
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.synchronizer = crypto.BtcSynchronizer(
+            PooledGhostfolio(
+                "test", self.standin.url + standins.GHOSTFOLIO_PREFIX, transport
+            ),
+            standins.ACCOUNT_ID,
+            "test",
+            [standins.zpub()],
+            provider_url=self.standin.url + standins.MEMPOOL_PREFIX,
+            cache_dir=cache_dir,
+            transport=transport,
+        )
+        self.triggers: queue.Queue[None] = queue.Queue()
+        self.synchronizer.watch(lambda: self.triggers.put(None))
+
+    def _sync(self) -> None:
+        self.synchronizer.reset()
+        self.synchronizer.sync()
+
+    def _imported(self) -> int:
+        return len(self.standin.ghostfolio_activities)
+
+    def test_rescans_addresses_confirmed_before_their_subscription(self) -> None:
+        self._sync()
+        self.assertEqual(self._imported(), 3)
+
+        # Confirmed after the scan but before the watcher subscribed
+        _receive(self.standin, standins.btc_address(0), 10_000)
+        self.ws.wait_for(lambda: standins.btc_address(0) in self.ws.tracked)
+
+        self._sync()
+        self.assertEqual(self._imported(), 4)
+
+    def test_pushed_confirmations_trigger_a_rescan(self) -> None:
+        self._sync()
+        self.ws.wait_for(lambda: standins.btc_address(1) in self.ws.tracked)
+        self._sync()
+
+        _receive(self.standin, standins.btc_address(1), 20_000)
+        self.ws.push({standins.btc_address(1)})
+        self.triggers.get(timeout=_TIMEOUT)
+
+        self._sync()
+        self.assertEqual(self._imported(), 4)
+
+    def test_imports_are_reconciled_without_drift(self) -> None:
+        self._sync()
+        self.ws.wait_for(lambda: standins.btc_address(1) in self.ws.tracked)
+        self._sync()
+
+        _receive(self.standin, standins.btc_address(1), 20_000)
+        self.ws.push({standins.btc_address(1)})
+        self.triggers.get(timeout=_TIMEOUT)
+
+        with self.assertNoLogs("sync_ghostfolio.synchronizers._base", logging.WARNING):
+            self._sync()
+        self.assertEqual(self._imported(), 4)
+
+    def test_resync_skips_activities_imported_by_the_run(self) -> None:
+        # Booked by hand, so the positions drift from the start
+        self.standin.ghostfolio_activities = standins.ghostfolio_activities(
+            [("manual", crypto.BtcSynchronizer.COINGECKO_COIN_ID, 1.0)]
+        )
+
+        self._sync()
+        comments = [a["comment"] for a in self.standin.ghostfolio_activities]
+        self.assertEqual(len(comments), 4)
+        self.assertEqual(len(set(comments)), 4)
+
+    def test_missing_ghostfolio_activities_are_resynced(self) -> None:
+        self._sync()
+        self.ws.wait_for(lambda: standins.btc_address(2) in self.ws.tracked)
+        self._sync()
+
+        # Lost in Ghostfolio while no address got a new transaction
+        missing = self.standin.ghostfolio_activities.pop()
+        self._sync()
+        self.assertEqual(self._imported(), 3)
+        self.assertEqual(
+            self.standin.ghostfolio_activities[-1]["comment"], missing["comment"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()